@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import copy
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from app.settings import PROJECTS_DIR
+
+PROJECT_INDEX = PROJECTS_DIR / "index.json"
+
+
+class JsonStore:
+    """A JSON document on disk, cached in memory until the file changes and replaced atomically on write."""
+
+    def __init__(self, path: Path, default: Callable[[], Any] | None = None) -> None:
+        self.path = path
+        self.lock = threading.RLock()
+        self._default = default
+        self._stamp: tuple[int, int] | None = None
+        self._document: Any = None
+
+    def read(self) -> Any:
+        """The cached document, shared between callers: do not modify it (use load or update)."""
+        with self.lock:
+            try:
+                stat = self.path.stat()
+            except FileNotFoundError:
+                if self._default is None:
+                    raise
+                return self._default()
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            if stamp != self._stamp:
+                self._document = json.loads(self.path.read_text(encoding="utf-8"))
+                self._stamp = stamp
+            return self._document
+
+    def load(self) -> Any:
+        return copy.deepcopy(self.read())
+
+    def save(self, document: Any) -> None:
+        text = json.dumps(document, indent=2)
+        with self.lock:
+            handle, temporary = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".tmp")
+            try:
+                with os.fdopen(handle, "w", encoding="utf-8") as file:
+                    file.write(text)
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(temporary, self.path)
+            except BaseException:
+                Path(temporary).unlink(missing_ok=True)
+                raise
+            stat = self.path.stat()
+            self._document = json.loads(text)
+            self._stamp = (stat.st_mtime_ns, stat.st_size)
+
+    @contextmanager
+    def update(self) -> Iterator[Any]:
+        """Yield a copy of the document and save it when the block exits without an error."""
+        with self.lock:
+            document = self.load()
+            yield document
+            self.save(document)
+
+
+_stores: dict[Path, JsonStore] = {}
+_stores_lock = threading.Lock()
+
+
+def json_store(path: Path, default: Callable[[], Any] | None = None) -> JsonStore:
+    """The process-wide store for a JSON file, so every caller shares its cache and lock."""
+    key = path.absolute()
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = JsonStore(key, default)
+        return store
+
+
+def _project_index() -> JsonStore:
+    return json_store(PROJECT_INDEX, default=dict)
+
+
+def register_project(project_id: str, name: str, path: Path) -> None:
+    with _project_index().update() as index:
+        index[project_id] = {"name": name, "path": str(path)}
+
+
+def project_entry(project_id: str) -> dict[str, Any] | None:
+    entry = _project_index().read().get(project_id)
+    return dict(entry) if entry else None
+
+
+def list_projects() -> dict[str, dict[str, Any]]:
+    return _project_index().load()
@@ -1,50 +1,353 @@
 from __future__ import annotations
 
-import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable, Iterator
 
 import duckdb
 import pandas as pd
 
+from app.db.catalog import JsonStore, json_store
+from app.settings import DUCKDB_IDLE_TTL_SECONDS, DUCKDB_MEMORY_LIMIT, DUCKDB_THREADS
 from app.utils.file_utils import ensure_path_within
 
 
+@dataclass
+class _ProjectDatabase:
+    database: duckdb.DuckDBPyConnection
+    directory: str = ""
+    write_lock: threading.RLock = field(default_factory=threading.RLock)
+    active: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+NUMERIC_TYPES = (
+    "TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "UTINYINT", "USMALLINT", "UINTEGER", "UBIGINT",
+    "FLOAT", "DOUBLE", "DECIMAL",
+)
+# Every write through this module records a fresh fingerprint per table, so callers can tell
+# whether a table changed without scanning it. Internal tables start with "_" and are hidden.
+VERSIONS_TABLE = "_table_versions"
+
+_databases: dict[Path, _ProjectDatabase] = {}
+_databases_lock = threading.Lock()
+
+
+class ProjectConnection:
+    """A cursor on a project's shared database handle.
+
+    Closing it releases the cursor only; the database (catalog, WAL and buffer cache) stays
+    open for the next caller until the project has been idle for DUCKDB_IDLE_TTL_SECONDS.
+    """
+
+    def __init__(self, project: _ProjectDatabase) -> None:
+        self._project = project
+        self._cursor = project.database.cursor()
+        self._closed = False
+        # Partitioned views name their Parquet files relative to the project, so a moved or
+        # restored project still reads them. The setting is per cursor, not per database.
+        search_path = project.directory.replace("'", "''")
+        try:
+            self._cursor.execute(f"SET file_search_path = '{search_path}'")
+        except BaseException:
+            self._cursor.close()
+            raise
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+    def __enter__(self) -> "ProjectConnection":
+        return self
+
+    def __exit__(self, *_exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._cursor.close()
+        with _databases_lock:
+            self._project.active -= 1
+            self._project.last_used = time.monotonic()
+
+
+def _close_idle(now: float) -> None:
+    for db_path, project in list(_databases.items()):
+        if project.active == 0 and now - project.last_used > DUCKDB_IDLE_TTL_SECONDS:
+            project.database.close()
+            del _databases[db_path]
+
+
+def _acquire(project_dir: Path) -> _ProjectDatabase:
+    db_path = ensure_path_within(project_dir, project_dir / "project.duckdb")
+    now = time.monotonic()
+    with _databases_lock:
+        _close_idle(now)
+        project = _databases.get(db_path)
+        if project is None:
+            config = {"memory_limit": DUCKDB_MEMORY_LIMIT, "threads": DUCKDB_THREADS}
+            project = _ProjectDatabase(database=duckdb.connect(str(db_path), config=config), directory=str(db_path.parent))
+            _databases[db_path] = project
+        project.active += 1
+        project.last_used = now
+        return project
+
+
+def close_project(project_dir: Path) -> bool:
+    """Close a project's database unless cursors are still in use; returns whether it is closed."""
+    db_path = ensure_path_within(project_dir, project_dir / "project.duckdb")
+    with _databases_lock:
+        project = _databases.get(db_path)
+        if project is None:
+            return True
+        if project.active:
+            return False
+        del _databases[db_path]
+    project.database.close()
+    return True
+
+
+def close_all() -> None:
+    with _databases_lock:
+        projects = list(_databases.values())
+        _databases.clear()
+    for project in projects:
+        project.database.close()
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
 def create_project(project_dir: Path, name: str, description: str | None) -> None:
     project_dir.mkdir(parents=True, exist_ok=True)
-    db_path = project_dir / "project.duckdb"
-    duckdb.connect(str(db_path)).close()
+    connect(project_dir).close()
     metadata = {
         "name": name,
         "description": description,
         "datasets": [],
         "connections": {},
     }
-    (project_dir / "metadata.json").write_text(json.dumps(metadata, indent=2), encoding="utf-8")
+    save_metadata(project_dir, metadata)
+
+
+def _metadata_store(project_dir: Path) -> JsonStore:
+    return json_store(ensure_path_within(project_dir, project_dir / "metadata.json"))
 
 
 def load_metadata(project_dir: Path) -> dict[str, Any]:
-    metadata_path = ensure_path_within(project_dir, project_dir / "metadata.json")
-    return json.loads(metadata_path.read_text(encoding="utf-8"))
+    return _metadata_store(project_dir).load()
 
 
 def save_metadata(project_dir: Path, metadata: dict[str, Any]) -> None:
-    metadata_path = ensure_path_within(project_dir, project_dir / "metadata.json")
-    metadata_path.write_text(json.dumps(metadata, indent=2), encoding="utf-8")
+    _metadata_store(project_dir).save(metadata)
 
 
-def connect(project_dir: Path) -> duckdb.DuckDBPyConnection:
-    db_path = ensure_path_within(project_dir, project_dir / "project.duckdb")
-    return duckdb.connect(str(db_path))
+@contextmanager
+def update_metadata(project_dir: Path) -> Iterator[dict[str, Any]]:
+    """Read-modify-write metadata.json under its lock; keep the block short."""
+    with _metadata_store(project_dir).update() as metadata:
+        yield metadata
 
 
-def save_dataframe(project_dir: Path, table_name: str, df: pd.DataFrame) -> None:
+def register_datasets(project_dir: Path, names: Iterable[str]) -> None:
+    with update_metadata(project_dir) as metadata:
+        metadata["datasets"] = sorted(set(metadata.get("datasets", [])) | set(names))
+
+
+def connect(project_dir: Path) -> ProjectConnection:
+    project = _acquire(project_dir)
+    try:
+        return ProjectConnection(project)
+    except BaseException:
+        with _databases_lock:
+            project.active -= 1
+        raise
+
+
+@contextmanager
+def write_connection(project_dir: Path) -> Iterator[ProjectConnection]:
+    """Connection for writes; writers to one project are serialized to avoid transaction conflicts."""
     with connect(project_dir) as conn:
+        with conn._project.write_lock:
+            yield conn
+
+
+@contextmanager
+def checkpointed(project_dir: Path) -> Iterator[None]:
+    """Flush the WAL into project.duckdb and hold off writers, so the file can be copied as it is."""
+    with write_connection(project_dir) as conn:
+        conn.execute("CHECKPOINT")
+        yield
+
+
+def bump_version(conn: ProjectConnection, table_name: str) -> str:
+    fingerprint = uuid.uuid4().hex
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {VERSIONS_TABLE} "
+        "(table_name VARCHAR PRIMARY KEY, version BIGINT, fingerprint VARCHAR, updated_at TIMESTAMP)"
+    )
+    conn.execute(
+        f"INSERT INTO {VERSIONS_TABLE} VALUES (?, 1, ?, now()) ON CONFLICT (table_name) DO UPDATE "
+        f"SET version = {VERSIONS_TABLE}.version + 1, fingerprint = excluded.fingerprint, updated_at = excluded.updated_at",
+        [table_name, fingerprint],
+    )
+    return fingerprint
+
+
+def table_fingerprint(conn: ProjectConnection, table_name: str) -> str | None:
+    """Fingerprint of the last write to a table, or None if it was not written through this module."""
+    if not table_exists(conn, VERSIONS_TABLE) or not table_exists(conn, table_name):
+        return None
+    row = conn.execute(f"SELECT fingerprint FROM {VERSIONS_TABLE} WHERE table_name = ?", [table_name]).fetchone()
+    return row[0] if row else None
+
+
+def table_fingerprints(conn: ProjectConnection) -> dict[str, str]:
+    """Fingerprints of every table written through this module, in one lookup."""
+    if not table_exists(conn, VERSIONS_TABLE):
+        return {}
+    return dict(conn.execute(f"SELECT table_name, fingerprint FROM {VERSIONS_TABLE}").fetchall())
+
+
+def save_dataframe(project_dir: Path, table_name: str, df: pd.DataFrame) -> None:
+    with write_connection(project_dir) as conn:
         conn.register("_import_df", df)
-        conn.execute(f"CREATE OR REPLACE TABLE {table_name} AS SELECT * FROM _import_df")
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            drop_view(conn, table_name)
+            conn.execute(f"CREATE OR REPLACE TABLE {table_name} AS SELECT * FROM _import_df")
+            bump_version(conn, table_name)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.unregister("_import_df")
+
+
+def _align_columns(conn: ProjectConnection, table_name: str, batch: str) -> None:
+    """Make a table accept a batch: add its new columns and fix or widen the types of the others.
+
+    A pandas column without values registers as DuckDB's NULL type and is created as INTEGER, so
+    a column that holds no values yet takes the batch's type; other columns widen to DuckDB's
+    union type (INTEGER -> DOUBLE, anything mixed with text -> VARCHAR).
+    """
+    name = quote_identifier(table_name)
+    current = {row[0]: row[1] for row in conn.execute(f"DESCRIBE {name}").fetchall()}
+    incoming = {row[0]: row[1] for row in conn.execute(f"DESCRIBE {batch}").fetchall()}
+    changed = [column for column, column_type in incoming.items() if column_type != '"NULL"' and current.get(column) != column_type]
+    if not changed:
+        return
+    combined = {
+        row[0]: row[1]
+        for row in conn.execute(f"DESCRIBE SELECT * FROM (FROM {name} LIMIT 0) UNION ALL BY NAME (FROM {batch} LIMIT 0)").fetchall()
+    }
+    for column in changed:
+        column_name = quote_identifier(column)
+        if column not in current:
+            conn.execute(f"ALTER TABLE {name} ADD COLUMN {column_name} {incoming[column]}")
+            continue
+        empty = conn.execute(f"SELECT count({column_name}) = 0 FROM {name}").fetchone()[0]
+        column_type = incoming[column] if empty else combined[column]
+        if column_type != current[column]:
+            conn.execute(f"ALTER TABLE {name} ALTER {column_name} SET DATA TYPE {column_type}")
+
+
+def save_batches(project_dir: Path, table_name: str, batches: Iterable[pd.DataFrame], append: bool = False) -> int:
+    """Replace (or append to) a table with a stream of frames, holding only one batch in memory at a time.
+
+    Column types follow the batches rather than only the first one (see _align_columns). Runs in
+    a single transaction so a failed stream leaves the previous table untouched.
+    """
+    rows = 0
+    with write_connection(project_dir) as conn:
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            created = append and table_exists(conn, table_name)
+            for batch in batches:
+                conn.register("_import_batch", batch)
+                if created:
+                    _align_columns(conn, table_name, "_import_batch")
+                    conn.execute(f"INSERT INTO {table_name} BY NAME SELECT * FROM _import_batch")
+                else:
+                    drop_view(conn, table_name)
+                    conn.execute(f"CREATE OR REPLACE TABLE {table_name} AS SELECT * FROM _import_batch")
+                    created = True
+                conn.unregister("_import_batch")
+                rows += len(batch)
+            if created and (rows or not append):
+                bump_version(conn, table_name)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    return rows
+
+
+def save_query(project_dir: Path, table_name: str, sql: str, params: list[Any] | None = None) -> int:
+    with write_connection(project_dir) as conn:
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            drop_view(conn, table_name)
+            conn.execute(f"CREATE OR REPLACE TABLE {table_name} AS {sql}", params or [])
+            bump_version(conn, table_name)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return conn.execute(f"SELECT count(*) FROM {table_name}").fetchone()[0]
+
+
+def append_query(project_dir: Path, table_name: str, sql: str, params: list[Any] | None = None) -> int:
+    with write_connection(project_dir) as conn:
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            before = conn.execute(f"SELECT count(*) FROM {table_name}").fetchone()[0]
+            conn.execute(f"INSERT INTO {table_name} BY NAME {sql}", params or [])
+            rows = conn.execute(f"SELECT count(*) FROM {table_name}").fetchone()[0] - before
+            if rows:
+                bump_version(conn, table_name)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    return rows
+
+
+def table_columns(project_dir: Path, table_name: str) -> dict[str, str]:
+    with connect(project_dir) as conn:
+        rows = conn.execute(f"DESCRIBE {table_name}").fetchall()
+    return {row[0]: row[1] for row in rows}
+
+
+def table_exists(conn: ProjectConnection, table_name: str) -> bool:
+    row = conn.execute(
+        "SELECT count(*) FROM information_schema.tables WHERE table_name = ?", [table_name]
+    ).fetchone()
+    return bool(row[0])
+
+
+def table_type(conn: ProjectConnection, table_name: str) -> str | None:
+    """"BASE TABLE" or "VIEW" (partitioned datasets), None when the name does not exist."""
+    row = conn.execute(
+        "SELECT table_type FROM information_schema.tables WHERE table_name = ?", [table_name]
+    ).fetchone()
+    return row[0] if row else None
+
+
+def drop_view(conn: ProjectConnection, table_name: str) -> None:
+    # A full rewrite turns a dataset stored as partitioned Parquet back into a plain table.
+    if table_type(conn, table_name) == "VIEW":
+        conn.execute(f"DROP VIEW {quote_identifier(table_name)}")
 
 
 def list_tables(project_dir: Path) -> list[str]:
     with connect(project_dir) as conn:
         rows = conn.execute("SHOW TABLES").fetchall()
-    return [row[0] for row in rows]
+    return [row[0] for row in rows if not row[0].startswith("_")]
@@ -1,30 +1,80 @@
 from __future__ import annotations
 
-import json
+import shutil
 import uuid
+from dataclasses import asdict
 from pathlib import Path
+from typing import Any, Callable
 
 import pandas as pd
 import zipfile
 
-from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi import FastAPI, File, Form, HTTPException, Query, Request, Response, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 
-from app.db.duckdb_store import create_project, list_tables
+from app.db.catalog import list_projects as list_project_index, project_entry, register_project
+from app.db.duckdb_store import checkpointed, create_project
 from app.models import (
+    AlarmEpisodesRequest,
+    BulkImportOptions,
     CsvImportOptions,
     ExcelImportOptions,
+    PipelineRequest,
     ProjectCreateRequest,
     ProjectResponse,
     RecipeRunRequest,
     RecipeRunResponse,
+    RollupRequest,
     SqlQueryRequest,
     SqlServerConnection,
+    SqlSyncRequest,
+    StorageRequest,
+    TextLogImportOptions,
+    WatchRequest,
 )
-from app.services.connections import SqlServerConnectionInfo, get_sqlserver_connection, save_sqlserver_connection
-from app.services.importer import import_csv, import_excel
-from app.services.query_runner import SqlServerClient, build_sqlserver_connection_string
+from app.services.alarms import AlarmConfig, active_alarms, chattering_alarms, top_alarms, update_alarm_episodes
+from app.services.connections import (
+    SqlServerConnectionInfo,
+    SyncConfig,
+    due_syncs,
+    get_sqlserver_connection,
+    get_sync_config,
+    list_sync_configs,
+    run_sync,
+    save_sqlserver_connection,
+    save_sync_config,
+)
+from app.services.bulk_import import directory_files, extract_zip, import_csv_files
+from app.services.importer import import_csv, import_excel, import_excel_workbook
+from app.services.query_runner import (
+    SqlServerClient,
+    build_sqlserver_connection_string,
+    clear_extraction,
+    extract_partitioned,
+    extract_to_duckdb,
+)
+from app.services.jobs import job_manager
+from app.services.pipelines import PipelineStep, delete_pipeline, get_pipeline, list_pipelines, run_pipeline, save_pipeline
+from app.services.profiles import dataset_profile, dataset_summaries
+from app.services.recipe_cache import clear_cache, list_cache_entries
+from app.services.recipe_history import compact_history, query_history
 from app.services.recipes import run_recipe
+from app.services.rollups import disable_rollups, enable_rollups, refresh_rollups
+from app.services.storage import drop_staging, merge_staging, resolve_write_mode, set_storage, staging_table
+from app.services.uploads import (
+    StoredUpload,
+    append_upload_chunk,
+    create_upload_session,
+    find_previous_import,
+    finish_upload,
+    get_upload_session,
+    record_import,
+    save_upload,
+)
+from app.services.text_logs import import_text_log, text_log_parser
+from app.services.tail import WatchConfig, delete_watch, get_watch, list_watches, save_watch_config, watch_manager
+from app.services.series import downsample_series, series_to_arrow
 from app.services.reports import generate_html_report, generate_pdf_report
 from app.settings import PROJECTS_DIR
 from app.utils.file_utils import ensure_path_within, sanitize_name
@@ -39,22 +89,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-INDEX_PATH = PROJECTS_DIR / "index.json"
-
-
-def load_index() -> dict:
-    if INDEX_PATH.exists():
-        return json.loads(INDEX_PATH.read_text(encoding="utf-8"))
-    return {}
-
-
-def save_index(index: dict) -> None:
-    INDEX_PATH.write_text(json.dumps(index, indent=2), encoding="utf-8")
+RECIPES_DIR = Path(__file__).resolve().parent / "recipes"
 
 
 def get_project_dir(project_id: str) -> Path:
-    index = load_index()
-    project = index.get(project_id)
+    project = project_entry(project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     return ensure_path_within(PROJECTS_DIR, Path(project["path"]))
@@ -67,16 +106,74 @@ async def create_project_endpoint(payload: ProjectCreateRequest) -> ProjectRespo
     project_dir = PROJECTS_DIR / f"{project_name}_{project_id}"
     create_project(project_dir, payload.name, payload.description)
 
-    index = load_index()
-    index[project_id] = {"name": payload.name, "path": str(project_dir)}
-    save_index(index)
+    register_project(project_id, payload.name, project_dir)
 
     return ProjectResponse(project_id=project_id, name=payload.name, description=payload.description, path=str(project_dir))
 
 
 @app.get("/api/projects")
 async def list_projects() -> dict:
-    return load_index()
+    return list_project_index()
+
+
+async def receive_upload(project_dir: Path, file: UploadFile | None, upload_id: str | None, sha256: str | None) -> StoredUpload:
+    if upload_id:
+        try:
+            return await finish_upload(project_dir, upload_id, sha256)
+        except FileNotFoundError as exc:
+            raise HTTPException(status_code=404, detail=str(exc)) from exc
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+    if file is None:
+        raise HTTPException(status_code=400, detail="Either file or upload_id is required")
+    return await save_upload(project_dir, file)
+
+
+async def dispatch(kind: str, project_id: str, fn: Callable[[], Any], background: bool) -> dict:
+    """Run blocking work off the event loop, either awaited on a worker thread or queued as a job."""
+    if background:
+        job = job_manager.submit(kind, project_id, fn)
+        return {"status": "queued", "job_id": job.job_id}
+    return await run_in_threadpool(fn)
+
+
+def form_list(value: str | None) -> list[str] | None:
+    return [item.strip() for item in value.split(",") if item.strip()] if value else None
+
+
+def check_write_mode(project_dir: Path, dataset_name: str, mode: str, key: list[str] | None) -> None:
+    try:
+        resolve_write_mode(project_dir, sanitize_name(dataset_name), mode, key)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@app.post("/api/uploads")
+async def create_upload_endpoint(project_id: str, filename: str = Form(...), total_size: int | None = Form(None)) -> dict:
+    project_dir = get_project_dir(project_id)
+    return create_upload_session(project_dir, filename, total_size)
+
+
+@app.get("/api/uploads/{upload_id}")
+async def get_upload_endpoint(project_id: str, upload_id: str) -> dict:
+    project_dir = get_project_dir(project_id)
+    try:
+        return get_upload_session(project_dir, upload_id)
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@app.put("/api/uploads/{upload_id}")
+async def append_upload_endpoint(project_id: str, upload_id: str, offset: int, request: Request) -> dict:
+    project_dir = get_project_dir(project_id)
+    try:
+        return await append_upload_chunk(project_dir, upload_id, offset, request.stream())
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
 
 
 @app.post("/api/import/csv")
@@ -86,20 +183,180 @@ async def import_csv_endpoint(
     delimiter: str | None = Form(None),
     encoding: str | None = Form(None),
     decimal: str | None = Form(None),
-    file: UploadFile = File(...),
+    timestamp_column: str | None = Form(None),
+    timezone: str | None = Form(None),
+    engine: str | None = Form(None),
+    rollups: bool = Form(False),
+    partition: str | None = Form(None),
+    mode: str = Form("replace"),
+    key: str | None = Form(None),
+    upload_id: str | None = Form(None),
+    sha256: str | None = Form(None),
+    force: bool = Form(False),
+    background: bool = Form(False),
+    file: UploadFile | None = File(None),
 ) -> dict:
     project_dir = get_project_dir(project_id)
-    temp_path = project_dir / file.filename
-    temp_path.write_bytes(await file.read())
     options = CsvImportOptions(
         dataset_name=dataset_name,
         delimiter=delimiter,
         encoding=encoding,
         decimal=decimal,
+        timestamp_column=timestamp_column,
+        timezone=timezone,
+        engine=engine,
+        rollups=rollups,
+        partition=partition,
+        mode=mode,
+        key=form_list(key),
+    )
+    if rollups and not timestamp_column:
+        raise HTTPException(status_code=400, detail="Rollups require timestamp_column")
+    if partition and not timestamp_column:
+        raise HTTPException(status_code=400, detail="Partitioning requires timestamp_column")
+    check_write_mode(project_dir, dataset_name, options.mode, options.key)
+    upload = await receive_upload(project_dir, file, upload_id, sha256)
+
+    def run() -> dict:
+        try:
+            if not force and find_previous_import(project_dir, upload.sha256, sanitize_name(dataset_name), options.dict()):
+                return {"status": "skipped", "dataset_name": sanitize_name(dataset_name), "sha256": upload.sha256}
+            result = import_csv(project_dir, upload.path, options.dict())
+            record_import(project_dir, upload, [result["dataset_name"]], options.dict())
+            if options.rollups:
+                enable_rollups(project_dir, result["dataset_name"], options.timestamp_column)
+            else:
+                refresh_rollups(project_dir, result["dataset_name"], appended=options.mode == "append")
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        finally:
+            upload.path.unlink(missing_ok=True)
+        result["sha256"] = upload.sha256
+        return result
+
+    return await dispatch("import_csv", project_id, run, background)
+
+
+@app.post("/api/import/bulk")
+async def import_bulk_endpoint(
+    project_id: str = Form(...),
+    dataset_name: str = Form(...),
+    directory: str | None = Form(None),
+    pattern: str = Form("*.csv"),
+    delimiter: str | None = Form(None),
+    decimal: str | None = Form(None),
+    timestamp_column: str | None = Form(None),
+    timezone: str | None = Form(None),
+    mode: str = Form("append"),
+    key: str | None = Form(None),
+    force: bool = Form(False),
+    upload_id: str | None = Form(None),
+    sha256: str | None = Form(None),
+    background: bool = Form(False),
+    file: UploadFile | None = File(None),
+) -> dict:
+    """Import many CSV files from a ZIP upload or a server-local directory into one dataset."""
+    project_dir = get_project_dir(project_id)
+    options = BulkImportOptions(
+        dataset_name=dataset_name,
+        pattern=pattern,
+        delimiter=delimiter,
+        decimal=decimal,
+        timestamp_column=timestamp_column,
+        timezone=timezone,
+        mode=mode,
+        key=form_list(key),
+        force=force,
     )
-    result = import_csv(project_dir, temp_path, options.dict())
-    temp_path.unlink(missing_ok=True)
-    return result
+    check_write_mode(project_dir, dataset_name, options.mode, options.key)
+    upload = None
+    if directory:
+        root = Path(directory)
+        try:
+            files = await run_in_threadpool(directory_files, root, options.pattern)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+    else:
+        upload = await receive_upload(project_dir, file, upload_id, sha256)
+        root = upload.path.with_suffix(".d")
+        try:
+            files = await run_in_threadpool(extract_zip, upload.path, root, options.pattern)
+        except ValueError as exc:
+            upload.path.unlink(missing_ok=True)
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    def run() -> dict:
+        try:
+            result = import_csv_files(project_dir, root, files, options.dict())
+            refresh_rollups(project_dir, result["dataset_name"], appended=options.mode == "append")
+            return result
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        finally:
+            if upload is not None:
+                upload.path.unlink(missing_ok=True)
+                shutil.rmtree(root, ignore_errors=True)
+
+    return await dispatch("import_bulk", project_id, run, background)
+
+
+@app.post("/api/import/text")
+async def import_text_log_endpoint(
+    project_id: str = Form(...),
+    dataset_name: str = Form("text_logs"),
+    template: str | None = Form(None),
+    pattern: str | None = Form(None),
+    timestamp_format: str | None = Form(None),
+    timezone: str | None = Form(None),
+    key_values: str | None = Form(None),
+    types: str | None = Form(None),
+    encoding: str | None = Form(None),
+    partition: str | None = Form(None),
+    mode: str = Form("replace"),
+    key: str | None = Form(None),
+    upload_id: str | None = Form(None),
+    sha256: str | None = Form(None),
+    force: bool = Form(False),
+    background: bool = Form(False),
+    file: UploadFile | None = File(None),
+) -> dict:
+    """Parse a plain-text log into a typed dataset; types is a list like "pressure:DOUBLE,count:BIGINT"."""
+    project_dir = get_project_dir(project_id)
+    options = TextLogImportOptions(
+        dataset_name=dataset_name,
+        template=template,
+        pattern=pattern,
+        timestamp_format=timestamp_format,
+        timezone=timezone,
+        key_values=form_list(key_values),
+        types={name: kind for name, _, kind in (item.partition(":") for item in form_list(types) or [])} or None,
+        encoding=encoding,
+        partition=partition,
+        mode=mode,
+        key=form_list(key),
+    )
+    try:
+        text_log_parser(options.dict())
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    check_write_mode(project_dir, dataset_name, options.mode, options.key)
+    upload = await receive_upload(project_dir, file, upload_id, sha256)
+
+    def run() -> dict:
+        try:
+            if not force and find_previous_import(project_dir, upload.sha256, sanitize_name(dataset_name), options.dict()):
+                return {"status": "skipped", "dataset_name": sanitize_name(dataset_name), "sha256": upload.sha256}
+            result = import_text_log(project_dir, upload.path, {**options.dict(), "source_name": upload.filename})
+            record_import(project_dir, upload, [result["dataset_name"]], options.dict())
+            refresh_rollups(project_dir, result["dataset_name"], appended=options.mode == "append")
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        finally:
+            upload.path.unlink(missing_ok=True)
+        result["sha256"] = upload.sha256
+        return result
+
+    return await dispatch("import_text", project_id, run, background)
 
 
 @app.post("/api/import/excel")
@@ -107,26 +364,135 @@ async def import_excel_endpoint(
     project_id: str = Form(...),
     dataset_name: str = Form(...),
     sheet_name: str | None = Form(None),
+    sheet_names: str | None = Form(None),
+    all_sheets: bool = Form(False),
     header_row: int | None = Form(0),
-    file: UploadFile = File(...),
+    mode: str = Form("replace"),
+    key: str | None = Form(None),
+    upload_id: str | None = Form(None),
+    sha256: str | None = Form(None),
+    force: bool = Form(False),
+    background: bool = Form(False),
+    file: UploadFile | None = File(None),
 ) -> dict:
     project_dir = get_project_dir(project_id)
-    temp_path = project_dir / file.filename
-    temp_path.write_bytes(await file.read())
     options = ExcelImportOptions(
         dataset_name=dataset_name,
         sheet_name=sheet_name,
+        sheet_names=form_list(sheet_names),
+        all_sheets=all_sheets,
         header_row=header_row,
+        mode=mode,
+        key=form_list(key),
     )
-    result = import_excel(project_dir, temp_path, options.dict())
-    temp_path.unlink(missing_ok=True)
-    return result
+    check_write_mode(project_dir, dataset_name, options.mode, options.key)
+    upload = await receive_upload(project_dir, file, upload_id, sha256)
+
+    def run() -> dict:
+        try:
+            if options.all_sheets or options.sheet_names:
+                result = import_excel_workbook(project_dir, upload.path, {**options.dict(), "force": force})
+                record_import(project_dir, upload, [sheet["table"] for sheet in result["sheets"]], options.dict())
+                for sheet in result["sheets"]:
+                    refresh_rollups(project_dir, sheet["table"], appended=options.mode == "append")
+            else:
+                if not force and find_previous_import(project_dir, upload.sha256, sanitize_name(dataset_name), options.dict()):
+                    return {"status": "skipped", "dataset_name": sanitize_name(dataset_name), "sha256": upload.sha256}
+                result = import_excel(project_dir, upload.path, options.dict())
+                record_import(project_dir, upload, [result["dataset_name"]], options.dict())
+                refresh_rollups(project_dir, result["dataset_name"], appended=options.mode == "append")
+        finally:
+            upload.path.unlink(missing_ok=True)
+        result["sha256"] = upload.sha256
+        return result
+
+    return await dispatch("import_excel", project_id, run, background)
 
 
 @app.get("/api/datasets")
 async def list_datasets(project_id: str) -> dict:
+    """Dataset names with row count, column count and time span from their stored profiles."""
+    project_dir = get_project_dir(project_id)
+    profiles = await run_in_threadpool(dataset_summaries, project_dir)
+    return {"datasets": list(profiles), "profiles": profiles}
+
+
+@app.get("/api/datasets/{name}/profile")
+async def dataset_profile_endpoint(project_id: str, name: str, refresh: bool = False) -> dict:
+    """Per-column types, nulls, min/max and distinct counts; only recomputed if the dataset changed."""
+    project_dir = get_project_dir(project_id)
+    try:
+        return await run_in_threadpool(dataset_profile, project_dir, name, refresh)
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+
+
+@app.get("/api/datasets/{name}/series")
+async def dataset_series_endpoint(
+    project_id: str,
+    name: str,
+    time_column: str = "ts",
+    columns: list[str] | None = Query(None),
+    start: str | None = None,
+    end: str | None = None,
+    width: int = 1000,
+    mode: str = "minmax",
+    tag_column: str | None = None,
+    tag: str | None = None,
+    format: str = "json",
+) -> Any:
+    """Chart-ready series: at most `width` points per column, aggregated inside DuckDB."""
+    project_dir = get_project_dir(project_id)
+    if format not in {"json", "arrow"}:
+        raise HTTPException(status_code=400, detail="Unsupported format")
+
+    def run() -> Any:
+        result = downsample_series(project_dir, name, time_column, columns, start, end, width, mode, tag_column, tag)
+        if format == "json":
+            return result
+        return Response(content=series_to_arrow(result), media_type="application/vnd.apache.arrow.stream")
+
+    try:
+        return await run_in_threadpool(run)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except RuntimeError as exc:
+        raise HTTPException(status_code=501, detail=str(exc)) from exc
+
+
+@app.put("/api/datasets/{name}/rollups")
+async def enable_rollups_endpoint(project_id: str, name: str, payload: RollupRequest, background: bool = False) -> dict:
+    """Flag a dataset as a time series and maintain 1s/1m/1h/1d rollups for it."""
+    project_dir = get_project_dir(project_id)
+
+    def run() -> dict:
+        try:
+            return enable_rollups(project_dir, name, payload.time_column, payload.tag_column, payload.value_columns)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    return await dispatch("rollups", project_id, run, background)
+
+
+@app.delete("/api/datasets/{name}/rollups")
+async def disable_rollups_endpoint(project_id: str, name: str) -> dict:
     project_dir = get_project_dir(project_id)
-    return {"datasets": list_tables(project_dir)}
+    removed = await run_in_threadpool(disable_rollups, project_dir, name)
+    return {"status": "removed" if removed else "not_configured", "dataset": name}
+
+
+@app.put("/api/datasets/{name}/storage")
+async def set_storage_endpoint(project_id: str, name: str, payload: StorageRequest, background: bool = False) -> dict:
+    """Rewrite a dataset in time order, or as day/month Parquet partitions when partition is set."""
+    project_dir = get_project_dir(project_id)
+
+    def run() -> dict:
+        try:
+            return set_storage(project_dir, name, payload.time_column, payload.partition)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    return await dispatch("storage", project_id, run, background)
 
 
 @app.post("/api/connections/sqlserver")
@@ -137,10 +503,11 @@ async def save_sqlserver_connection_endpoint(project_id: str, payload: SqlServer
     return {"status": "saved"}
 
 
-@app.post("/api/query/sqlserver")
-async def query_sqlserver_endpoint(project_id: str, payload: SqlQueryRequest) -> dict:
-    project_dir = get_project_dir(project_id)
-    connection = get_sqlserver_connection(project_dir, payload.connection_name)
+def sqlserver_client(project_id: str, project_dir: Path, connection_name: str) -> SqlServerClient:
+    try:
+        connection = get_sqlserver_connection(project_dir, connection_name)
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
     connection_string = build_sqlserver_connection_string(
         host=connection.host,
         port=connection.port,
@@ -149,48 +516,430 @@ async def query_sqlserver_endpoint(project_id: str, payload: SqlQueryRequest) ->
         password=connection.password,
         trusted=connection.trusted,
     )
-    client = SqlServerClient(connection_string)
-    df = client.fetch_dataframe(payload.query)
-    from app.db.duckdb_store import save_dataframe
-    save_dataframe(project_dir, sanitize_name(payload.dataset_name), df)
-    return {"status": "imported", "rows": len(df)}
+    return SqlServerClient(connection_string, name=f"{project_id}:{connection.name}")
+
+
+@app.post("/api/query/sqlserver")
+async def query_sqlserver_endpoint(project_id: str, payload: SqlQueryRequest, background: bool = False) -> dict:
+    project_dir = get_project_dir(project_id)
+    client = sqlserver_client(project_id, project_dir, payload.connection_name)
+    check_write_mode(project_dir, payload.dataset_name, payload.mode, payload.key)
+    dataset = sanitize_name(payload.dataset_name)
+    partitioned = bool(payload.time_column and payload.start and payload.end)
+    # Appends and upserts are staged, except partitioned extracts, which stage themselves.
+    target = dataset if payload.mode == "replace" or partitioned else staging_table(dataset)
+
+    def extract() -> dict:
+        if partitioned:
+            try:
+                result = extract_partitioned(
+                    client,
+                    project_dir,
+                    dataset,
+                    payload.query,
+                    payload.time_column,
+                    payload.start,
+                    payload.end,
+                    payload.partitions,
+                    payload.max_workers,
+                    payload.mode,
+                    payload.key,
+                )
+            except ValueError as exc:
+                raise HTTPException(status_code=400, detail=str(exc)) from exc
+            return {"status": "imported", **result.as_dict()}
+        if payload.stream:
+            result = extract_to_duckdb(client, project_dir, target, payload.query, payload.batch_size)
+            return {"status": "imported", **result.as_dict()}
+        df = client.fetch_dataframe(payload.query)
+        from app.db.duckdb_store import save_dataframe
+        save_dataframe(project_dir, target, df)
+        return {"status": "imported", "rows": len(df)}
+
+    def run() -> dict:
+        try:
+            result = extract()
+        except BaseException:
+            if target != dataset:
+                drop_staging(project_dir, target)
+            raise
+        if payload.mode != "replace" and not partitioned:
+            try:
+                result["merged"] = merge_staging(project_dir, dataset, target, payload.mode, payload.key)
+            except ValueError as exc:
+                raise HTTPException(status_code=400, detail=str(exc)) from exc
+        refresh_rollups(project_dir, dataset, appended=payload.mode == "append")
+        return result
+
+    return await dispatch("query_sqlserver", project_id, run, background)
+
+
+@app.delete("/api/query/sqlserver/extractions/{name}")
+async def abandon_extraction_endpoint(project_id: str, name: str) -> dict:
+    """Drop the staging table of an unfinished partitioned extraction instead of resuming it."""
+    project_dir = get_project_dir(project_id)
+    await run_in_threadpool(clear_extraction, project_dir, sanitize_name(name))
+    return {"status": "removed", "dataset": sanitize_name(name)}
+
+
+@app.post("/api/sync/sqlserver")
+async def save_sqlserver_sync_endpoint(project_id: str, payload: SqlSyncRequest) -> dict:
+    project_dir = get_project_dir(project_id)
+    try:
+        get_sqlserver_connection(project_dir, payload.connection_name)
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    config = SyncConfig(
+        dataset=sanitize_name(payload.dataset_name),
+        connection=payload.connection_name,
+        query=payload.query,
+        watermark_column=payload.watermark_column,
+        interval_seconds=payload.interval_seconds,
+    )
+    save_sync_config(project_dir, config)
+    return {"status": "saved", "dataset": config.dataset}
+
+
+@app.get("/api/sync")
+async def list_syncs_endpoint(project_id: str) -> dict:
+    project_dir = get_project_dir(project_id)
+    return {"syncs": [asdict(config) for config in list_sync_configs(project_dir)]}
+
+
+@app.post("/api/sync/{dataset}/run")
+async def run_sync_endpoint(project_id: str, dataset: str, background: bool = False) -> dict:
+    project_dir = get_project_dir(project_id)
+    try:
+        config = get_sync_config(project_dir, dataset)
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    client = sqlserver_client(project_id, project_dir, config.connection)
+    return await dispatch("sync", project_id, lambda: run_sync(project_dir, client, config.dataset), background)
+
+
+@app.post("/api/sync/run-due")
+async def run_due_syncs_endpoint(project_id: str, background: bool = False) -> dict:
+    """Run every sync whose interval has elapsed; meant to be called by an external scheduler."""
+    project_dir = get_project_dir(project_id)
+
+    def run() -> dict:
+        results = []
+        for config in due_syncs(project_dir):
+            client = sqlserver_client(project_id, project_dir, config.connection)
+            results.append(run_sync(project_dir, client, config.dataset))
+        return {"results": results}
+
+    return await dispatch("sync", project_id, run, background)
+
+
+@app.put("/api/watches/{name}")
+async def save_watch_endpoint(project_id: str, name: str, payload: WatchRequest) -> dict:
+    project_dir = get_project_dir(project_id)
+    options = payload.dict()
+    config = WatchConfig(name=sanitize_name(name), dataset=options.pop("dataset_name"), **options)
+    try:
+        save_watch_config(project_dir, config)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return {"status": "saved", "name": config.name, "dataset": config.dataset}
+
+
+@app.get("/api/watches")
+async def list_watches_endpoint(project_id: str) -> dict:
+    project_dir = get_project_dir(project_id)
+    return {"watches": [{"config": entry["config"], **watch_manager.status(project_dir, name)} for name, entry in list_watches(project_dir).items()]}
+
+
+def watch_action(project_id: str, name: str, action: Callable[[Path, str], dict]) -> dict:
+    project_dir = get_project_dir(project_id)
+    try:
+        get_watch(project_dir, name)
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    try:
+        return action(project_dir, name)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@app.get("/api/watches/{name}")
+async def watch_status_endpoint(project_id: str, name: str) -> dict:
+    return await run_in_threadpool(watch_action, project_id, name, watch_manager.status)
+
+
+@app.post("/api/watches/{name}/start")
+async def start_watch_endpoint(project_id: str, name: str) -> dict:
+    return await run_in_threadpool(watch_action, project_id, name, watch_manager.start)
+
+
+@app.post("/api/watches/{name}/stop")
+async def stop_watch_endpoint(project_id: str, name: str) -> dict:
+    return await run_in_threadpool(watch_action, project_id, name, watch_manager.stop)
+
+
+@app.post("/api/watches/{name}/poll")
+async def poll_watch_endpoint(project_id: str, name: str) -> dict:
+    """Read and store everything appended so far without waiting for the batch interval."""
+    return await run_in_threadpool(watch_action, project_id, name, watch_manager.poll)
+
+
+@app.delete("/api/watches/{name}")
+async def delete_watch_endpoint(project_id: str, name: str) -> dict:
+    def delete(project_dir: Path, name: str) -> dict:
+        watch_manager.stop(project_dir, name)
+        delete_watch(project_dir, name)
+        return {"status": "deleted", "name": name}
+
+    return await run_in_threadpool(watch_action, project_id, name, delete)
+
+
+@app.post("/api/alarms/episodes")
+async def build_alarm_episodes_endpoint(project_id: str, payload: AlarmEpisodesRequest, background: bool = False) -> dict:
+    project_dir = get_project_dir(project_id)
+    options = payload.dict(exclude={"rebuild"}, exclude_none=True)
+    config = AlarmConfig(**{**options, "target": sanitize_name(payload.target)})
+
+    def run() -> dict:
+        try:
+            return update_alarm_episodes(project_dir, config, payload.rebuild)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    return await dispatch("alarm_episodes", project_id, run, background)
+
+
+async def alarm_query(fn: Callable[..., list[dict]], *args: Any, **kwargs: Any) -> dict:
+    try:
+        rows = await run_in_threadpool(fn, *args, **kwargs)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return {"rows": rows, "count": len(rows)}
+
+
+@app.get("/api/alarms/active")
+async def active_alarms_endpoint(
+    project_id: str, start: str, end: str, tag: str | None = None, limit: int = 10_000, target: str = "alarm_episodes"
+) -> dict:
+    """Alarm episodes that were active at any point between start and end."""
+    project_dir = get_project_dir(project_id)
+    return await alarm_query(active_alarms, project_dir, start, end, tag=tag, limit=limit, target=target)
+
+
+@app.get("/api/alarms/top")
+async def top_alarms_endpoint(
+    project_id: str, start: str | None = None, end: str | None = None, limit: int = 10, target: str = "alarm_episodes"
+) -> dict:
+    project_dir = get_project_dir(project_id)
+    return await alarm_query(top_alarms, project_dir, start, end, limit=limit, target=target)
+
+
+@app.get("/api/alarms/chattering")
+async def chattering_alarms_endpoint(
+    project_id: str,
+    start: str | None = None,
+    end: str | None = None,
+    window: str = "1 minute",
+    min_count: int = 3,
+    limit: int = 100,
+    target: str = "alarm_episodes",
+) -> dict:
+    project_dir = get_project_dir(project_id)
+    return await alarm_query(
+        chattering_alarms, project_dir, start, end, window=window, min_count=min_count, limit=limit, target=target
+    )
 
 
 @app.post("/api/recipes/run", response_model=RecipeRunResponse)
-async def run_recipe_endpoint(project_id: str, payload: RecipeRunRequest) -> RecipeRunResponse:
+async def run_recipe_endpoint(project_id: str, payload: RecipeRunRequest, background: bool = False) -> RecipeRunResponse:
     project_dir = get_project_dir(project_id)
-    recipe_path = ensure_path_within(Path(__file__).resolve().parent / "recipes", Path(__file__).resolve().parent / "recipes" / payload.recipe_name)
+    recipe_path = ensure_path_within(RECIPES_DIR, RECIPES_DIR / payload.recipe_name)
     if not recipe_path.exists():
         raise HTTPException(status_code=404, detail="Recipe not found")
-    result = run_recipe(project_dir, recipe_path, payload.parameters)
-    return RecipeRunResponse(status=result.status, logs=result.logs, outputs=result.outputs)
+    if background:
+        job = job_manager.submit("recipe", project_id, run_recipe, project_dir, recipe_path, payload.parameters, payload.use_cache)
+        return RecipeRunResponse(status="queued", logs=[], outputs=[], job_id=job.job_id)
+    result = await run_in_threadpool(run_recipe, project_dir, recipe_path, payload.parameters, payload.use_cache)
+    return RecipeRunResponse(
+        status=result.status, logs=result.logs, outputs=result.outputs, cached=result.cached, run_id=result.run_id
+    )
 
 
 @app.get("/api/recipes")
 async def list_recipes() -> dict:
-    recipes_dir = Path(__file__).resolve().parent / "recipes"
-    recipes = [path.name for path in recipes_dir.glob("*.py")]
+    recipes = [path.name for path in RECIPES_DIR.glob("*.py")]
     return {"recipes": recipes}
 
 
+@app.put("/api/pipelines/{name}")
+async def save_pipeline_endpoint(project_id: str, name: str, payload: PipelineRequest) -> dict:
+    """Define a pipeline: recipe steps with parameters and the tables each reads and writes."""
+    project_dir = get_project_dir(project_id)
+    steps = [PipelineStep(**step.dict()) for step in payload.steps]
+    try:
+        return await run_in_threadpool(save_pipeline, project_dir, name, steps, RECIPES_DIR)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@app.get("/api/pipelines")
+async def list_pipelines_endpoint(project_id: str) -> dict:
+    project_dir = get_project_dir(project_id)
+    return {"pipelines": list_pipelines(project_dir)}
+
+
+@app.get("/api/pipelines/{name}")
+async def get_pipeline_endpoint(project_id: str, name: str) -> dict:
+    project_dir = get_project_dir(project_id)
+    try:
+        return get_pipeline(project_dir, name)
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+
+
+@app.delete("/api/pipelines/{name}")
+async def delete_pipeline_endpoint(project_id: str, name: str) -> dict:
+    project_dir = get_project_dir(project_id)
+    removed = await run_in_threadpool(delete_pipeline, project_dir, name)
+    return {"status": "deleted" if removed else "not_found", "name": name}
+
+
+@app.post("/api/pipelines/{name}/run")
+async def run_pipeline_endpoint(project_id: str, name: str, force: bool = False, background: bool = False) -> dict:
+    """Run the steps whose upstream tables or definition changed, independent steps in parallel."""
+    project_dir = get_project_dir(project_id)
+
+    def run() -> dict:
+        try:
+            return run_pipeline(project_dir, name, RECIPES_DIR, force)
+        except ValueError as exc:
+            raise HTTPException(status_code=404, detail=str(exc)) from exc
+
+    return await dispatch("pipeline", project_id, run, background)
+
+
+@app.get("/api/recipes/history")
+async def recipe_history_endpoint(
+    project_id: str,
+    recipe: str | None = None,
+    status: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    offset: int = 0,
+    limit: int = Query(50, le=1000),
+    logs: bool = False,
+) -> dict:
+    """Recipe runs newest first with wall time, input tables and output row counts; logs only on request."""
+    project_dir = get_project_dir(project_id)
+    try:
+        return await run_in_threadpool(query_history, project_dir, recipe, status, since, until, offset, limit, logs)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@app.post("/api/recipes/history/compact")
+async def compact_recipe_history_endpoint(project_id: str) -> dict:
+    project_dir = get_project_dir(project_id)
+    return {"status": "compacted", **await run_in_threadpool(compact_history, project_dir)}
+
+
+@app.get("/api/recipes/cache")
+async def list_recipe_cache_endpoint(project_id: str) -> dict:
+    project_dir = get_project_dir(project_id)
+    entries = list_cache_entries(project_dir)
+    return {"entries": entries, "bytes": sum(entry["bytes"] for entry in entries)}
+
+
+@app.delete("/api/recipes/cache")
+async def clear_recipe_cache_endpoint(project_id: str, recipe_name: str | None = None) -> dict:
+    project_dir = get_project_dir(project_id)
+    return {"status": "cleared", "removed": clear_cache(project_dir, recipe_name)}
+
+
 @app.post("/api/reports")
-async def create_report(project_id: str, dataset: str = Form(...), title: str = Form("Report"), format: str = Form("html")) -> dict:
+async def create_report(
+    project_id: str,
+    dataset: str = Form(...),
+    title: str = Form("Report"),
+    format: str = Form("html"),
+    time_column: str | None = Form(None),
+    tag_column: str | None = Form(None),
+    value_columns: str | None = Form(None),
+    background: bool = Form(False),
+) -> dict:
+    """Report over the whole dataset; an unchanged dataset returns the stored report."""
     project_dir = get_project_dir(project_id)
     if format == "html":
-        report_path = generate_html_report(project_dir, dataset, title)
+        generate = generate_html_report
     elif format == "pdf":
-        report_path = generate_pdf_report(project_dir, dataset, title)
+        generate = generate_pdf_report
     else:
         raise HTTPException(status_code=400, detail="Unsupported report format")
-    return {"status": "created", "path": str(report_path)}
+
+    def run() -> dict:
+        try:
+            result = generate(
+                project_dir, dataset, title, time_column=time_column, tag_column=tag_column, value_columns=form_list(value_columns)
+            )
+        except ValueError as exc:
+            status_code = 404 if "not found" in str(exc) else 400
+            raise HTTPException(status_code=status_code, detail=str(exc)) from exc
+        return {"status": "cached" if result["cached"] else "created", **result}
+
+    return await dispatch("report", project_id, run, background)
 
 
 @app.get("/api/projects/{project_id}/export")
 async def export_project_bundle(project_id: str) -> dict:
     project_dir = get_project_dir(project_id)
     bundle_path = project_dir / f"{project_dir.name}.zip"
-    with zipfile.ZipFile(bundle_path, "w", zipfile.ZIP_DEFLATED) as archive:
-        for path in project_dir.rglob("*"):
-            if path.is_file() and path != bundle_path:
-                archive.write(path, path.relative_to(project_dir))
-    return {"status": "created", "path": str(bundle_path)}
+
+    def run() -> dict:
+        with checkpointed(project_dir), zipfile.ZipFile(bundle_path, "w", zipfile.ZIP_DEFLATED) as archive:
+            for path in project_dir.rglob("*"):
+                if path.is_file() and path != bundle_path:
+                    archive.write(path, path.relative_to(project_dir))
+        return {"status": "created", "path": str(bundle_path)}
+
+    return await run_in_threadpool(run)
+
+
+@app.get("/api/jobs")
+async def list_jobs_endpoint(project_id: str | None = None) -> dict:
+    return {"jobs": [job.as_dict(include_result=False) for job in job_manager.list(project_id)]}
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job_endpoint(job_id: str) -> dict:
+    try:
+        return job_manager.get(job_id).as_dict()
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail="Job not found") from exc
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job_endpoint(job_id: str) -> dict:
+    try:
+        return job_manager.cancel(job_id).as_dict(include_result=False)
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail="Job not found") from exc
+
+
+@app.put("/api/jobs/limits")
+async def set_job_limit_endpoint(project_id: str, limit: int) -> dict:
+    get_project_dir(project_id)
+    try:
+        job_manager.set_project_limit(project_id, limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return {"project_id": project_id, "limit": limit}
+
+
+@app.on_event("startup")
+def resume_watches() -> None:
+    watch_manager.resume(PROJECTS_DIR)
+
+
+@app.on_event("shutdown")
+def shutdown_jobs() -> None:
+    watch_manager.shutdown()
+    job_manager.shutdown()
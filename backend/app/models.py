@@ -23,15 +23,61 @@ class CsvImportOptions(BaseModel):
     decimal: Optional[str] = None
     timestamp_column: Optional[str] = None
     timezone: Optional[str] = None
+    engine: Optional[str] = None
+    rollups: bool = False
+    partition: Optional[str] = None
+    mode: str = "replace"
+    key: Optional[list[str]] = None
+
+
+class BulkImportOptions(BaseModel):
+    dataset_name: str
+    pattern: str = "*.csv"
+    delimiter: Optional[str] = None
+    decimal: Optional[str] = None
+    timestamp_column: Optional[str] = None
+    timezone: Optional[str] = None
+    mode: str = "append"
+    key: Optional[list[str]] = None
+    force: bool = False
+
+
+class TextLogImportOptions(BaseModel):
+    dataset_name: str = "text_logs"
+    template: Optional[str] = None
+    pattern: Optional[str] = None
+    timestamp_format: Optional[str] = None
+    timezone: Optional[str] = None
+    key_values: Optional[list[str]] = None
+    types: Optional[dict[str, str]] = None
+    encoding: Optional[str] = None
+    partition: Optional[str] = None
+    mode: str = "replace"
+    key: Optional[list[str]] = None
 
 
 class ExcelImportOptions(BaseModel):
     dataset_name: str
     sheet_name: Optional[str] = None
+    sheet_names: Optional[list[str]] = None
+    all_sheets: bool = False
     header_row: Optional[int] = 0
     start_row: Optional[int] = None
     timestamp_column: Optional[str] = None
     timezone: Optional[str] = None
+    mode: str = "replace"
+    key: Optional[list[str]] = None
+
+
+class RollupRequest(BaseModel):
+    time_column: str = "ts"
+    tag_column: Optional[str] = None
+    value_columns: Optional[list[str]] = None
+
+
+class StorageRequest(BaseModel):
+    time_column: str = "ts"
+    partition: Optional[str] = None
 
 
 class SqlServerConnection(BaseModel):
@@ -48,14 +94,76 @@ class SqlQueryRequest(BaseModel):
     connection_name: str
     query: str
     dataset_name: str
+    stream: bool = False
+    batch_size: int = Field(50_000, gt=0)
+    time_column: Optional[str] = None
+    start: Optional[str] = None
+    end: Optional[str] = None
+    partitions: int = Field(8, gt=0)
+    max_workers: int = Field(4, gt=0)
+    mode: str = "replace"
+    key: Optional[list[str]] = None
+
+
+class SqlSyncRequest(BaseModel):
+    connection_name: str
+    query: str
+    dataset_name: str
+    watermark_column: str = "ts"
+    interval_seconds: Optional[int] = Field(None, gt=0)
+
+
+class WatchRequest(BaseModel):
+    dataset_name: str
+    path: str
+    pattern: str = "*.log"
+    format: str = "csv"
+    delimiter: str = ","
+    encoding: str = "utf-8"
+    timestamp_column: Optional[str] = None
+    key: Optional[list[str]] = None
+    interval_seconds: float = Field(5.0, gt=0)
+    max_rows: int = Field(10_000, gt=0)
+    poll_seconds: float = Field(1.0, gt=0)
+
+
+class PipelineStepModel(BaseModel):
+    name: str
+    recipe: str
+    parameters: dict[str, Any] = Field(default_factory=dict)
+    inputs: list[str] = Field(default_factory=list)
+    outputs: list[str] = Field(default_factory=list)
+
+
+class PipelineRequest(BaseModel):
+    steps: list[PipelineStepModel]
+
+
+class AlarmEpisodesRequest(BaseModel):
+    source: str = "text_logs"
+    target: str = "alarm_episodes"
+    time_column: str = "ts"
+    level_column: str = "level"
+    message_column: str = "message"
+    tag_column: Optional[str] = None
+    tag_pattern: Optional[str] = None
+    raise_levels: Optional[list[str]] = None
+    clear_levels: Optional[list[str]] = None
+    clear_pattern: Optional[str] = None
+    clear_words: Optional[str] = None
+    rebuild: bool = False
 
 
 class RecipeRunRequest(BaseModel):
     recipe_name: str
     parameters: dict[str, Any] = Field(default_factory=dict)
+    use_cache: bool = True
 
 
 class RecipeRunResponse(BaseModel):
     status: str
     logs: list[str]
     outputs: list[str]
+    cached: bool = False
+    run_id: Optional[str] = None
+    job_id: Optional[str] = None
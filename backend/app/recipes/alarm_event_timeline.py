@@ -4,15 +4,25 @@ Förväntar sig en tabell "text_logs" med kolumner:
 - ts
 - level
 - message
+
+Tabellen skapas från råa textloggar med /api/import/text, t.ex. med mallen
+"{ts} [{level}] {message}".
+
+Bygger även larmepisoder (start, slut, varaktighet per tagg) i "alarm_episodes",
+som uppdateras inkrementellt när nya rader kommer in i text_logs.
 """
 
 import pandas as pd
 
-logs = load("text_logs")
-
-alarms = logs[logs["level"].str.upper().isin(["ALARM", "ERROR", "WARN"])].copy()
-alarms = alarms.sort_values("ts")
+alarms = load(
+    "text_logs",
+    where="upper(level) IN ('ALARM', 'ERROR', 'WARN')",
+    order_by="ts",
+)
 alarms["event_type"] = "alarm"
 
 save_table("alarm_timeline", alarms)
 log(f"Saved {len(alarms)} alarm events")
+
+episodes = alarm_episodes(rebuild=params.get("rebuild", False))
+log(f"Alarm episodes: {episodes['episodes']} ({episodes['new_episodes']} new)")
@@ -5,19 +5,13 @@ Förväntar sig tabeller:
 - csv_series (ts, value)
 """
 
-import pandas as pd
-
-sql_series = load("sql_series").sort_values("ts")
-csv_series = load("csv_series").sort_values("ts")
-
-merged = pd.merge_asof(
-    sql_series,
-    csv_series,
-    on="ts",
-    direction="nearest",
-    tolerance=pd.Timedelta("1s"),
-    suffixes=("_sql", "_csv"),
+rows = align_series(
+    [
+        {"table": "sql_series", "suffix": "_sql"},
+        {"table": "csv_series", "suffix": "_csv", "tolerance": params.get("tolerance", "1 second")},
+    ],
+    target="joined_time_sync",
+    direction=params.get("direction", "nearest"),
 )
 
-save_table("joined_time_sync", merged)
-log("Joined SQL Server and CSV series with nearest timestamp")
+log(f"Joined SQL Server and CSV series with nearest timestamp ({rows} rows)")
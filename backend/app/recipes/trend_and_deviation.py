@@ -3,19 +3,22 @@
 Förväntar sig en tabell "analog_signal" med kolumner:
 - ts
 - value
-"""
+- (valfritt) tag, ange params["partition_by"] = ["tag"] för många signaler
 
-import pandas as pd
+Fönster anges som antal rader (params["window"]) eller tid (params["window_interval"], t.ex. "10 minutes").
+"""
 
-window = int(params.get("window", 60))
+window_interval = params.get("window_interval")
+window = None if window_interval else int(params.get("window", 60))
 threshold = float(params.get("threshold", 3.0))
 
-signal = load("analog_signal").sort_values("ts")
-signal["rolling_mean"] = signal["value"].rolling(window=window, min_periods=1).mean()
-signal["rolling_std"] = signal["value"].rolling(window=window, min_periods=1).std().fillna(0)
-
-signal["zscore"] = (signal["value"] - signal["rolling_mean"]) / signal["rolling_std"].replace(0, 1)
-signal["is_outlier"] = signal["zscore"].abs() > threshold
-
-save_table("analog_trend_outliers", signal)
-log("Computed rolling stats and outliers")
+rows = rolling_stats(
+    "analog_signal",
+    target="analog_trend_outliers",
+    partition_by=params.get("partition_by"),
+    window=window,
+    window_interval=window_interval,
+    threshold=threshold,
+    incremental=bool(params.get("incremental", False)),
+)
+log(f"Computed rolling stats and outliers for {rows} rows")
@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+from app.db.duckdb_store import (
+    bump_version,
+    connect,
+    load_metadata,
+    quote_identifier,
+    table_exists,
+    update_metadata,
+    write_connection,
+)
+from app.services.rolling import INTERVAL_PATTERN
+
+EPISODES_TABLE = "alarm_episodes"
+EPISODE_COLUMNS = ["tag", "start_ts", "end_ts", "duration_s", "message"]
+CLEAR_PATTERN = r"(?i)\b(cleared|returned to normal)\b"
+# Words removed from messages to derive a tag, so raise and clear texts reduce to the same tag.
+CLEAR_WORDS = r"(?i)\b(cleared|clear|reset|returned to normal|normal)\b"
+
+
+@dataclass
+class AlarmConfig:
+    """How alarm rows in a log table are turned into episodes.
+
+    A row is a clear when its level is in clear_levels, or when its level is not a raise level and
+    its message matches clear_pattern; a row with a raise level is otherwise a raise, so "ALARM
+    Temperature above normal" stays an alarm. Other rows are plain events. Without a tag_column the
+    tag is taken from tag_pattern (first group) or is the message with clear_words removed, so
+    "Pump P1 tripped" and "Pump P1 tripped cleared" pair up.
+    """
+
+    source: str = "text_logs"
+    target: str = EPISODES_TABLE
+    time_column: str = "ts"
+    level_column: str = "level"
+    message_column: str = "message"
+    tag_column: str | None = None
+    tag_pattern: str | None = None
+    raise_levels: list[str] = field(default_factory=lambda: ["ALARM", "ERROR", "WARN"])
+    clear_levels: list[str] = field(default_factory=lambda: ["CLEAR", "CLEARED", "OK", "NORMAL", "RESET"])
+    clear_pattern: str = CLEAR_PATTERN
+    clear_words: str = CLEAR_WORDS
+
+
+def _levels(levels: list[str]) -> str:
+    quoted = ", ".join("'" + level.upper().replace("'", "''") + "'" for level in levels)
+    return quoted or "NULL"
+
+
+def _states_sql(config: AlarmConfig, lower: Any, upper: Any) -> tuple[str, list[Any]]:
+    """Raise/clear rows of the source in (lower, upper] as (tag, ts, message, state)."""
+    ts = quote_identifier(config.time_column)
+    level = f"upper({quote_identifier(config.level_column)})"
+    message = quote_identifier(config.message_column)
+    if config.tag_column:
+        tag, params = f"CAST({quote_identifier(config.tag_column)} AS VARCHAR)", []
+    elif config.tag_pattern:
+        tag, params = f"regexp_extract({message}, ?, 1)", [config.tag_pattern]
+    else:
+        tag = f"trim(regexp_replace(regexp_replace({message}, ?, '', 'g'), '\\s+', ' ', 'g'))"
+        params = [config.clear_words]
+    raised = f"{level} IN ({_levels(config.raise_levels)})"
+    is_clear = (
+        f"({level} IN ({_levels(config.clear_levels)})"
+        f" OR (coalesce(NOT {raised}, true) AND coalesce(regexp_matches({message}, ?), false)))"
+    )
+    params.append(config.clear_pattern)
+    conditions = [f"{ts} IS NOT NULL"]
+    if lower is not None:
+        conditions.append(f"{ts} > ?")
+        params.append(lower)
+    if upper is not None:
+        conditions.append(f"{ts} <= ?")
+        params.append(upper)
+    sql = f"""
+        SELECT * FROM (
+            SELECT {tag} AS tag, {ts} AS ts, {message} AS message,
+                CASE WHEN {is_clear} THEN 'clear' WHEN {raised} THEN 'raise' END AS state
+            FROM {quote_identifier(config.source)}
+            WHERE {' AND '.join(conditions)}
+        ) WHERE state IS NOT NULL
+    """
+    return sql, params
+
+
+def _episodes_sql(states: str) -> str:
+    """Pair each raise that follows a non-raise with the next clear of the same tag.
+
+    Repeated raises while an alarm is active and clears without an active alarm are dropped, so
+    the remaining rows alternate raise/clear per tag and lead() gives each episode's end.
+    """
+    return f"""
+        SELECT tag, start_ts, end_ts, epoch(end_ts - start_ts) AS duration_s, message
+        FROM (
+            SELECT tag, ts AS start_ts, state, message,
+                lead(ts) OVER (PARTITION BY tag ORDER BY ts, state DESC) AS end_ts
+            FROM (
+                SELECT *, lag(state) OVER (PARTITION BY tag ORDER BY ts, state DESC) AS previous
+                FROM ({states})
+            )
+            WHERE (state = 'raise' AND previous IS DISTINCT FROM 'raise') OR (state = 'clear' AND previous = 'raise')
+        )
+        WHERE state = 'raise'
+        ORDER BY start_ts
+    """
+
+
+def _time_param(value: Any) -> Any:
+    return pd.Timestamp(value).to_pydatetime() if isinstance(value, str) else value
+
+
+def _alarm_state(project_dir: Path, target: str) -> dict[str, Any]:
+    state = load_metadata(project_dir).get("alarms", {}).get(target)
+    if not state:
+        raise ValueError(f"No alarm episodes built for '{target}'")
+    return state
+
+
+def update_alarm_episodes(project_dir: Path, config: AlarmConfig | None = None, rebuild: bool = False) -> dict[str, Any]:
+    """Build or extend the episode table from source rows newer than the last processed timestamp.
+
+    Open episodes are taken out and fed back in as raises so new clears can close them. Rows that
+    arrive with a timestamp at or before the watermark are only picked up by a rebuild.
+    """
+    config = config or AlarmConfig()
+    metadata = load_metadata(project_dir)
+    previous = metadata.get("alarms", {}).get(config.target)
+    if previous and previous["config"] != asdict(config):
+        rebuild = True
+    target = quote_identifier(config.target)
+    with write_connection(project_dir) as conn:
+        if not table_exists(conn, config.source):
+            raise ValueError(f"Dataset '{config.source}' not found")
+        upper = conn.execute(f"SELECT max({quote_identifier(config.time_column)}) FROM {quote_identifier(config.source)}").fetchone()[0]
+        incremental = bool(previous) and not rebuild and table_exists(conn, config.target)
+        lower = _time_param(previous["watermark"]) if incremental and previous["watermark"] else None
+        if incremental and (upper is None or (lower is not None and upper <= lower)):
+            return {"target": config.target, "new_episodes": 0, "episodes": previous["episodes"], "rebuilt": False}
+
+        states, params = _states_sql(config, lower, upper)
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            if incremental:
+                before = conn.execute(f"SELECT count(*) FROM {target}").fetchone()[0]
+                seeds = conn.execute(f"DELETE FROM {target} WHERE end_ts IS NULL RETURNING tag, start_ts, message").fetchdf()
+                conn.register("_alarm_seeds", seeds)
+                states = f"{states} UNION ALL SELECT tag, start_ts AS ts, message, 'raise' AS state FROM _alarm_seeds"
+                conn.execute(f"INSERT INTO {target} {_episodes_sql(states)}", params)
+                conn.unregister("_alarm_seeds")
+            else:
+                before = 0
+                conn.execute(f"CREATE OR REPLACE TABLE {target} AS {_episodes_sql(states)}", params)
+                conn.execute(f"CREATE INDEX {quote_identifier(config.target + '_tag_idx')} ON {target} (tag)")
+            bump_version(conn, config.target)
+            totals = conn.execute(f"SELECT count(*), max(duration_s) FROM {target}").fetchone()
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    with update_metadata(project_dir) as metadata:
+        metadata.setdefault("alarms", {})[config.target] = {
+            "config": asdict(config),
+            "watermark": upper.isoformat() if upper is not None else None,
+            "episodes": totals[0],
+            "max_duration_s": totals[1] or 0.0,
+        }
+    return {"target": config.target, "new_episodes": totals[0] - before, "episodes": totals[0], "rebuilt": not incremental}
+
+
+def _rows(conn: Any, sql: str, params: list[Any]) -> list[dict[str, Any]]:
+    cursor = conn.execute(sql, params)
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def active_alarms(
+    project_dir: Path,
+    start: Any,
+    end: Any,
+    tag: str | None = None,
+    limit: int = 10_000,
+    target: str = EPISODES_TABLE,
+) -> list[dict[str, Any]]:
+    """Episodes overlapping [start, end]; still-open episodes count as active until now.
+
+    The table is sorted on start_ts, so bounding start_ts from below by the longest episode lets
+    DuckDB skip row groups instead of scanning for end_ts >= start.
+    """
+    state = _alarm_state(project_dir, target)
+    start, end = _time_param(start), _time_param(end)
+    earliest = start - pd.Timedelta(seconds=state["max_duration_s"]).to_pytimedelta()
+    tag_filter = " AND tag = ?" if tag else ""
+    tag_params = [tag] if tag else []
+    columns = ", ".join(EPISODE_COLUMNS)
+    sql = f"""
+        SELECT {columns} FROM {quote_identifier(target)}
+        WHERE start_ts >= ? AND start_ts <= ? AND end_ts >= ?{tag_filter}
+        UNION ALL
+        SELECT {columns} FROM {quote_identifier(target)}
+        WHERE end_ts IS NULL AND start_ts <= ?{tag_filter}
+        ORDER BY start_ts
+        LIMIT {int(limit)}
+    """
+    with connect(project_dir) as conn:
+        return _rows(conn, sql, [earliest, end, start, *tag_params, end, *tag_params])
+
+
+def _range_filter(start: Any, end: Any) -> tuple[str, list[Any]]:
+    conditions, params = [], []
+    if start is not None:
+        conditions.append("start_ts >= ?")
+        params.append(_time_param(start))
+    if end is not None:
+        conditions.append("start_ts < ?")
+        params.append(_time_param(end))
+    return (f"WHERE {' AND '.join(conditions)}" if conditions else ""), params
+
+
+def top_alarms(
+    project_dir: Path, start: Any = None, end: Any = None, limit: int = 10, target: str = EPISODES_TABLE
+) -> list[dict[str, Any]]:
+    """Most frequent alarms by number of episodes starting in the range."""
+    _alarm_state(project_dir, target)
+    where, params = _range_filter(start, end)
+    sql = f"""
+        SELECT tag, count(*) AS episodes, sum(duration_s) AS total_duration_s, avg(duration_s) AS mean_duration_s,
+            count(*) FILTER (WHERE end_ts IS NULL) AS active, max(start_ts) AS last_start
+        FROM {quote_identifier(target)} {where}
+        GROUP BY tag
+        ORDER BY episodes DESC, tag
+        LIMIT {int(limit)}
+    """
+    with connect(project_dir) as conn:
+        return _rows(conn, sql, params)
+
+
+def chattering_alarms(
+    project_dir: Path,
+    start: Any = None,
+    end: Any = None,
+    window: str = "1 minute",
+    min_count: int = 3,
+    limit: int = 100,
+    target: str = EPISODES_TABLE,
+) -> list[dict[str, Any]]:
+    """Tags that were raised at least min_count times within one sliding window."""
+    _alarm_state(project_dir, target)
+    if not INTERVAL_PATTERN.match(window):
+        raise ValueError(f"Invalid window: {window}")
+    where, params = _range_filter(start, end)
+    sql = f"""
+        SELECT tag, max(in_window) AS max_in_window, count(*) AS episodes, min(start_ts) AS first_start, max(start_ts) AS last_start
+        FROM (
+            SELECT tag, start_ts,
+                count(*) OVER (PARTITION BY tag ORDER BY start_ts RANGE BETWEEN INTERVAL '{window.strip()}' PRECEDING AND CURRENT ROW) AS in_window
+            FROM {quote_identifier(target)} {where}
+        )
+        GROUP BY tag
+        HAVING max(in_window) >= ?
+        ORDER BY max_in_window DESC, tag
+        LIMIT {int(limit)}
+    """
+    with connect(project_dir) as conn:
+        return _rows(conn, sql, [*params, int(min_count)])
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+from app.db.duckdb_store import connect, quote_identifier, save_query
+from app.services.rolling import INTERVAL_PATTERN
+
+DIRECTIONS = {"backward", "forward", "nearest"}
+
+
+@dataclass
+class AlignSource:
+    table: str
+    time_column: str = "ts"
+    value_columns: list[str] | None = None
+    tolerance: str | float | None = None
+    suffix: str | None = None
+
+    @classmethod
+    def from_value(cls, value: AlignSource | dict[str, Any] | str) -> AlignSource:
+        if isinstance(value, AlignSource):
+            return value
+        if isinstance(value, str):
+            return cls(table=value)
+        return cls(**value)
+
+    @property
+    def column_suffix(self) -> str:
+        return self.suffix if self.suffix is not None else f"_{self.table}"
+
+
+def _interval(value: str | float) -> str:
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if not INTERVAL_PATTERN.match(value):
+        raise ValueError(f"Invalid interval: {value}")
+    return f"INTERVAL '{value.strip()}'"
+
+
+def _resolve_columns(project_dir: Path, sources: list[AlignSource]) -> None:
+    with connect(project_dir) as conn:
+        for source in sources:
+            if source.value_columns is None:
+                rows = conn.execute(f"DESCRIBE {quote_identifier(source.table)}").fetchall()
+                source.value_columns = [row[0] for row in rows if row[0] != source.time_column]
+
+
+def _source_sql(source: AlignSource, with_next: bool) -> str:
+    time_column = quote_identifier(source.time_column)
+    columns = [f"{quote_identifier(column)} AS {quote_identifier(column)}" for column in source.value_columns or []]
+    if with_next:
+        # Carry the successor row so one backward ASOF join also yields the forward match.
+        columns.append(f"lead({time_column}) OVER w AS _next_t")
+        columns.extend(
+            f"lead({quote_identifier(column)}) OVER w AS {quote_identifier('_next_' + column)}"
+            for column in source.value_columns or []
+        )
+    window = f" WINDOW w AS (ORDER BY {time_column})" if with_next else ""
+    return f"SELECT {time_column} AS _t{''.join(', ' + column for column in columns)} FROM {quote_identifier(source.table)}{window}"
+
+
+def _match_sql(source: AlignSource, direction: str, ts: str) -> str:
+    """Match one source against the base timeline, returning its columns in base order."""
+    with_next = direction != "backward"
+    joins = f"ASOF LEFT JOIN ({_source_sql(source, with_next)}) b ON base.{ts} >= b._t"
+    if with_next:
+        first = f"SELECT {quote_identifier(source.time_column)} AS _t, * FROM {quote_identifier(source.table)} ORDER BY 1 LIMIT 1"
+        joins += f" LEFT JOIN ({first}) first ON TRUE"
+    back_distance = f"(base.{ts} - b._t)"
+    ahead_t = "CASE WHEN b._t = base.{ts} THEN b._t WHEN b._t IS NULL THEN first._t ELSE b._next_t END".format(ts=ts)
+    ahead_distance = f"(({ahead_t}) - base.{ts})"
+    use_back = f"(({ahead_t}) IS NULL OR (b._t IS NOT NULL AND {back_distance} <= {ahead_distance}))"
+    select = []
+    for column in source.value_columns or []:
+        quoted = quote_identifier(column)
+        back_value = f"b.{quoted}"
+        ahead_value = (
+            f"CASE WHEN b._t = base.{ts} THEN b.{quoted} WHEN b._t IS NULL THEN first.{quoted} "
+            f"ELSE b.{quote_identifier('_next_' + column)} END"
+        )
+        if direction == "backward":
+            value, distance = back_value, back_distance
+        elif direction == "forward":
+            value, distance = ahead_value, ahead_distance
+        else:
+            value = f"CASE WHEN {use_back} THEN {back_value} ELSE {ahead_value} END"
+            distance = f"CASE WHEN {use_back} THEN {back_distance} ELSE {ahead_distance} END"
+        if source.tolerance is not None:
+            value = f"CASE WHEN {distance} <= {_interval(source.tolerance)} THEN {value} END"
+        select.append(f"{value} AS {quote_identifier(column + source.column_suffix)}")
+    return f"SELECT {', '.join(select)} FROM (SELECT {ts} FROM base) base {joins} ORDER BY base.{ts}"
+
+
+def alignment_sql(
+    sources: list[AlignSource],
+    direction: str = "nearest",
+    grid: str | None = None,
+    start: Any = None,
+    end: Any = None,
+    time_column: str = "ts",
+) -> tuple[str, list[Any]]:
+    """SQL that aligns N sources on the first source's timestamps, or on a fixed grid, with DuckDB ASOF joins."""
+    if direction not in DIRECTIONS:
+        raise ValueError(f"Unsupported direction: {direction}")
+    if not sources:
+        raise ValueError("At least one source is required")
+    ts = quote_identifier(time_column)
+    params: list[Any] = []
+
+    if grid:
+        bounds = [f"SELECT {quote_identifier(s.time_column)} AS t FROM {quote_identifier(s.table)}" for s in sources]
+        lower = "?" if start is not None else f"(SELECT min(t) FROM ({' UNION ALL '.join(bounds)}))"
+        upper = "?" if end is not None else f"(SELECT max(t) FROM ({' UNION ALL '.join(bounds)}))"
+        params = [value for value in (start, end) if value is not None]
+        params = [pd.Timestamp(value).to_pydatetime() if isinstance(value, str) else value for value in params]
+        base = f"SELECT unnest(generate_series({lower}, {upper}, {_interval(grid)})) AS {ts}"
+        matched = sources
+    else:
+        first = sources[0]
+        columns = ", ".join(
+            f"{quote_identifier(column)} AS {quote_identifier(column + first.column_suffix)}"
+            for column in first.value_columns or []
+        )
+        base = f"SELECT {quote_identifier(first.time_column)} AS {ts}{', ' + columns if columns else ''} FROM {quote_identifier(first.table)}"
+        conditions = []
+        if start is not None:
+            conditions.append(f"{ts} >= ?")
+            params.append(pd.Timestamp(start).to_pydatetime() if isinstance(start, str) else start)
+        if end is not None:
+            conditions.append(f"{ts} < ?")
+            params.append(pd.Timestamp(end).to_pydatetime() if isinstance(end, str) else end)
+        if conditions:
+            base = f"SELECT * FROM ({base}) WHERE {' AND '.join(conditions)}"
+        matched = sources[1:]
+
+    joins = "".join(f" POSITIONAL JOIN ({_match_sql(source, direction, ts)})" for source in matched)
+    sql = f"WITH base AS MATERIALIZED ({base}) SELECT * FROM (SELECT * FROM base ORDER BY {ts}){joins}"
+    return sql, params
+
+
+def align_series(
+    project_dir: Path,
+    sources: list[AlignSource | dict[str, Any] | str],
+    target: str | None = None,
+    direction: str = "nearest",
+    grid: str | None = None,
+    start: Any = None,
+    end: Any = None,
+    time_column: str = "ts",
+) -> pd.DataFrame | int:
+    """Align sources into one wide table; writes `target` and returns its row count when given."""
+    resolved = [AlignSource.from_value(source) for source in sources]
+    _resolve_columns(project_dir, resolved)
+    sql, params = alignment_sql(resolved, direction, grid, start, end, time_column)
+    if target:
+        return save_query(project_dir, target, sql, params)
+    with connect(project_dir) as conn:
+        return conn.execute(sql, params).fetchdf()
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import fnmatch
+import shutil
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import duckdb
+
+from app.db.duckdb_store import connect, list_tables, load_metadata, quote_identifier, register_datasets, save_query
+from app.services.importer import ImportResult, csv_select, detect_csv_format, finish_import, import_target
+from app.services.jobs import report_progress
+from app.services.uploads import StoredUpload, record_imports
+from app.settings import IMPORT_HASH_WORKERS, IMPORT_ROOTS, UPLOAD_CHUNK_SIZE
+from app.utils.file_utils import ensure_path_within, hash_file, sanitize_name
+
+SOURCE_FILE_COLUMN = "source_file"
+
+
+def ensure_import_root(path: Path) -> Path:
+    """Resolve a server-local path, refusing anything outside IMPORT_ROOTS."""
+    resolved = path.resolve()
+    if not any(resolved == allowed.resolve() or allowed.resolve() in resolved.parents for allowed in IMPORT_ROOTS):
+        raise ValueError("Path is outside the allowed import roots")
+    return resolved
+
+
+def match_files(root: Path, pattern: str) -> list[Path]:
+    """Files below root matching a relative glob; patterns and symlinks leading out of root are refused."""
+    if not pattern or Path(pattern).is_absolute() or ".." in Path(pattern).parts:
+        raise ValueError(f"Invalid file pattern: {pattern}")
+    matches = []
+    for path in sorted(root.glob(pattern)):
+        if not path.is_file():
+            continue
+        try:
+            ensure_path_within(root, path)
+        except ValueError:
+            continue
+        matches.append(path)
+    return matches
+
+
+def directory_files(directory: Path, pattern: str = "*.csv") -> list[tuple[str, Path]]:
+    """Files under a server-local directory matching a glob ("**/*.csv" recurses), by relative name."""
+    root = ensure_import_root(directory)
+    if not root.is_dir():
+        raise ValueError(f"Directory not found: {directory}")
+    return [(path.relative_to(root).as_posix(), path) for path in match_files(root, pattern)]
+
+
+def extract_zip(archive: Path, destination: Path, pattern: str = "*.csv") -> list[tuple[str, Path]]:
+    """Unpack the archive members matching pattern (in any folder) below destination."""
+    try:
+        zipped = zipfile.ZipFile(archive)
+    except zipfile.BadZipFile as exc:
+        raise ValueError("Upload is not a ZIP archive") from exc
+    files = []
+    with zipped:
+        for info in zipped.infolist():
+            if info.is_dir() or not fnmatch.fnmatch(info.filename, pattern):
+                continue
+            target = ensure_path_within(destination, destination / info.filename)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with zipped.open(info) as source, target.open("wb") as handle:
+                shutil.copyfileobj(source, handle, UPLOAD_CHUNK_SIZE)
+            files.append((info.filename, target))
+    return sorted(files)
+
+
+def _hash(path: Path) -> tuple[str, int] | OSError:
+    try:
+        return hash_file(path), path.stat().st_size
+    except OSError as exc:
+        return exc
+
+
+def _header(path: Path) -> bytes:
+    with path.open("rb") as handle:
+        return handle.readline().strip()
+
+
+def _groups(files: list[StoredUpload], by_header: bool) -> list[list[StoredUpload]]:
+    """Files sharing a header line are read by one scan; DuckDB's union_by_name re-sniffs every file
+    against every other and gets slow with thousands of files, so groups are unioned in SQL instead."""
+    if not by_header:
+        return [[upload] for upload in files]
+    groups: dict[bytes, list[StoredUpload]] = {}
+    for upload in files:
+        groups.setdefault(_header(upload.path), []).append(upload)
+    return list(groups.values())
+
+
+def _load(
+    project_dir: Path,
+    target: str,
+    root: Path,
+    groups: list[list[StoredUpload]],
+    delimiter: str,
+    decimal: str,
+    options: dict[str, Any],
+) -> dict[str, int]:
+    reader = "SELECT * FROM read_csv(?, delim=?, decimal_separator=?, header=true, filename=true)"
+    params: list[Any] = []
+    for group in groups:
+        params += [[str(upload.path) for upload in group], delimiter, decimal]
+    source = "(" + " UNION ALL BY NAME ".join([reader] * len(groups)) + ")"
+    select, params = csv_select(project_dir, source, params, options)
+    # DuckDB reports absolute paths; keep the name inside the archive or directory instead.
+    prefix = len(str(root.resolve())) + 2
+    save_query(
+        project_dir,
+        target,
+        f"SELECT * EXCLUDE (filename), substr(filename, {prefix}) AS {quote_identifier(SOURCE_FILE_COLUMN)} FROM ({select})",
+        params,
+    )
+    with connect(project_dir) as conn:
+        rows = conn.execute(f"SELECT {quote_identifier(SOURCE_FILE_COLUMN)}, count(*) FROM {quote_identifier(target)} GROUP BY ALL").fetchall()
+    return dict(rows)
+
+
+def _file_error(project_dir: Path, upload: StoredUpload, delimiter: str, decimal: str) -> str | None:
+    try:
+        with connect(project_dir) as conn:
+            conn.execute("SELECT count(*) FROM read_csv(?, delim=?, decimal_separator=?, header=true)", [str(upload.path), delimiter, decimal]).fetchall()
+    except duckdb.Error as exc:
+        return str(exc).splitlines()[0]
+    return None
+
+
+def import_csv_files(project_dir: Path, root: Path, files: list[tuple[str, Path]], options: dict[str, Any]) -> ImportResult:
+    """Import many CSV files below root into one dataset, with a source_file column per row.
+
+    Files whose content hash was already imported into the dataset (or repeats within the batch)
+    are skipped unless force is set. The default mode is append; see importer.finish_import.
+    Files are read by DuckDB's multi-file reader, one scan per distinct header, and the scans are
+    unioned by name. When that fails, each file is checked on its own, failing files are reported
+    and the rest are imported.
+    """
+    started = time.perf_counter()
+    dataset_name = sanitize_name(options["dataset_name"])
+    options = {**options, "mode": options.get("mode") or "append"}
+    target = import_target(project_dir, dataset_name, options)
+    if not files:
+        raise ValueError("No files matched")
+
+    report_progress(0.0, f"Hashing {len(files)} files")
+    with ThreadPoolExecutor(max_workers=IMPORT_HASH_WORKERS) as pool:
+        hashes = list(pool.map(_hash, [path for _, path in files]))
+    previous = load_metadata(project_dir).get("imports", {})
+    skip_known = not options.get("force") and options["mode"] != "replace" and dataset_name in list_tables(project_dir)
+    statuses: dict[str, dict[str, Any]] = {}
+    pending: list[StoredUpload] = []
+    seen: set[str] = set()
+    for (name, path), hashed in zip(files, hashes):
+        if isinstance(hashed, OSError):
+            statuses[name] = {"file": name, "status": "error", "error": str(hashed)}
+            continue
+        sha256, size = hashed
+        known = skip_known and dataset_name in previous.get(sha256, {}).get("datasets", [])
+        if known or sha256 in seen:
+            statuses[name] = {"file": name, "status": "skipped", "sha256": sha256}
+            continue
+        seen.add(sha256)
+        pending.append(StoredUpload(path=path, filename=name, sha256=sha256, size=size))
+        statuses[name] = {"file": name, "status": "imported", "sha256": sha256, "bytes": size}
+
+    merged = None
+    if pending:
+        report_progress(0.2, f"Reading {len(pending)} files")
+        delimiter = options.get("delimiter") or detect_csv_format(pending[0].path)["delimiter"]
+        decimal = options.get("decimal") or "."
+        try:
+            counts = _load(project_dir, target, root, _groups(pending, True), delimiter, decimal, options)
+        except duckdb.Error:
+            report_progress(0.4, "Checking files one by one")
+            failed = {upload.filename: _file_error(project_dir, upload, delimiter, decimal) for upload in pending}
+            for name, error in failed.items():
+                if error:
+                    statuses[name].update(status="error", error=error)
+            pending = [upload for upload in pending if not failed[upload.filename]]
+            counts = {}
+            if pending:
+                try:
+                    counts = _load(project_dir, target, root, _groups(pending, True), delimiter, decimal, options)
+                except duckdb.Error:
+                    # Same header but different column types across files: sniff every file on its own.
+                    counts = _load(project_dir, target, root, _groups(pending, False), delimiter, decimal, options)
+        for upload in pending:
+            statuses[upload.filename]["rows"] = counts.get(upload.filename, 0)
+        if pending:
+            report_progress(0.8, "Merging into dataset")
+            merged = finish_import(project_dir, dataset_name, target, options)
+            record_imports(project_dir, pending, [dataset_name], options)
+            register_datasets(project_dir, [dataset_name])
+
+    seconds = time.perf_counter() - started
+    results = list(statuses.values())
+    rows = sum(item.get("rows", 0) for item in results if item["status"] == "imported")
+    size = sum(item.get("bytes", 0) for item in results if item["status"] == "imported")
+    return ImportResult(
+        dataset_name=dataset_name,
+        mode=options["mode"],
+        files=results,
+        imported=sum(item["status"] == "imported" for item in results),
+        skipped=sum(item["status"] == "skipped" for item in results),
+        errors=sum(item["status"] == "error" for item in results),
+        rows=rows,
+        bytes=size,
+        seconds=round(seconds, 3),
+        rows_per_second=round(rows / seconds, 1) if seconds else 0.0,
+        mb_per_second=round(size / 1024**2 / seconds, 2) if seconds else 0.0,
+        merged=merged,
+        tables=list_tables(project_dir),
+    )
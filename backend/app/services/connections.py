@@ -1,9 +1,25 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Optional
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterator, Optional
 
-from app.db.duckdb_store import load_metadata, save_metadata
+import pandas as pd
+
+from app.db.duckdb_store import (
+    connect,
+    load_metadata,
+    quote_identifier,
+    save_batches,
+    table_exists,
+    update_metadata,
+    write_connection,
+)
+from app.services.query_runner import DEFAULT_BATCH_SIZE, BatchQueryClient, strip_order_by
+from app.services.rollups import refresh_rollups
+from app.services.storage import drop_staging, merge_staging, staging_table
+from app.utils.file_utils import sanitize_name
 
 
 @dataclass
@@ -18,19 +34,16 @@ class SqlServerConnectionInfo:
 
 
 def save_sqlserver_connection(project_dir, connection: SqlServerConnectionInfo) -> None:
-    metadata = load_metadata(project_dir)
-    connections = metadata.get("connections", {})
-    connections[connection.name] = {
-        "type": "sqlserver",
-        "host": connection.host,
-        "port": connection.port,
-        "database": connection.database,
-        "username": connection.username,
-        "password": connection.password,
-        "trusted": connection.trusted,
-    }
-    metadata["connections"] = connections
-    save_metadata(project_dir, metadata)
+    with update_metadata(project_dir) as metadata:
+        metadata.setdefault("connections", {})[connection.name] = {
+            "type": "sqlserver",
+            "host": connection.host,
+            "port": connection.port,
+            "database": connection.database,
+            "username": connection.username,
+            "password": connection.password,
+            "trusted": connection.trusted,
+        }
 
 
 def get_sqlserver_connection(project_dir, name: str) -> SqlServerConnectionInfo:
@@ -47,3 +60,154 @@ def get_sqlserver_connection(project_dir, name: str) -> SqlServerConnectionInfo:
         password=config.get("password"),
         trusted=config.get("trusted", False),
     )
+
+
+@dataclass
+class SyncConfig:
+    dataset: str
+    connection: str
+    query: str
+    watermark_column: str
+    interval_seconds: Optional[int] = None
+    watermark: Any = None
+    last_run: Optional[str] = None
+    last_rows: Optional[int] = None
+
+
+def save_sync_config(project_dir, config: SyncConfig) -> None:
+    with update_metadata(project_dir) as metadata:
+        syncs = metadata.setdefault("syncs", {})
+        previous = syncs.get(config.dataset, {})
+        entry = asdict(config)
+        # Re-registering a sync keeps its progress unless the source definition changed.
+        if previous.get("query") == config.query and previous.get("watermark_column") == config.watermark_column:
+            for key in ("watermark", "last_run", "last_rows"):
+                entry[key] = previous.get(key)
+        syncs[config.dataset] = entry
+
+
+def get_sync_config(project_dir, dataset: str) -> SyncConfig:
+    config = load_metadata(project_dir).get("syncs", {}).get(dataset)
+    if not config:
+        raise ValueError(f"Sync for dataset '{dataset}' not found")
+    return SyncConfig(**config)
+
+
+def list_sync_configs(project_dir) -> list[SyncConfig]:
+    return [SyncConfig(**config) for config in load_metadata(project_dir).get("syncs", {}).values()]
+
+
+def _watermark_value(value: Any) -> Any:
+    if value is None or (not isinstance(value, (bytes, bytearray)) and pd.isna(value)):
+        return None
+    if isinstance(value, (bytes, bytearray)):
+        # SQL Server rowversion columns arrive as 8 big-endian bytes.
+        return int.from_bytes(value, "big")
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return pd.Timestamp(value).isoformat(sep=" ")
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+def _watermark_param(value: Any) -> Any:
+    """The high-water mark as a bound parameter: times stay datetimes so the driver converts them."""
+    if isinstance(value, (pd.Timestamp, datetime)) and not pd.isna(value):
+        return pd.Timestamp(value).to_pydatetime()
+    return _watermark_value(value)
+
+
+def build_incremental_query(query: str, watermark_column: str, watermark: Any) -> tuple[str, list[Any]]:
+    """The sync query for rows at or after the watermark, with the watermark as a `?` parameter."""
+    query = strip_order_by(query)
+    column = quote_identifier(watermark_column)
+    sql, params = f"SELECT * FROM ({query}) AS src", []
+    if watermark is not None:
+        sql += f" WHERE src.{column} >= ?"
+        params.append(_watermark_param(watermark))
+    return f"{sql} ORDER BY src.{column}", params
+
+
+def _drop_synced_rows(project_dir, dataset: str, staging: str, column: str, watermark: Any) -> None:
+    """Drop fetched rows at the watermark instant that the dataset already holds."""
+    table, staged, ts = quote_identifier(dataset), quote_identifier(staging), quote_identifier(column)
+    with write_connection(project_dir) as conn:
+        stored = {row[0] for row in conn.execute(f"DESCRIBE {table}").fetchall()}
+        columns = [row[0] for row in conn.execute(f"DESCRIBE {staged}").fetchall() if row[0] in stored]
+        match = " AND ".join(f"t.{quote_identifier(name)} IS NOT DISTINCT FROM s.{quote_identifier(name)}" for name in columns)
+        conn.execute(
+            f"DELETE FROM {staged} AS s WHERE s.{ts} = ? AND EXISTS (SELECT 1 FROM {table} AS t WHERE t.{ts} = ? AND {match})",
+            [watermark, watermark],
+        )
+
+
+def run_sync(project_dir, client: BatchQueryClient, dataset: str, batch_size: int = DEFAULT_BATCH_SIZE) -> dict[str, Any]:
+    """Fetch rows from the dataset's high-water mark on and append the ones it does not hold yet."""
+    config = get_sync_config(project_dir, dataset)
+    table_name = sanitize_name(config.dataset)
+    watermark = current = None
+    with connect(project_dir) as conn:
+        if table_exists(conn, table_name):
+            column = quote_identifier(config.watermark_column)
+            current = conn.execute(f"SELECT max({column}) FROM {table_name}").fetchone()[0]
+            watermark = _watermark_value(current)
+
+    latest = {"value": watermark}
+
+    def tracked() -> Iterator[pd.DataFrame]:
+        query, params = build_incremental_query(config.query, config.watermark_column, current if watermark is not None else None)
+        for batch in client.iter_batches(query, batch_size, params):
+            if len(batch):
+                if config.watermark_column not in batch.columns:
+                    raise ValueError(f"Missing watermark column: {config.watermark_column}")
+                latest["value"] = _watermark_value(batch[config.watermark_column].max())
+            yield batch
+
+    started = time.perf_counter()
+    if watermark is None:
+        rows = save_batches(project_dir, table_name, tracked())
+    else:
+        staging = staging_table(table_name)
+        try:
+            fetched = save_batches(project_dir, staging, tracked())
+            if fetched:
+                _drop_synced_rows(project_dir, table_name, staging, config.watermark_column, current)
+        except BaseException:
+            drop_staging(project_dir, staging)
+            raise
+        if fetched:
+            rows = merge_staging(project_dir, table_name, staging, "append")["inserted"]
+        else:
+            drop_staging(project_dir, staging)
+            rows = 0
+    if rows or watermark is None:
+        refresh_rollups(project_dir, table_name, appended=watermark is not None)
+    seconds = time.perf_counter() - started
+
+    with update_metadata(project_dir) as metadata:
+        entry = metadata.get("syncs", {}).get(dataset)
+        if entry is not None:
+            entry["watermark"] = latest["value"]
+            entry["last_run"] = datetime.now(timezone.utc).isoformat()
+            entry["last_rows"] = rows
+            metadata["datasets"] = sorted(set(metadata.get("datasets", [])) | {table_name})
+
+    return {
+        "dataset": table_name,
+        "mode": "append" if watermark is not None else "full",
+        "rows": rows,
+        "previous_watermark": watermark,
+        "watermark": latest["value"],
+        "seconds": round(seconds, 3),
+    }
+
+
+def due_syncs(project_dir, now: Optional[datetime] = None) -> list[SyncConfig]:
+    now = now or datetime.now(timezone.utc)
+    due = []
+    for config in list_sync_configs(project_dir):
+        if not config.interval_seconds:
+            continue
+        if config.last_run is None or datetime.fromisoformat(config.last_run) + timedelta(seconds=config.interval_seconds) <= now:
+            due.append(config)
+    return due
@@ -1,21 +1,50 @@
 from __future__ import annotations
 
 import csv
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Any
 
+import duckdb
 import pandas as pd
 
-from app.db.duckdb_store import list_tables, load_metadata, save_dataframe, save_metadata
-from app.utils.file_utils import sanitize_name
+from app.db.duckdb_store import (
+    connect,
+    list_tables,
+    load_metadata,
+    quote_identifier,
+    register_datasets,
+    save_dataframe,
+    save_query,
+    table_columns,
+    table_fingerprint,
+    table_fingerprints,
+    table_exists,
+    update_metadata,
+)
+from app.services.jobs import report_progress
+from app.services.profiles import refresh_profile
+from app.services.storage import clear_storage, merge_staging, resolve_write_mode, set_storage, staging_table
+from app.settings import EXCEL_MAX_WORKERS
+from app.utils.file_utils import hash_file, sanitize_name
+
+CSV_ENGINES = {"auto", "duckdb", "pandas"}
+# DuckDB's CSV reader only decodes UTF-8; other encodings go through pandas.
+DUCKDB_CSV_ENCODINGS = {"utf-8", "utf8", "utf-8-sig", "ascii"}
+SNIFF_BYTES = 4096
+# Options that change how a sheet is read; a workbook re-imported with other values is not skipped.
+EXCEL_PARSE_OPTIONS = ("header_row", "start_row", "timestamp_column", "timezone")
 
 
 class ImportResult(dict):
     pass
 
 
-def detect_csv_format(file_path: Path) -> dict[str, Any]:
-    sample = file_path.read_text(encoding="utf-8", errors="ignore")[:4096]
+def detect_csv_format(file_path: Path, encoding: str = "utf-8") -> dict[str, Any]:
+    with file_path.open("r", encoding=encoding, errors="ignore") as handle:
+        sample = handle.read(SNIFF_BYTES)
     sniffer = csv.Sniffer()
     try:
         dialect = sniffer.sniff(sample)
@@ -25,46 +54,283 @@ def detect_csv_format(file_path: Path) -> dict[str, Any]:
     return {"delimiter": delimiter}
 
 
+def apply_timestamp_options(df: pd.DataFrame, options: dict[str, Any]) -> pd.DataFrame:
+    timestamp_column = options.get("timestamp_column")
+    if not timestamp_column:
+        return df
+    if timestamp_column not in df.columns:
+        raise ValueError(f"Missing timestamp column: {timestamp_column}")
+    timestamps = pd.to_datetime(df[timestamp_column])
+    timezone = options.get("timezone")
+    if timezone and timestamps.dt.tz is None:
+        timestamps = timestamps.dt.tz_localize(timezone)
+    df[timestamp_column] = timestamps
+    return df.sort_values(timestamp_column, kind="stable", ignore_index=True)
+
+
+def apply_storage_options(project_dir: Path, dataset_name: str, options: dict[str, Any]) -> None:
+    """Record the time-ordered layout of a freshly imported table, partitioning it if asked."""
+    timestamp_column = options.get("timestamp_column")
+    if timestamp_column:
+        set_storage(project_dir, dataset_name, timestamp_column, options.get("partition"), presorted=True)
+    elif options.get("partition"):
+        raise ValueError("Partitioning requires timestamp_column")
+    else:
+        clear_storage(project_dir, dataset_name)
+
+
+def import_target(project_dir: Path, dataset_name: str, options: dict[str, Any]) -> str:
+    """Table an import writes to: the dataset itself when replacing, otherwise its staging table."""
+    mode = options.get("mode") or "replace"
+    resolve_write_mode(project_dir, dataset_name, mode, options.get("key"))
+    return dataset_name if mode == "replace" else staging_table(dataset_name)
+
+
+def finish_import(project_dir: Path, dataset_name: str, target: str, options: dict[str, Any]) -> dict[str, int] | None:
+    """Merge an append/upsert import from its `target` (see import_target) into its dataset.
+
+    A replaced or new dataset gets its storage layout instead. Merges keep the dataset profile current themselves; a replaced or new dataset is profiled here.
+    """
+    mode = options.get("mode") or "replace"
+    merged = None
+    if mode != "replace":
+        with connect(project_dir) as conn:
+            existed = table_exists(conn, dataset_name)
+        merged = merge_staging(project_dir, dataset_name, target, mode, options.get("key"))
+        if existed:
+            return merged
+    apply_storage_options(project_dir, dataset_name, options)
+    refresh_profile(project_dir, dataset_name)
+    return merged
+
+
+def csv_select(project_dir: Path, source: str, params: list[Any], options: dict[str, Any]) -> tuple[str, list[Any]]:
+    """SELECT over a DuckDB CSV reader with the timestamp options applied and rows in time order."""
+    select = f"SELECT * FROM {source}"
+    timestamp_column = options.get("timestamp_column")
+    if timestamp_column:
+        with connect(project_dir) as conn:
+            rows = conn.execute(f"DESCRIBE {select}", params).fetchall()
+        column_types = {row[0]: row[1] for row in rows}
+        if timestamp_column not in column_types:
+            raise ValueError(f"Missing timestamp column: {timestamp_column}")
+        if column_types[timestamp_column] != "TIMESTAMP WITH TIME ZONE":
+            column = quote_identifier(timestamp_column)
+            expression = f"CAST({column} AS TIMESTAMP)"
+            timezone = options.get("timezone")
+            if timezone:
+                expression = f"timezone(?, {expression})"
+                params = [timezone] + params
+            select = f"SELECT * REPLACE ({expression} AS {column}) FROM {source}"
+        select += f" ORDER BY {quote_identifier(timestamp_column)}"
+    return select, params
+
+
+def _import_csv_duckdb(
+    project_dir: Path,
+    file_path: Path,
+    dataset_name: str,
+    delimiter: str,
+    decimal: str,
+    options: dict[str, Any],
+) -> int:
+    source = "read_csv(?, delim=?, decimal_separator=?, header=true)"
+    select, params = csv_select(project_dir, source, [str(file_path), delimiter, decimal], options)
+    return save_query(project_dir, dataset_name, select, params)
+
+
+def _import_csv_pandas(
+    project_dir: Path,
+    file_path: Path,
+    dataset_name: str,
+    delimiter: str,
+    encoding: str,
+    decimal: str,
+    options: dict[str, Any],
+) -> int:
+    df = pd.read_csv(file_path, delimiter=delimiter, encoding=encoding, decimal=decimal)
+    df = apply_timestamp_options(df, options)
+    save_dataframe(project_dir, dataset_name, df)
+    return len(df)
+
+
 def import_csv(project_dir: Path, file_path: Path, options: dict[str, Any]) -> ImportResult:
-    detected = detect_csv_format(file_path)
-    delimiter = options.get("delimiter") or detected["delimiter"]
     encoding = options.get("encoding") or "utf-8"
+    detected = detect_csv_format(file_path, encoding)
+    delimiter = options.get("delimiter") or detected["delimiter"]
     decimal = options.get("decimal") or "."
-    df = pd.read_csv(file_path, delimiter=delimiter, encoding=encoding, decimal=decimal)
+    engine = options.get("engine") or "auto"
+    if engine not in CSV_ENGINES:
+        raise ValueError(f"Unsupported CSV engine: {engine}")
     dataset_name = sanitize_name(options["dataset_name"])
-    save_dataframe(project_dir, dataset_name, df)
+    target = import_target(project_dir, dataset_name, options)
 
-    metadata = load_metadata(project_dir)
-    metadata["datasets"] = sorted(set(metadata.get("datasets", []) + [dataset_name]))
-    save_metadata(project_dir, metadata)
+    used_engine = "pandas"
+    rows = 0
+    if engine != "pandas":
+        if encoding.lower() in DUCKDB_CSV_ENCODINGS:
+            try:
+                rows = _import_csv_duckdb(project_dir, file_path, target, delimiter, decimal, options)
+                used_engine = "duckdb"
+            except duckdb.Error:
+                if engine == "duckdb":
+                    raise
+        elif engine == "duckdb":
+            raise ValueError(f"DuckDB CSV engine does not support encoding '{encoding}'")
+    if used_engine == "pandas":
+        rows = _import_csv_pandas(project_dir, file_path, target, delimiter, encoding, decimal, options)
+    merged = finish_import(project_dir, dataset_name, target, options)
+
+    register_datasets(project_dir, [dataset_name])
 
     return ImportResult(
         dataset_name=dataset_name,
-        rows=len(df),
-        columns=list(df.columns),
+        rows=rows,
+        columns=list(table_columns(project_dir, dataset_name)),
         detected_format=detected,
+        engine=used_engine,
+        mode=options.get("mode") or "replace",
+        merged=merged,
         tables=list_tables(project_dir),
     )
 
 
+def excel_engine() -> str:
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return "openpyxl"
+    return "calamine"
+
+
+def read_excel_sheet(
+    file_path: Path, sheet_name: str | int, header_row: int | None, start_row: int | None, engine: str
+) -> tuple[pd.DataFrame, float]:
+    started = time.perf_counter()
+    df = pd.read_excel(file_path, sheet_name=sheet_name, header=header_row, engine=engine)
+    if start_row:
+        df = df.iloc[start_row:]
+    return df, time.perf_counter() - started
+
+
 def import_excel(project_dir: Path, file_path: Path, options: dict[str, Any]) -> ImportResult:
     sheet_name = options.get("sheet_name")
     header_row = options.get("header_row", 0)
     start_row = options.get("start_row")
-    df = pd.read_excel(file_path, sheet_name=sheet_name or 0, header=header_row)
-    if start_row:
-        df = df.iloc[start_row:]
+    df, _ = read_excel_sheet(file_path, sheet_name or 0, header_row, start_row, excel_engine())
+    df = apply_timestamp_options(df, options)
     dataset_name = sanitize_name(options["dataset_name"])
-    save_dataframe(project_dir, dataset_name, df)
+    target = import_target(project_dir, dataset_name, options)
+    save_dataframe(project_dir, target, df)
+    merged = finish_import(project_dir, dataset_name, target, options)
 
-    metadata = load_metadata(project_dir)
-    metadata["datasets"] = sorted(set(metadata.get("datasets", []) + [dataset_name]))
-    save_metadata(project_dir, metadata)
+    register_datasets(project_dir, [dataset_name])
 
     return ImportResult(
         dataset_name=dataset_name,
         rows=len(df),
         columns=list(df.columns),
         sheet_name=sheet_name or "0",
+        mode=options.get("mode") or "replace",
+        merged=merged,
+        tables=list_tables(project_dir),
+    )
+
+
+def import_excel_workbook(project_dir: Path, file_path: Path, options: dict[str, Any]) -> ImportResult:
+    """Import several sheets into one table each, parsing them in parallel worker processes.
+
+    Sheets whose table was last imported from a workbook with the same hash and the same
+    parse options (see EXCEL_PARSE_OPTIONS), and has not been rewritten since, are skipped.
+    """
+    engine = excel_engine()
+    header_row = options.get("header_row", 0)
+    start_row = options.get("start_row")
+    dataset_name = sanitize_name(options["dataset_name"])
+    workbook_hash = hash_file(file_path)
+    parse_options = {name: options.get(name) for name in EXCEL_PARSE_OPTIONS}
+    with pd.ExcelFile(file_path, engine=engine) as workbook:
+        available = [str(name) for name in workbook.sheet_names]
+    requested = options.get("sheet_names") or available
+    missing = [name for name in requested if name not in available]
+    if missing:
+        raise ValueError(f"Sheets not found: {', '.join(missing)}")
+
+    workbooks = load_metadata(project_dir).get("excel_workbooks", {})
+    imported: dict[str, dict[str, Any]] = {}
+    with connect(project_dir) as conn:
+        fingerprints = table_fingerprints(conn)
+    sheets: list[dict[str, Any]] = []
+    pending: dict[str, str] = {}
+    for sheet in requested:
+        table_name = sanitize_name(f"{dataset_name}_{sheet}")
+        previous = workbooks.get(table_name)
+        if (
+            not options.get("force")
+            and previous
+            and previous.get("sha256") == workbook_hash
+            and previous.get("sheet") == sheet
+            and previous.get("options") == parse_options
+            and previous.get("fingerprint") is not None
+            and fingerprints.get(table_name) == previous["fingerprint"]
+        ):
+            sheets.append({"sheet": sheet, "table": table_name, "status": "skipped", "rows": previous.get("rows")})
+        else:
+            pending[sheet] = table_name
+
+    parsed: dict[str, tuple[pd.DataFrame, float]] = {}
+    if len(pending) == 1:
+        sheet = next(iter(pending))
+        parsed[sheet] = read_excel_sheet(file_path, sheet, header_row, start_row, engine)
+    elif pending:
+        # Spawn rather than fork: the server is multithreaded and holds DuckDB handles and locks.
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(len(pending), EXCEL_MAX_WORKERS), mp_context=context) as pool:
+            futures = {
+                sheet: pool.submit(read_excel_sheet, file_path, sheet, header_row, start_row, engine)
+                for sheet in pending
+            }
+            parsed = {sheet: future.result() for sheet, future in futures.items()}
+
+    for position, (sheet, table_name) in enumerate(pending.items(), start=1):
+        report_progress(position / (len(pending) + 1), f"Saving sheet {sheet}")
+        df, parse_seconds = parsed[sheet]
+        started = time.perf_counter()
+        df = apply_timestamp_options(df, options)
+        target = import_target(project_dir, table_name, options)
+        save_dataframe(project_dir, target, df)
+        merged = finish_import(project_dir, table_name, target, options)
+        with connect(project_dir) as conn:
+            fingerprint = table_fingerprint(conn, table_name)
+        imported[table_name] = {
+            "sha256": workbook_hash,
+            "sheet": sheet,
+            "options": parse_options,
+            "rows": len(df),
+            "fingerprint": fingerprint,
+        }
+        sheets.append(
+            {
+                "sheet": sheet,
+                "table": table_name,
+                "status": "imported",
+                "rows": len(df),
+                "columns": [str(column) for column in df.columns],
+                "parse_seconds": round(parse_seconds, 3),
+                "save_seconds": round(time.perf_counter() - started, 3),
+                "merged": merged,
+            }
+        )
+
+    with update_metadata(project_dir) as metadata:
+        metadata.setdefault("excel_workbooks", {}).update(imported)
+        metadata["datasets"] = sorted(set(metadata.get("datasets", [])) | set(pending.values()))
+
+    order = {sheet: index for index, sheet in enumerate(requested)}
+    return ImportResult(
+        dataset_name=dataset_name,
+        workbook_sha256=workbook_hash,
+        engine=engine,
+        sheets=sorted(sheets, key=lambda item: order[item["sheet"]]),
         tables=list_tables(project_dir),
     )
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import contextvars
+import threading
+import traceback
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+from app.settings import JOB_HISTORY_LIMIT, JOB_PROJECT_CONCURRENCY, JOB_THREAD_WORKERS
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = {SUCCEEDED, FAILED, CANCELLED}
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+@dataclass
+class Job:
+    job_id: str
+    kind: str
+    project_id: str
+    status: str = QUEUED
+    progress: float = 0.0
+    message: Optional[str] = None
+    result: Any = None
+    error: Optional[str] = None
+    created_at: str = field(default_factory=_now)
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    future: Optional[Future] = field(default=None, repr=False)
+
+    def as_dict(self, include_result: bool = True) -> dict[str, Any]:
+        data = {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "project_id": self.project_id,
+            "status": self.status,
+            "progress": round(self.progress, 4),
+            "message": self.message,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "cancel_requested": self.cancel_event.is_set(),
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+
+_current_job: contextvars.ContextVar[Optional[Job]] = contextvars.ContextVar("current_job", default=None)
+
+
+def report_progress(fraction: float, message: Optional[str] = None) -> None:
+    """Update the running job's progress; a no-op when called outside a job."""
+    job = _current_job.get()
+    if job is None:
+        return
+    job.progress = min(max(fraction, 0.0), 1.0)
+    if message is not None:
+        job.message = message
+    raise_if_cancelled()
+
+
+def raise_if_cancelled() -> None:
+    job = _current_job.get()
+    if job is not None and job.cancel_event.is_set():
+        raise JobCancelled(f"Job {job.job_id} was cancelled")
+
+
+class JobManager:
+    """Runs blocking work on a bounded thread pool with a per-project concurrency limit."""
+
+    def __init__(
+        self,
+        thread_workers: int = JOB_THREAD_WORKERS,
+        project_concurrency: int = JOB_PROJECT_CONCURRENCY,
+        history_limit: int = JOB_HISTORY_LIMIT,
+    ) -> None:
+        self._thread_workers = thread_workers
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._default_limit = project_concurrency
+        self._limits: dict[str, int] = {}
+        self._history_limit = history_limit
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._calls: dict[str, tuple[Callable[..., Any], tuple, dict]] = {}
+        self._running: dict[str, int] = {}
+        self._waiting: dict[str, deque[str]] = {}
+        self._lock = threading.RLock()
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self._thread_workers, thread_name_prefix="job")
+        return self._threads
+
+    def project_limit(self, project_id: str) -> int:
+        return self._limits.get(project_id, self._default_limit)
+
+    def set_project_limit(self, project_id: str, limit: int) -> None:
+        if limit < 1:
+            raise ValueError("Concurrency limit must be at least 1")
+        with self._lock:
+            self._limits[project_id] = limit
+            self._dispatch(project_id)
+
+    def submit(self, kind: str, project_id: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Job:
+        job = Job(job_id=str(uuid.uuid4()), kind=kind, project_id=project_id)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._calls[job.job_id] = (fn, args, kwargs)
+            self._waiting.setdefault(project_id, deque()).append(job.job_id)
+            self._prune()
+            self._dispatch(project_id)
+        return job
+
+    def get(self, job_id: str) -> Job:
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise KeyError(f"Job '{job_id}' not found")
+        return job
+
+    def list(self, project_id: Optional[str] = None) -> list[Job]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job for job in jobs if project_id is None or job.project_id == project_id]
+
+    def cancel(self, job_id: str) -> Job:
+        with self._lock:
+            job = self.get(job_id)
+            if job.status in FINISHED_STATUSES:
+                return job
+            job.cancel_event.set()
+            waiting = self._waiting.get(job.project_id)
+            if waiting and job_id in waiting:
+                waiting.remove(job_id)
+                self._finish(job, CANCELLED)
+            elif job.future is not None:
+                # A future that has not started is cancelled here and finished by _on_done;
+                # a running job stops at its next report_progress/raise_if_cancelled.
+                job.future.cancel()
+        return job
+
+    def shutdown(self) -> None:
+        for job in self.list():
+            if job.status not in FINISHED_STATUSES:
+                job.cancel_event.set()
+        if self._threads is not None:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+
+    def _dispatch(self, project_id: str) -> None:
+        waiting = self._waiting.get(project_id)
+        while waiting and self._running.get(project_id, 0) < self.project_limit(project_id):
+            job = self._jobs[waiting.popleft()]
+            fn, args, kwargs = self._calls.pop(job.job_id)
+            self._running[project_id] = self._running.get(project_id, 0) + 1
+            job.future = self._executor().submit(self._run_in_thread, job, fn, args, kwargs)
+            job.future.add_done_callback(lambda future, job=job: self._on_done(job, future))
+
+    @staticmethod
+    def _run_in_thread(job: Job, fn: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        job.status = RUNNING
+        job.started_at = _now()
+        token = _current_job.set(job)
+        try:
+            raise_if_cancelled()
+            return fn(*args, **kwargs)
+        finally:
+            _current_job.reset(token)
+
+    def _on_done(self, job: Job, future: Future) -> None:
+        with self._lock:
+            if job.status not in FINISHED_STATUSES:
+                if future.cancelled():
+                    self._finish(job, CANCELLED)
+                else:
+                    error = future.exception()
+                    if isinstance(error, JobCancelled):
+                        self._finish(job, CANCELLED)
+                    elif error is not None:
+                        job.error = "".join(traceback.format_exception_only(type(error), error)).strip()
+                        self._finish(job, FAILED)
+                    else:
+                        job.result = future.result()
+                        job.progress = 1.0
+                        self._finish(job, SUCCEEDED)
+                self._running[job.project_id] -= 1
+            self._dispatch(job.project_id)
+
+    def _finish(self, job: Job, status: str) -> None:
+        job.status = status
+        job.finished_at = _now()
+        self._calls.pop(job.job_id, None)
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATUSES]
+        for job_id in finished[: max(len(self._jobs) - self._history_limit, 0)]:
+            del self._jobs[job_id]
+
+
+job_manager = JobManager()
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import hashlib
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from app.db.duckdb_store import connect, load_metadata, table_fingerprint, update_metadata
+from app.services.jobs import report_progress
+from app.services.recipe_cache import canonical_parameters
+from app.services.recipes import run_recipe
+from app.settings import PIPELINE_MAX_WORKERS
+from app.utils.file_utils import ensure_path_within, sanitize_name
+
+
+@dataclass
+class PipelineStep:
+    name: str
+    recipe: str
+    parameters: dict[str, Any] = field(default_factory=dict)
+    inputs: list[str] = field(default_factory=list)
+    outputs: list[str] = field(default_factory=list)
+
+
+def _recipe_path(recipes_dir: Path, recipe: str) -> Path:
+    path = ensure_path_within(recipes_dir, recipes_dir / recipe)
+    if not path.is_file():
+        raise ValueError(f"Recipe '{recipe}' not found")
+    return path
+
+
+def pipeline_graph(steps: list[PipelineStep]) -> dict[str, list[str]]:
+    """Upstream steps of each step: the producers of its declared input tables.
+
+    Inputs nobody in the pipeline produces are plain datasets. Raises ValueError for duplicate
+    step names, a table produced by two steps, or a dependency cycle.
+    """
+    names = [step.name for step in steps]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate steps: {', '.join(duplicates)}")
+    producers: dict[str, str] = {}
+    for step in steps:
+        for table in step.outputs:
+            if table in producers:
+                raise ValueError(f"Table '{table}' is produced by both '{producers[table]}' and '{step.name}'")
+            producers[table] = step.name
+    graph = {
+        step.name: sorted({producers[table] for table in step.inputs if table in producers} - {step.name})
+        for step in steps
+    }
+    # Kahn's algorithm: whatever cannot be ordered is on a cycle.
+    remaining = {name: set(upstream) for name, upstream in graph.items()}
+    while True:
+        ready = [name for name, upstream in remaining.items() if not upstream]
+        if not ready:
+            break
+        for name in ready:
+            del remaining[name]
+        for upstream in remaining.values():
+            upstream.difference_update(ready)
+    if remaining:
+        raise ValueError(f"Dependency cycle between steps: {', '.join(sorted(remaining))}")
+    return graph
+
+
+def save_pipeline(project_dir: Path, name: str, steps: list[PipelineStep], recipes_dir: Path) -> dict[str, Any]:
+    """Store a pipeline definition; the run state of steps whose definition is unchanged is kept."""
+    if not steps:
+        raise ValueError("A pipeline needs at least one step")
+    for step in steps:
+        _recipe_path(recipes_dir, step.recipe)
+        step.inputs = [sanitize_name(table) for table in step.inputs]
+        step.outputs = [sanitize_name(table) for table in step.outputs]
+    graph = pipeline_graph(steps)
+    with update_metadata(project_dir) as metadata:
+        pipelines = metadata.setdefault("pipelines", {})
+        state = pipelines.get(name, {}).get("state", {})
+        pipelines[name] = {
+            "steps": [asdict(step) for step in steps],
+            "state": {step.name: state[step.name] for step in steps if step.name in state},
+        }
+    return {"name": name, "steps": [asdict(step) for step in steps], "graph": graph}
+
+
+def get_pipeline(project_dir: Path, name: str) -> dict[str, Any]:
+    entry = load_metadata(project_dir).get("pipelines", {}).get(name)
+    if not entry:
+        raise ValueError(f"Pipeline '{name}' not found")
+    steps = [PipelineStep(**step) for step in entry["steps"]]
+    return {"name": name, "steps": entry["steps"], "graph": pipeline_graph(steps), "state": entry.get("state", {})}
+
+
+def list_pipelines(project_dir: Path) -> list[str]:
+    return sorted(load_metadata(project_dir).get("pipelines", {}))
+
+
+def delete_pipeline(project_dir: Path, name: str) -> bool:
+    with update_metadata(project_dir) as metadata:
+        return metadata.get("pipelines", {}).pop(name, None) is not None
+
+
+def _signature(step: PipelineStep, source: str) -> str:
+    payload = "\0".join(
+        [hashlib.sha256(source.encode("utf-8")).hexdigest(), canonical_parameters(step.parameters), *step.inputs, "", *step.outputs]
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _fingerprints(project_dir: Path, tables: list[str]) -> dict[str, str | None]:
+    with connect(project_dir) as conn:
+        return {table: table_fingerprint(conn, table) for table in tables}
+
+
+def _up_to_date(project_dir: Path, step: PipelineStep, signature: str, state: dict[str, Any] | None) -> bool:
+    """True if the last successful run used this definition and no input or output was written since.
+
+    A table without a fingerprint (missing, or written outside the store) always triggers a run.
+    """
+    if not state or state.get("signature") != signature:
+        return False
+    current = _fingerprints(project_dir, step.inputs + step.outputs)
+    recorded = {**state.get("inputs", {}), **state.get("outputs", {})}
+    return all(current[table] is not None and current[table] == recorded.get(table) for table in current)
+
+
+def _run_step(project_dir: Path, step: PipelineStep, recipe_path: Path, signature: str) -> dict[str, Any]:
+    started = time.perf_counter()
+    inputs = _fingerprints(project_dir, step.inputs)
+    # The pipeline decides what is current itself, so steps always execute instead of hitting the recipe cache.
+    result = run_recipe(project_dir, recipe_path, step.parameters, use_cache=False)
+    state = {
+        "signature": signature,
+        "inputs": inputs,
+        "outputs": _fingerprints(project_dir, step.outputs),
+        "run_id": result.run_id,
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+    }
+    undeclared = sorted(set(result.outputs) - set(step.outputs))
+    return {
+        "status": "ran",
+        "run_id": result.run_id,
+        "seconds": round(time.perf_counter() - started, 3),
+        "undeclared_outputs": undeclared,
+        "state": state,
+    }
+
+
+def run_pipeline(
+    project_dir: Path,
+    name: str,
+    recipes_dir: Path,
+    force: bool = False,
+    max_workers: int = PIPELINE_MAX_WORKERS,
+) -> dict[str, Any]:
+    """Run a pipeline's steps in dependency order, independent steps concurrently on a thread pool.
+
+    A step runs once all its upstream steps finished; it is skipped if it is up to date (see
+    _up_to_date) unless `force` is set. Steps downstream of a failed step are blocked, the others
+    still run. Writes to the project database are serialized, so steps overlap in reading,
+    pandas work and DuckDB query execution.
+    """
+    pipeline = get_pipeline(project_dir, name)
+    steps = {step["name"]: PipelineStep(**step) for step in pipeline["steps"]}
+    graph, states = pipeline["graph"], pipeline["state"]
+    sources = {step.name: _recipe_path(recipes_dir, step.recipe) for step in steps.values()}
+    signatures = {step.name: _signature(step, sources[step.name].read_text(encoding="utf-8")) for step in steps.values()}
+
+    started = time.perf_counter()
+    results: dict[str, dict[str, Any]] = {}
+    running: dict[Future, str] = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="pipeline") as pool:
+        try:
+            while len(results) < len(steps):
+                for step_name, upstream in graph.items():
+                    if step_name in results or step_name in running.values() or any(up not in results for up in upstream):
+                        continue
+                    failed = [up for up in upstream if results[up]["status"] in ("failed", "blocked")]
+                    if failed:
+                        results[step_name] = {"status": "blocked", "upstream": failed}
+                    elif not force and _up_to_date(project_dir, steps[step_name], signatures[step_name], states.get(step_name)):
+                        results[step_name] = {"status": "skipped", "run_id": states[step_name].get("run_id")}
+                    else:
+                        future = pool.submit(_run_step, project_dir, steps[step_name], sources[step_name], signatures[step_name])
+                        running[future] = step_name
+                if not running:
+                    # Skipped and blocked steps may have released further steps.
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step_name = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as exc:
+                        results[step_name] = {"status": "failed", "error": f"{type(exc).__name__}: {exc}"}
+                        continue
+                    state = result.pop("state")
+                    with update_metadata(project_dir) as metadata:
+                        entry = metadata.get("pipelines", {}).get(name)
+                        if entry is not None:
+                            entry.setdefault("state", {})[step_name] = state
+                    results[step_name] = result
+                report_progress(len(results) / len(steps), f"{len(results)}/{len(steps)} steps finished")
+        except BaseException:
+            for future in running:
+                future.cancel()
+            raise
+
+    counts = {status: sum(result["status"] == status for result in results.values()) for status in ("ran", "skipped", "failed", "blocked")}
+    return {
+        "pipeline": name,
+        "status": "error" if counts["failed"] or counts["blocked"] else "success",
+        "seconds": round(time.perf_counter() - started, 3),
+        **counts,
+        "steps": {step_name: results[step_name] for step_name in graph},
+    }
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from app.db.duckdb_store import (
+    connect,
+    list_tables,
+    load_metadata,
+    quote_identifier,
+    table_exists,
+    table_fingerprint,
+    table_fingerprints,
+    update_metadata,
+)
+
+TIME_TYPES = ("TIMESTAMP", "DATE")
+# min/max are skipped for nested types; everything else orders in DuckDB.
+NESTED_TYPES = ("STRUCT", "MAP", "UNION")
+
+
+def _orderable(column_type: str) -> bool:
+    return not column_type.endswith("]") and not column_type.startswith(NESTED_TYPES)
+
+
+def _types(conn: Any, relation: str) -> dict[str, str]:
+    return {row[0]: row[1] for row in conn.execute(f"DESCRIBE {relation}").fetchall()}
+
+
+def _time_columns(metadata: dict[str, Any], dataset: str, types: dict[str, str]) -> tuple[str | None, str | None]:
+    """Time column (from the storage or rollup setup, else the first timestamp) and the rollup tag column."""
+    time_column = None
+    for section in ("storage", "rollups"):
+        column = metadata.get(section, {}).get(dataset, {}).get("time_column")
+        if column in types:
+            time_column = column
+            break
+    if time_column is None:
+        time_column = next((column for column, column_type in types.items() if column_type.startswith(TIME_TYPES)), None)
+    tag_column = metadata.get("rollups", {}).get(dataset, {}).get("tag_column")
+    return time_column, tag_column if tag_column in types else None
+
+
+def _median_interval(conn: Any, relation: str, time_column: str, tag_column: str | None) -> float | None:
+    ts = quote_identifier(time_column)
+    partition = f"PARTITION BY {quote_identifier(tag_column)} " if tag_column else ""
+    value = conn.execute(
+        f"SELECT median(gap) FROM (SELECT epoch({ts}) - epoch(lag({ts}) OVER ({partition}ORDER BY {ts})) AS gap "
+        f"FROM {relation}) WHERE gap IS NOT NULL"
+    ).fetchone()[0]
+    return round(value, 6) if value is not None else None
+
+
+def profile_relation(
+    conn: Any,
+    relation: str,
+    time_column: str | None = None,
+    tag_column: str | None = None,
+    base: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """Row count and per-column type, nulls, min/max and approximate distinct count in one scan, combined with `base` if given."""
+    types = _types(conn, relation)
+    selects, params = ["count(*)"], []
+    for column, column_type in types.items():
+        name = quote_identifier(column)
+        selects += [f"count({name})", f"approx_count_distinct({name})"]
+        if _orderable(column_type):
+            low, high = f"min({name})", f"max({name})"
+            if base:
+                low = f"least({low}, CAST(? AS {column_type}))"
+                high = f"greatest({high}, CAST(? AS {column_type}))"
+                params += [base["columns"][column]["min"], base["columns"][column]["max"]]
+            selects += [f"CAST({low} AS VARCHAR)", f"CAST({high} AS VARCHAR)"]
+    values = iter(conn.execute(f"SELECT {', '.join(selects)} FROM {relation}", params).fetchone())
+
+    rows = next(values)
+    columns: dict[str, dict[str, Any]] = {}
+    for column, column_type in types.items():
+        entry: dict[str, Any] = {"type": column_type, "nulls": rows - next(values), "approx_distinct": next(values)}
+        if _orderable(column_type):
+            entry["min"], entry["max"] = next(values), next(values)
+        if base:
+            previous = base["columns"][column]
+            entry["nulls"] += previous["nulls"]
+            entry["approx_distinct"] = max(entry["approx_distinct"], previous["approx_distinct"])
+        columns[column] = entry
+
+    time = None
+    if time_column in types:
+        interval = _median_interval(conn, relation, time_column, tag_column)
+        previous = (base or {}).get("time") or {}
+        if previous.get("median_interval_s") is not None and interval is not None:
+            interval = round((previous["median_interval_s"] * base["rows"] + interval * rows) / (base["rows"] + rows), 6)
+        elif interval is None:
+            interval = previous.get("median_interval_s")
+        time = {
+            "column": time_column,
+            "start": columns[time_column].get("min"),
+            "end": columns[time_column].get("max"),
+            "median_interval_s": interval,
+        }
+    return {
+        "rows": rows + (base["rows"] if base else 0),
+        "columns": columns,
+        "time": time,
+        "appends": base.get("appends", 0) + 1 if base else 0,
+    }
+
+
+def _store(project_dir: Path, dataset: str, profile: dict[str, Any], fingerprint: str | None) -> dict[str, Any]:
+    profile = {**profile, "fingerprint": fingerprint, "profiled_at": datetime.now(timezone.utc).isoformat()}
+    with update_metadata(project_dir) as metadata:
+        metadata.setdefault("profiles", {})[dataset] = profile
+    return profile
+
+
+def refresh_profile(project_dir: Path, dataset: str) -> dict[str, Any] | None:
+    """Profile a dataset from scratch and store it in the project metadata; None if it does not exist."""
+    metadata = load_metadata(project_dir)
+    with connect(project_dir) as conn:
+        if not table_exists(conn, dataset):
+            return None
+        # Taken first: a write racing the scan leaves the stored profile stale rather than wrong.
+        fingerprint = table_fingerprint(conn, dataset)
+        name = quote_identifier(dataset)
+        profile = profile_relation(conn, name, *_time_columns(metadata, dataset, _types(conn, name)))
+    return _store(project_dir, dataset, profile, fingerprint)
+
+
+def appended_profile(conn: Any, project_dir: Path, dataset: str, relation: str, fingerprint: str | None) -> dict[str, Any] | None:
+    """The stored profile extended by rows appended from `relation`, or None when a full profile is needed."""
+    metadata = load_metadata(project_dir)
+    base = metadata.get("profiles", {}).get(dataset)
+    if not base or base.get("fingerprint") != fingerprint:
+        return None
+    types = _types(conn, quote_identifier(dataset))
+    incoming = _types(conn, relation)
+    if types != {column: entry["type"] for column, entry in base["columns"].items()} or not set(incoming) <= set(types):
+        return None
+    columns = ", ".join(
+        f"CAST({quote_identifier(column) if column in incoming else 'NULL'} AS {column_type}) AS {quote_identifier(column)}"
+        for column, column_type in types.items()
+    )
+    return profile_relation(conn, f"(SELECT {columns} FROM {relation})", *_time_columns(metadata, dataset, types), base)
+
+
+def store_appended_profile(project_dir: Path, dataset: str, profile: dict[str, Any] | None, fingerprint: str) -> None:
+    if profile is None:
+        refresh_profile(project_dir, dataset)
+    else:
+        _store(project_dir, dataset, profile, fingerprint)
+
+
+def dataset_profile(project_dir: Path, dataset: str, refresh: bool = False) -> dict[str, Any]:
+    """The stored profile, recomputed first if the dataset was written since it was taken."""
+    with connect(project_dir) as conn:
+        if dataset.startswith("_") or not table_exists(conn, dataset):
+            raise ValueError(f"Dataset '{dataset}' not found")
+        fingerprint = table_fingerprint(conn, dataset)
+    profile = load_metadata(project_dir).get("profiles", {}).get(dataset)
+    if refresh or profile is None or profile.get("fingerprint") != fingerprint:
+        profile = refresh_profile(project_dir, dataset)
+    return {"dataset": dataset, **profile}
+
+
+def dataset_summaries(project_dir: Path) -> dict[str, dict[str, Any] | None]:
+    """Rows, column count and time span per dataset from the stored profiles, without scanning any table."""
+    datasets = list_tables(project_dir)
+    with connect(project_dir) as conn:
+        fingerprints = table_fingerprints(conn)
+    profiles = load_metadata(project_dir).get("profiles", {})
+    summaries: dict[str, dict[str, Any] | None] = {}
+    for dataset in datasets:
+        profile = profiles.get(dataset)
+        summaries[dataset] = profile and {
+            "rows": profile["rows"],
+            "columns": len(profile["columns"]),
+            "time": profile["time"],
+            "stale": profile["fingerprint"] != fingerprints.get(dataset),
+        }
+    return summaries
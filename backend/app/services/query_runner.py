@@ -1,29 +1,272 @@
 from __future__ import annotations
 
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Protocol
+from pathlib import Path
+from typing import Any, Iterator, Protocol, Sequence
 
 import pandas as pd
 
+from app.db.duckdb_store import (
+    connect,
+    load_metadata,
+    quote_identifier,
+    save_batches,
+    table_exists,
+    update_metadata,
+    write_connection,
+)
+from app.services.jobs import raise_if_cancelled, report_progress
+from app.services.storage import drop_staging, merge_staging, replace_with_staging, resolve_write_mode, staging_table
+
+DEFAULT_BATCH_SIZE = 50_000
+DEFAULT_PARTITIONS = 8
+DEFAULT_PARTITION_WORKERS = 4
+
+_engines: dict[str, tuple[str, Any]] = {}
+_engines_lock = threading.Lock()
+
 
 class QueryClient(Protocol):
     def fetch_dataframe(self, query: str) -> pd.DataFrame:
         ...
 
 
+class BatchQueryClient(QueryClient, Protocol):
+    def iter_batches(self, query: str, batch_size: int, params: Sequence[Any] | None = None) -> Iterator[pd.DataFrame]:
+        ...
+
+
+def get_engine(connection_string: str, name: str | None = None) -> Any:
+    """Return a pooled SQLAlchemy engine, cached per connection name across requests."""
+    try:
+        from sqlalchemy import create_engine
+    except ImportError as exc:
+        raise RuntimeError("SQLAlchemy is required for SQL Server queries") from exc
+    key = name or connection_string
+    with _engines_lock:
+        cached = _engines.get(key)
+        if cached and cached[0] == connection_string:
+            return cached[1]
+        if cached:
+            cached[1].dispose()
+        engine = create_engine(connection_string, pool_pre_ping=True)
+        _engines[key] = (connection_string, engine)
+        return engine
+
+
+def dispose_engines() -> None:
+    with _engines_lock:
+        for _, engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+
+
 @dataclass
 class SqlServerClient:
     connection_string: str
+    name: str | None = None
 
     def fetch_dataframe(self, query: str) -> pd.DataFrame:
-        try:
-            from sqlalchemy import create_engine
-        except ImportError as exc:
-            raise RuntimeError("SQLAlchemy is required for SQL Server queries") from exc
-        engine = create_engine(self.connection_string)
+        engine = get_engine(self.connection_string, self.name)
         with engine.connect() as conn:
             return pd.read_sql(query, conn)
 
+    def iter_batches(
+        self, query: str, batch_size: int = DEFAULT_BATCH_SIZE, params: Sequence[Any] | None = None
+    ) -> Iterator[pd.DataFrame]:
+        """Stream a query in frames of batch_size rows; params bind the driver's `?` placeholders."""
+        engine = get_engine(self.connection_string, self.name)
+        with engine.connect() as conn:
+            streaming = conn.execution_options(stream_results=True)
+            result = streaming.exec_driver_sql(query, tuple(params)) if params else streaming.exec_driver_sql(query)
+            columns = list(result.keys())
+            fetched = False
+            while rows := result.fetchmany(batch_size):
+                fetched = True
+                yield pd.DataFrame.from_records(rows, columns=columns)
+            if not fetched:
+                yield pd.DataFrame(columns=columns)
+
+
+@dataclass
+class ExtractResult:
+    rows: int
+    batches: int
+    bytes: int
+    seconds: float
+    resumed_from: int = 0
+    merged: dict[str, int] | None = None
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "batches": self.batches,
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+            "resumed_from": self.resumed_from,
+            **({"merged": self.merged} if self.merged is not None else {}),
+        }
+
+
+def extract_to_duckdb(
+    client: BatchQueryClient,
+    project_dir: Path,
+    table_name: str,
+    query: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> ExtractResult:
+    """Stream a query result into a DuckDB table one batch at a time."""
+    stats = {"batches": 0, "bytes": 0}
+
+    def counted() -> Iterator[pd.DataFrame]:
+        for batch in client.iter_batches(query, batch_size):
+            stats["batches"] += 1
+            stats["bytes"] += int(batch.memory_usage(deep=True).sum())
+            raise_if_cancelled()
+            yield batch
+
+    started = time.perf_counter()
+    rows = save_batches(project_dir, table_name, counted())
+    return ExtractResult(rows=rows, batches=stats["batches"], bytes=stats["bytes"], seconds=time.perf_counter() - started)
+
+
+# A final ORDER BY with no parentheses after it, i.e. one that belongs to the outermost SELECT.
+TRAILING_ORDER_BY = re.compile(r"\s+ORDER\s+BY\s[^()]*$", re.IGNORECASE | re.DOTALL)
+TOP_OR_OFFSET = re.compile(r"^\s*SELECT\s+(DISTINCT\s+)?TOP\b|\bOFFSET\b", re.IGNORECASE)
+
+
+def strip_order_by(query: str) -> str:
+    """A saved query made usable as a derived table: SQL Server rejects ORDER BY there without TOP/OFFSET."""
+    query = query.strip().rstrip(";")
+    if not TOP_OR_OFFSET.search(query):
+        query = TRAILING_ORDER_BY.sub("", query)
+    return query
+
+
+def split_time_range(start: Any, end: Any, partitions: int) -> list[tuple[pd.Timestamp, pd.Timestamp]]:
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    if end <= start:
+        raise ValueError("Time range end must be after start")
+    if partitions < 1:
+        raise ValueError("Partitions must be at least 1")
+    bounds = [start + (end - start) * index / partitions for index in range(partitions + 1)]
+    bounds[-1] = end
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def build_window_query(query: str, time_column: str, start: pd.Timestamp, end: pd.Timestamp) -> tuple[str, list[Any]]:
+    column = quote_identifier(time_column)
+    sql = f"SELECT * FROM ({strip_order_by(query)}) AS src WHERE src.{column} >= ? AND src.{column} < ?"
+    return sql, [start.to_pydatetime(), end.to_pydatetime()]
+
+
+def _fetch_window(client: BatchQueryClient, sql: str, params: list[Any]) -> pd.DataFrame:
+    return pd.concat(list(client.iter_batches(sql, DEFAULT_BATCH_SIZE, params)), ignore_index=True)
+
+
+def clear_extraction(project_dir: Path, dataset: str) -> None:
+    """Forget a dataset's partitioned extraction checkpoint and drop the staging table it was loading."""
+    with update_metadata(project_dir) as metadata:
+        checkpoint = metadata.get("extractions", {}).pop(dataset, None)
+    if checkpoint and checkpoint.get("staging"):
+        drop_staging(project_dir, checkpoint["staging"])
+
+
+def extract_partitioned(
+    client: BatchQueryClient,
+    project_dir: Path,
+    dataset: str,
+    query: str,
+    time_column: str,
+    start: Any,
+    end: Any,
+    partitions: int = DEFAULT_PARTITIONS,
+    max_workers: int = DEFAULT_PARTITION_WORKERS,
+    mode: str = "replace",
+    key: list[str] | None = None,
+) -> ExtractResult:
+    """Fetch a time range as N windows in parallel into a resumable staging table, then write it to dataset."""
+    key = resolve_write_mode(project_dir, dataset, mode, key)
+    windows = split_time_range(start, end, partitions)
+    signature = hashlib.sha256(
+        json.dumps([query, time_column, str(windows[0][0]), str(windows[-1][1]), partitions]).encode("utf-8")
+    ).hexdigest()
+    checkpoint = load_metadata(project_dir).get("extractions", {}).get(dataset, {})
+    completed = 0
+    if checkpoint.get("signature") == signature:
+        with connect(project_dir) as conn:
+            if table_exists(conn, checkpoint["staging"]):
+                completed = checkpoint["completed"]
+    if not completed:
+        # Another query or range for this dataset abandons the earlier run.
+        clear_extraction(project_dir, dataset)
+        checkpoint = {"signature": signature, "staging": staging_table(dataset), "windows": len(windows)}
+    staging = checkpoint["staging"]
+    if completed < len(windows) and completed:
+        # The checkpoint is written after the window's commit, so that window may already be loaded.
+        with write_connection(project_dir) as conn:
+            conn.execute(
+                f"DELETE FROM {quote_identifier(staging)} WHERE {quote_identifier(time_column)} >= ?",
+                [windows[completed][0].to_pydatetime()],
+            )
+
+    def save_checkpoint(value: int) -> None:
+        with update_metadata(project_dir) as metadata:
+            metadata.setdefault("extractions", {})[dataset] = {**checkpoint, "completed": value}
+
+    rows = 0
+    size = 0
+    started = time.perf_counter()
+    remaining = list(enumerate(windows))[completed:]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending: deque[tuple[int, Future]] = deque()
+
+        def submit_next() -> None:
+            if remaining:
+                index, (window_start, window_end) = remaining.pop(0)
+                sql, params = build_window_query(query, time_column, window_start, window_end)
+                pending.append((index, pool.submit(_fetch_window, client, sql, params)))
+
+        # Fetch at most max_workers windows ahead so memory stays bounded while loading in order.
+        for _ in range(max_workers):
+            submit_next()
+        while pending:
+            index, future = pending.popleft()
+            df = future.result()
+            save_batches(project_dir, staging, [df], append=index > 0)
+            rows += len(df)
+            size += int(df.memory_usage(deep=True).sum())
+            save_checkpoint(index + 1)
+            report_progress((index + 1) / len(windows), f"Loaded window {index + 1} of {len(windows)}")
+            submit_next()
+
+    if mode == "replace":
+        merged = None
+        replace_with_staging(project_dir, dataset, staging)
+    else:
+        merged = merge_staging(project_dir, dataset, staging, mode, key, keep_on_error=True)
+    clear_extraction(project_dir, dataset)
+    return ExtractResult(
+        rows=rows,
+        batches=len(windows) - completed,
+        bytes=size,
+        seconds=time.perf_counter() - started,
+        resumed_from=completed,
+        merged=merged,
+    )
+
 
 def build_sqlserver_connection_string(
     host: str,
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import shutil
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+from app.db.duckdb_store import connect, load_metadata, quote_identifier, table_fingerprint, write_connection
+from app.services.rollups import refresh_rollups
+from app.services.storage import drop_staging, replace_with_staging, staging_table, storage_config
+from app.settings import RECIPE_CACHE_MAX_AGE_SECONDS, RECIPE_CACHE_MAX_BYTES, RECIPE_CACHE_MAX_ENTRIES
+from app.utils.file_utils import ensure_path_within
+
+_cache_lock = threading.RLock()
+
+
+def cache_dir(project_dir: Path) -> Path:
+    path = ensure_path_within(project_dir, project_dir / "recipe_cache")
+    path.mkdir(exist_ok=True)
+    return path
+
+
+def canonical_parameters(parameters: dict[str, Any]) -> str:
+    return json.dumps(parameters, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def cache_key(recipe: str, source: str, parameters: dict[str, Any]) -> str:
+    source_hash = hashlib.sha256(source.encode("utf-8")).hexdigest()
+    payload = f"{recipe}\0{source_hash}\0{canonical_parameters(parameters)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _load_index(project_dir: Path) -> dict[str, Any]:
+    index_path = cache_dir(project_dir) / "index.json"
+    if index_path.exists():
+        return json.loads(index_path.read_text(encoding="utf-8"))
+    return {}
+
+
+def _save_index(project_dir: Path, index: dict[str, Any]) -> None:
+    index_path = cache_dir(project_dir) / "index.json"
+    temp_path = index_path.with_suffix(".tmp")
+    temp_path.write_text(json.dumps(index, indent=2), encoding="utf-8")
+    temp_path.replace(index_path)
+
+
+def _remove_entry(project_dir: Path, index: dict[str, Any], key: str) -> None:
+    index.pop(key, None)
+    shutil.rmtree(cache_dir(project_dir) / key, ignore_errors=True)
+
+
+def _expired(entry: dict[str, Any], now: datetime) -> bool:
+    created = datetime.fromisoformat(entry["created_at"])
+    return now - created > timedelta(seconds=RECIPE_CACHE_MAX_AGE_SECONDS)
+
+
+def _evict(project_dir: Path, index: dict[str, Any]) -> None:
+    now = datetime.now(timezone.utc)
+    for key in [key for key, entry in index.items() if _expired(entry, now)]:
+        _remove_entry(project_dir, index, key)
+    # Least recently used entries go first once the size or entry budget is exceeded.
+    by_use = sorted(index, key=lambda key: index[key].get("last_used_at", index[key]["created_at"]))
+    total = sum(entry.get("bytes", 0) for entry in index.values())
+    while by_use and (total > RECIPE_CACHE_MAX_BYTES or len(index) > RECIPE_CACHE_MAX_ENTRIES):
+        key = by_use.pop(0)
+        total -= index[key].get("bytes", 0)
+        _remove_entry(project_dir, index, key)
+
+
+def _restore(project_dir: Path, table: str, snapshot: Path) -> str | None:
+    staging = staging_table(table)
+    try:
+        with write_connection(project_dir) as conn:
+            conn.execute(f"CREATE TABLE {quote_identifier(staging)} AS SELECT * FROM read_parquet(?)", [str(snapshot)])
+        replace_with_staging(project_dir, table, staging)
+    except BaseException:
+        drop_staging(project_dir, staging)
+        raise
+    refresh_rollups(project_dir, table)
+    with connect(project_dir) as conn:
+        return table_fingerprint(conn, table)
+
+
+def lookup_cached_result(project_dir: Path, recipe: str, source: str, parameters: dict[str, Any]) -> dict[str, Any] | None:
+    """Return the cached run for this recipe source and parameters if none of its inputs changed.
+
+    Output tables that were overwritten since the cached run are restored from their snapshot through
+    the normal replace path; outputs with a storage layout or alarm state are not restored, the run is redone.
+    """
+    key = cache_key(recipe, source, parameters)
+    with _cache_lock:
+        index = _load_index(project_dir)
+        entry = index.get(key)
+        if entry is None:
+            return None
+        if _expired(entry, datetime.now(timezone.utc)):
+            _remove_entry(project_dir, index, key)
+            _save_index(project_dir, index)
+            return None
+        with connect(project_dir) as conn:
+            for table, fingerprint in entry["inputs"].items():
+                if table_fingerprint(conn, table) != fingerprint:
+                    return None
+            stale = [table for table, fingerprint in entry["outputs"].items() if table_fingerprint(conn, table) != fingerprint]
+        alarm_targets = load_metadata(project_dir).get("alarms", {})
+        for table in stale:
+            if table in alarm_targets or storage_config(project_dir, table) is not None:
+                return None
+            if not (cache_dir(project_dir) / key / f"{table}.parquet").exists():
+                return None
+        for table in stale:
+            entry["outputs"][table] = _restore(project_dir, table, cache_dir(project_dir) / key / f"{table}.parquet")
+        entry["hits"] = entry.get("hits", 0) + 1
+        entry["last_used_at"] = datetime.now(timezone.utc).isoformat()
+        _save_index(project_dir, index)
+        return entry
+
+
+def store_cached_result(
+    project_dir: Path,
+    recipe: str,
+    source: str,
+    parameters: dict[str, Any],
+    inputs: dict[str, str | None],
+    outputs: list[str],
+    logs: list[str],
+) -> bool:
+    if any(fingerprint is None for fingerprint in inputs.values()):
+        return False
+    key = cache_key(recipe, source, parameters)
+    entry_dir = cache_dir(project_dir) / key
+    with _cache_lock:
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        entry_dir.mkdir()
+        output_fingerprints: dict[str, str | None] = {}
+        with connect(project_dir) as conn:
+            for table in dict.fromkeys(outputs):
+                output_fingerprints[table] = table_fingerprint(conn, table)
+                snapshot = entry_dir / f"{table}.parquet"
+                target = snapshot.as_posix().replace("'", "''")
+                conn.execute(f"COPY {table} TO '{target}' (FORMAT PARQUET)")
+        if any(fingerprint is None for fingerprint in output_fingerprints.values()):
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return False
+        now = datetime.now(timezone.utc).isoformat()
+        index = _load_index(project_dir)
+        index[key] = {
+            "recipe": recipe,
+            "parameters": parameters,
+            "inputs": inputs,
+            "outputs": output_fingerprints,
+            "logs": logs,
+            "bytes": sum(path.stat().st_size for path in entry_dir.iterdir()),
+            "created_at": now,
+            "last_used_at": now,
+            "hits": 0,
+        }
+        _evict(project_dir, index)
+        _save_index(project_dir, index)
+    return True
+
+
+def list_cache_entries(project_dir: Path) -> list[dict[str, Any]]:
+    with _cache_lock:
+        index = _load_index(project_dir)
+    return [
+        {
+            "key": key,
+            "recipe": entry["recipe"],
+            "parameters": entry["parameters"],
+            "inputs": sorted(entry["inputs"]),
+            "outputs": sorted(entry["outputs"]),
+            "bytes": entry.get("bytes", 0),
+            "hits": entry.get("hits", 0),
+            "created_at": entry["created_at"],
+            "last_used_at": entry.get("last_used_at"),
+        }
+        for key, entry in index.items()
+    ]
+
+
+def clear_cache(project_dir: Path, recipe: str | None = None) -> int:
+    with _cache_lock:
+        index = _load_index(project_dir)
+        keys = [key for key, entry in index.items() if recipe is None or entry["recipe"] == recipe]
+        for key in keys:
+            _remove_entry(project_dir, index, key)
+        _save_index(project_dir, index)
+    return len(keys)
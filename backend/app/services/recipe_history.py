@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Iterator
+
+from app.settings import RECIPE_HISTORY_COMPACT_EVERY, RECIPE_HISTORY_MAX_AGE_SECONDS, RECIPE_HISTORY_MAX_RUNS
+from app.utils.file_utils import ensure_path_within
+
+HISTORY_FILE = "recipe_history.jsonl"
+# Whole-file history written by earlier versions; folded into the JSON Lines file on first use.
+LEGACY_HISTORY_FILE = "recipe_history.json"
+RUN_STATUSES = ("success", "error")
+
+_history_lock = threading.Lock()
+# Appends per history file since it was last compacted.
+_appends: dict[Path, int] = {}
+
+
+def history_path(project_dir: Path) -> Path:
+    return ensure_path_within(project_dir, project_dir / HISTORY_FILE)
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _migrate(project_dir: Path) -> None:
+    legacy = ensure_path_within(project_dir, project_dir / LEGACY_HISTORY_FILE)
+    if not legacy.exists():
+        return
+    runs = json.loads(legacy.read_text(encoding="utf-8"))
+    with history_path(project_dir).open("a", encoding="utf-8") as handle:
+        for run in runs:
+            outputs = run.get("outputs", [])
+            record = {
+                "run_id": new_run_id(),
+                "recipe": run.get("recipe"),
+                "status": "success",
+                "started_at": None,
+                "seconds": None,
+                "parameters": run.get("parameters", {}),
+                "inputs": [],
+                "outputs": dict.fromkeys(outputs) if isinstance(outputs, list) else outputs,
+                "cached": run.get("cached", False),
+                "logs": run.get("logs", []),
+            }
+            handle.write(json.dumps(record, default=str) + "\n")
+    legacy.unlink()
+
+
+def _read(path: Path) -> Iterator[dict[str, Any]]:
+    if not path.exists():
+        return
+    with path.open(encoding="utf-8") as handle:
+        for line in handle:
+            # A line cut short by a crash mid-append is skipped rather than failing every read.
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def append_run(project_dir: Path, record: dict[str, Any]) -> None:
+    """Append one run as a line of JSON; the file is compacted every RECIPE_HISTORY_COMPACT_EVERY runs."""
+    line = json.dumps(record, default=str) + "\n"
+    path = history_path(project_dir)
+    with _history_lock:
+        _migrate(project_dir)
+        with path.open("a", encoding="utf-8") as handle:
+            handle.write(line)
+        _appends[path] = _appends.get(path, 0) + 1
+        if _appends[path] >= RECIPE_HISTORY_COMPACT_EVERY:
+            _compact(project_dir)
+
+
+def _compact(project_dir: Path) -> int:
+    path = history_path(project_dir)
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=RECIPE_HISTORY_MAX_AGE_SECONDS)
+    runs = list(_read(path))
+    # Runs migrated from the old format have no start time and are only dropped by the count limit.
+    kept = [run for run in runs if (_started(run) or cutoff) >= cutoff][-RECIPE_HISTORY_MAX_RUNS:]
+    if len(kept) != len(runs):
+        temporary = path.with_suffix(".tmp")
+        temporary.write_text("".join(json.dumps(run, default=str) + "\n" for run in kept), encoding="utf-8")
+        os.replace(temporary, path)
+    _appends[path] = 0
+    return len(runs) - len(kept)
+
+
+def compact_history(project_dir: Path) -> dict[str, int]:
+    """Drop runs older than the retention age and beyond the retained count; returns what was removed."""
+    with _history_lock:
+        _migrate(project_dir)
+        removed = _compact(project_dir)
+    return {"removed": removed}
+
+
+def query_history(
+    project_dir: Path,
+    recipe: str | None = None,
+    status: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    offset: int = 0,
+    limit: int = 50,
+    include_logs: bool = False,
+) -> dict[str, Any]:
+    """Runs newest first, filtered by recipe, status and start time (ISO bounds, until exclusive)."""
+    if status is not None and status not in RUN_STATUSES:
+        raise ValueError(f"Unsupported status: {status}")
+    if offset < 0 or limit < 1:
+        raise ValueError("offset must be >= 0 and limit >= 1")
+    bounds = [_bound(value) for value in (since, until)]
+    with _history_lock:
+        _migrate(project_dir)
+        runs = list(_read(history_path(project_dir)))
+    matches = []
+    for run in reversed(runs):
+        started = _started(run)
+        if recipe is not None and run.get("recipe") != recipe:
+            continue
+        if status is not None and run.get("status") != status:
+            continue
+        if bounds[0] is not None and (started is None or started < bounds[0]):
+            continue
+        if bounds[1] is not None and (started is None or started >= bounds[1]):
+            continue
+        matches.append(run)
+    page = matches[offset : offset + limit]
+    if not include_logs:
+        page = [{key: value for key, value in run.items() if key != "logs"} for run in page]
+    return {"total": len(matches), "offset": offset, "limit": limit, "runs": page}
+
+
+def _started(run: dict[str, Any]) -> datetime | None:
+    return datetime.fromisoformat(run["started_at"]) if run.get("started_at") else None
+
+
+def _bound(value: str | None) -> datetime | None:
+    if value is None:
+        return None
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError as exc:
+        raise ValueError(f"Invalid timestamp: {value}") from exc
+    return moment if moment.tzinfo is not None else moment.replace(tzinfo=timezone.utc)
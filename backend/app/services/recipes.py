@@ -1,13 +1,24 @@
 from __future__ import annotations
 
-import json
+import time
 from dataclasses import dataclass
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Callable
+from typing import Any, Callable, Iterable
 
+import duckdb
 import pandas as pd
 
-from app.db.duckdb_store import connect, save_dataframe
+from app.db.duckdb_store import (
+    ProjectConnection,
+    connect,
+    quote_identifier,
+    table_exists,
+    table_fingerprint,
+)
+from app.services import alarms, alignment, rolling, rollups, storage
+from app.services.recipe_cache import lookup_cached_result, store_cached_result
+from app.services.recipe_history import append_run, new_run_id
 from app.utils.file_utils import sanitize_name
 
 
@@ -16,33 +27,193 @@ class RecipeResult:
     status: str
     logs: list[str]
     outputs: list[str]
+    cached: bool = False
+    run_id: str | None = None
+
+
+def _record_run(project_dir: Path, run: dict[str, Any], started: float, outputs: list[str], **fields: Any) -> None:
+    """Append a run to the history with its wall time and the current row count of each output table."""
+    with connect(project_dir) as conn:
+        rows = {
+            table: conn.execute(f"SELECT count(*) FROM {quote_identifier(table)}").fetchone()[0] if table_exists(conn, table) else None
+            for table in dict.fromkeys(outputs)
+        }
+    append_run(project_dir, {**run, "seconds": round(time.perf_counter() - started, 3), "outputs": rows, **fields})
+
+
+def _time_param(value: Any) -> Any:
+    if isinstance(value, str):
+        return pd.Timestamp(value).to_pydatetime()
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value
+
+
+def build_load_query(
+    name: str,
+    columns: list[str] | None = None,
+    start: Any = None,
+    end: Any = None,
+    time_column: str = "ts",
+    where: str | None = None,
+    order_by: str | None = None,
+    limit: int | None = None,
+    source: str | None = None,
+) -> tuple[str, list[Any]]:
+    """SQL for load(): projection, time range and filters are pushed down into DuckDB.
+
+    `source` replaces the table name in FROM, e.g. with the pruned partition files of a dataset.
+    """
+    projection = ", ".join(quote_identifier(column) for column in columns) if columns else "*"
+    conditions: list[str] = []
+    params: list[Any] = []
+    if start is not None:
+        conditions.append(f"{quote_identifier(time_column)} >= ?")
+        params.append(_time_param(start))
+    if end is not None:
+        conditions.append(f"{quote_identifier(time_column)} < ?")
+        params.append(_time_param(end))
+    if where:
+        conditions.append(f"({where})")
+    sql = f"SELECT {projection} FROM {source or quote_identifier(name)}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if order_by:
+        sql += f" ORDER BY {order_by}"
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+    return sql, params
+
+
+def _require_pyarrow() -> None:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as exc:
+        raise RuntimeError("pyarrow is required for Arrow output") from exc
+
+
+def run_recipe(project_dir: Path, recipe_path: Path, parameters: dict[str, Any], use_cache: bool = True) -> RecipeResult:
+    started = time.perf_counter()
+    run = {
+        "run_id": new_run_id(),
+        "recipe": recipe_path.name,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "parameters": parameters,
+    }
+    source = recipe_path.read_text(encoding="utf-8")
+    if use_cache:
+        cached = lookup_cached_result(project_dir, recipe_path.name, source, parameters)
+        if cached is not None:
+            outputs = list(cached["outputs"])
+            _record_run(project_dir, run, started, outputs, status="success", inputs=list(cached["inputs"]), cached=True, logs=cached["logs"])
+            return RecipeResult(status="success", logs=list(cached["logs"]), outputs=outputs, cached=True, run_id=run["run_id"])
 
-
-def run_recipe(project_dir: Path, recipe_path: Path, parameters: dict[str, Any]) -> RecipeResult:
     logs: list[str] = []
     outputs: list[str] = []
+    # Fingerprint of every table the recipe read, captured at first read; None marks untracked tables.
+    inputs: dict[str, str | None] = {}
+    cacheable = use_cache
+
+    def track_inputs(conn: ProjectConnection, names: Iterable[str]) -> None:
+        for name in names:
+            if name not in inputs and table_exists(conn, name):
+                inputs[name] = table_fingerprint(conn, name)
 
     def log(message: str) -> None:
         logs.append(message)
 
-    def load(name: str) -> pd.DataFrame:
+    # Lazy relations stay bound to one cursor that lives for the whole run.
+    run_connection: ProjectConnection | None = None
+
+    def load(
+        name: str,
+        columns: list[str] | None = None,
+        start: Any = None,
+        end: Any = None,
+        time_column: str = "ts",
+        where: str | None = None,
+        order_by: str | None = None,
+        limit: int | None = None,
+        lazy: bool = False,
+        arrow: bool = False,
+    ) -> Any:
+        nonlocal run_connection
+        source = storage.dataset_source(project_dir, name, time_column, start, end)
+        sql, query_params = build_load_query(name, columns, start, end, time_column, where, order_by, limit, source)
+        if lazy:
+            if run_connection is None:
+                run_connection = connect(project_dir)
+            track_inputs(run_connection, [name])
+            return run_connection.sql(sql, params=query_params or None)
         with connect(project_dir) as conn:
-            return conn.execute(f"SELECT * FROM {name}").fetchdf()
+            track_inputs(conn, [name])
+            result = conn.execute(sql, query_params)
+            if arrow:
+                _require_pyarrow()
+                return result.arrow()
+            return result.fetchdf()
 
     def query_duckdb(sql: str) -> pd.DataFrame:
+        nonlocal cacheable
         with connect(project_dir) as conn:
+            if any(statement.type != duckdb.StatementType.SELECT for statement in duckdb.extract_statements(sql)):
+                # Writes made through raw SQL are invisible to the cache, so the run cannot be reused.
+                cacheable = False
+            else:
+                track_inputs(conn, conn.get_table_names(sql))
             return conn.execute(sql).fetchdf()
 
-    def save_table(name: str, df: pd.DataFrame) -> None:
+    def save_table(name: str, df: pd.DataFrame, mode: str = "replace", key: list[str] | None = None) -> dict[str, int]:
         table_name = sanitize_name(name)
-        save_dataframe(project_dir, table_name, df)
+        result = storage.write_batches(project_dir, table_name, [df], mode, key)
+        # Upserts can change rows behind the rollup watermark, so only plain appends refresh incrementally.
+        rollups.refresh_rollups(project_dir, table_name, appended=mode == "append")
         outputs.append(table_name)
-
-    def save_timeseries(name: str, df: pd.DataFrame, time_col: str = "ts") -> None:
-        df = df.copy()
+        return result
+
+    def save_timeseries(
+        name: str,
+        df: pd.DataFrame,
+        time_col: str = "ts",
+        append: bool = False,
+        rollup: bool = False,
+        tag_col: str | None = None,
+        key: list[str] | None = None,
+    ) -> None:
         if time_col not in df.columns:
             raise ValueError(f"Missing time column: {time_col}")
-        save_table(name, df)
+        save_table(name, df, "append" if append else "replace", key)
+        table_name = sanitize_name(name)
+        if rollup and rollups.rollup_config(project_dir, table_name) is None:
+            rollups.enable_rollups(project_dir, table_name, time_col, tag_col)
+
+    def rolling_stats(source: str, target: str | None = None, **options: Any) -> Any:
+        with connect(project_dir) as conn:
+            track_inputs(conn, [source])
+        table_name = sanitize_name(target) if target else None
+        result = rolling.rolling_stats(project_dir, source, table_name, **options)
+        if table_name:
+            outputs.append(table_name)
+        return result
+
+    def align_series(sources: list[Any], target: str | None = None, **options: Any) -> Any:
+        resolved = [alignment.AlignSource.from_value(source) for source in sources]
+        with connect(project_dir) as conn:
+            track_inputs(conn, [source.table for source in resolved])
+        table_name = sanitize_name(target) if target else None
+        result = alignment.align_series(project_dir, resolved, table_name, **options)
+        if table_name:
+            outputs.append(table_name)
+        return result
+
+    def alarm_episodes(rebuild: bool = False, **options: Any) -> dict[str, Any]:
+        config = alarms.AlarmConfig(**options)
+        config.target = sanitize_name(config.target)
+        with connect(project_dir) as conn:
+            track_inputs(conn, [config.source])
+        result = alarms.update_alarm_episodes(project_dir, config, rebuild)
+        outputs.append(config.target)
+        return result
 
     def plot_timeseries(*_args: Any, **_kwargs: Any) -> None:
         logs.append("plot_timeseries called (UI handles visualization)")
@@ -55,26 +226,29 @@ def run_recipe(project_dir: Path, recipe_path: Path, parameters: dict[str, Any])
         "query_duckdb": query_duckdb,
         "save_table": save_table,
         "save_timeseries": save_timeseries,
+        "rolling_stats": rolling_stats,
+        "align_series": align_series,
+        "alarm_episodes": alarm_episodes,
         "plot_timeseries": plot_timeseries,
         "add_event_markers": add_event_markers,
         "log": log,
         "params": parameters,
     }
 
-    source = recipe_path.read_text(encoding="utf-8")
-    compiled = compile(source, recipe_path.name, "exec")
-    exec(compiled, api)
-
-    history_path = project_dir / "recipe_history.json"
-    history = []
-    if history_path.exists():
-        history = json.loads(history_path.read_text(encoding="utf-8"))
-    history.append({
-        "recipe": recipe_path.name,
-        "parameters": parameters,
-        "outputs": outputs,
-        "logs": logs,
-    })
-    history_path.write_text(json.dumps(history, indent=2), encoding="utf-8")
+    try:
+        compiled = compile(source, recipe_path.name, "exec")
+        exec(compiled, api)
+    except Exception as exc:
+        error = f"{type(exc).__name__}: {exc}"
+        _record_run(project_dir, run, started, outputs, status="error", inputs=list(inputs), cached=False, logs=logs, error=error)
+        raise
+    finally:
+        if run_connection is not None:
+            run_connection.close()
+
+    if cacheable:
+        store_cached_result(project_dir, recipe_path.name, source, parameters, inputs, outputs, logs)
+
+    _record_run(project_dir, run, started, outputs, status="success", inputs=list(inputs), cached=False, logs=logs)
 
-    return RecipeResult(status="success", logs=logs, outputs=outputs)
+    return RecipeResult(status="success", logs=logs, outputs=outputs, run_id=run["run_id"])
@@ -1,61 +1,339 @@
 from __future__ import annotations
 
+import hashlib
+import html
+import json
+import os
+import time
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, TextIO
 
-import pandas as pd
+from app.db.duckdb_store import (
+    NUMERIC_TYPES,
+    connect,
+    load_metadata,
+    quote_identifier,
+    table_exists,
+    table_fingerprint,
+    update_metadata,
+)
+from app.services.profiles import dataset_profile
+from app.services.series import downsample_series
+from app.utils.file_utils import ensure_path_within
 
-from app.db.duckdb_store import connect
+# Bumped whenever the report layout changes, so cached reports are regenerated.
+REPORT_VERSION = 1
+CHART_POINTS = 600
+MAX_CHARTS = 8
+MAX_TAGS = 50
+QUANTILES = [0.05, 0.5, 0.95]
 
 
-def generate_html_report(project_dir: Path, dataset: str, title: str) -> Path:
-    reports_dir = project_dir / "reports"
-    reports_dir.mkdir(exist_ok=True)
+def _numeric(column_type: str) -> bool:
+    return column_type.startswith(NUMERIC_TYPES)
+
+
+def _tag_column(project_dir: Path, dataset: str, types: dict[str, str], tag_column: str | None) -> str | None:
+    if tag_column is not None:
+        if tag_column not in types:
+            raise ValueError(f"Unknown tag column: {tag_column}")
+        return tag_column
+    configured = load_metadata(project_dir).get("rollups", {}).get(dataset, {}).get("tag_column")
+    if configured in types:
+        return configured
+    return "tag" if types.get("tag") == "VARCHAR" else None
+
+
+def report_data(
+    project_dir: Path,
+    dataset: str,
+    time_column: str | None = None,
+    tag_column: str | None = None,
+    value_columns: list[str] | None = None,
+) -> dict[str, Any]:
+    """Everything a report shows, aggregated in DuckDB over the whole dataset."""
+    profile = dataset_profile(project_dir, dataset)
+    types = {column: entry["type"] for column, entry in profile["columns"].items()}
+    time_column = time_column or (profile["time"] or {}).get("column")
+    if time_column is not None and time_column not in types:
+        raise ValueError(f"Missing time column: {time_column}")
+    tag_column = _tag_column(project_dir, dataset, types, tag_column)
+    if value_columns:
+        unknown = [column for column in value_columns if column not in types]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    else:
+        value_columns = [column for column, column_type in types.items() if _numeric(column_type) and column not in {time_column, tag_column}]
+
+    name = quote_identifier(dataset)
+    numeric = [column for column in types if _numeric(types[column])]
+    stats: dict[str, dict[str, Any]] = {}
+    tags: list[dict[str, Any]] = []
     with connect(project_dir) as conn:
-        df = conn.execute(f"SELECT * FROM {dataset} LIMIT 500").fetchdf()
-
-    html = f"""
-    <html>
-      <head><title>{title}</title></head>
-      <body>
-        <h1>{title}</h1>
-        <p>Dataset: {dataset}</p>
-        {df.to_html(index=False)}
-      </body>
-    </html>
-    """
-    output_path = reports_dir / f"{dataset}_report.html"
-    output_path.write_text(html, encoding="utf-8")
-    return output_path
-
-
-def generate_pdf_report(project_dir: Path, dataset: str, title: str) -> Path:
+        if numeric:
+            selects = []
+            for column in numeric:
+                value = f"CAST({quote_identifier(column)} AS DOUBLE)"
+                selects += [f"avg({value})", f"stddev_samp({value})", f"approx_quantile({value}, {QUANTILES})"]
+            row = conn.execute(f"SELECT {', '.join(selects)} FROM {name}").fetchone()
+            for index, column in enumerate(numeric):
+                mean, std, quantiles = row[index * 3 : index * 3 + 3]
+                stats[column] = {"mean": mean, "std": std, **dict(zip(["p05", "p50", "p95"], quantiles or [None] * 3))}
+        if tag_column is not None:
+            tag = quote_identifier(tag_column)
+            aggregates = ["count(*)"]
+            if time_column is not None:
+                ts = quote_identifier(time_column)
+                aggregates += [f"CAST(min({ts}) AS VARCHAR)", f"CAST(max({ts}) AS VARCHAR)"]
+            for column in value_columns:
+                value = f"CAST({quote_identifier(column)} AS DOUBLE)"
+                aggregates += [f"avg({value})", f"min({value})", f"max({value})"]
+            rows = conn.execute(
+                f"SELECT CAST({tag} AS VARCHAR), {', '.join(aggregates)} FROM {name} GROUP BY 1 ORDER BY 2 DESC, 1 LIMIT {MAX_TAGS}"
+            ).fetchall()
+            for row in rows:
+                entry: dict[str, Any] = {"tag": row[0], "rows": row[1]}
+                offset = 2
+                if time_column is not None:
+                    entry["start"], entry["end"] = row[2], row[3]
+                    offset = 4
+                entry["values"] = {
+                    column: dict(zip(["mean", "min", "max"], row[offset + index * 3 : offset + index * 3 + 3]))
+                    for index, column in enumerate(value_columns)
+                }
+                tags.append(entry)
+
+    charts = {}
+    plotted = value_columns[:MAX_CHARTS]
+    if time_column is not None and plotted and types[time_column].startswith(("TIMESTAMP", "DATE")):
+        series = downsample_series(project_dir, dataset, time_column, plotted, width=CHART_POINTS, mode="minmax")
+        charts = series["series"]
+    return {
+        "dataset": dataset,
+        "profile": profile,
+        "time_column": time_column,
+        "tag_column": tag_column,
+        "value_columns": value_columns,
+        "stats": stats,
+        "tags": tags,
+        "charts": charts,
+    }
+
+
+def _format(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    return str(value)
+
+
+def _svg_chart(column: str, series: dict[str, list[Any]], width: int = 800, height: int = 200) -> str:
+    """A min/max band of a downsampled series as a self-contained SVG."""
+    ts = series["ts"]
+    points = [(x, low, high) for x, low, high in zip(ts, series["min"], series["max"]) if low is not None and high is not None]
+    title = html.escape(column)
+    if not points:
+        return f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="40"><text x="4" y="24">{title}: no data</text></svg>'
+    x0, x1 = points[0][0], points[-1][0]
+    y0, y1 = min(point[1] for point in points), max(point[2] for point in points)
+    pad = 20
+
+    def project(x: float, y: float) -> str:
+        px = pad + (x - x0) / ((x1 - x0) or 1) * (width - 2 * pad)
+        py = height - pad - (y - y0) / ((y1 - y0) or 1) * (height - 2 * pad)
+        return f"{px:.1f},{py:.1f}"
+
+    band = [project(x, high) for x, _, high in points] + [project(x, low) for x, low, _ in reversed(points)]
+    start = datetime.fromtimestamp(x0 / 1000, timezone.utc).strftime("%Y-%m-%d %H:%M")
+    end = datetime.fromtimestamp(x1 / 1000, timezone.utc).strftime("%Y-%m-%d %H:%M")
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">'
+        f'<rect width="{width}" height="{height}" fill="#fff" stroke="#ccc"/>'
+        f'<polygon points="{" ".join(band)}" fill="#4a78b5" fill-opacity="0.35" stroke="#2b5797" stroke-width="0.8"/>'
+        f'<text x="{pad}" y="14" font-size="12">{title}</text>'
+        f'<text x="{width - pad}" y="14" font-size="10" text-anchor="end">{_format(y0)} … {_format(y1)}</text>'
+        f'<text x="{pad}" y="{height - 4}" font-size="10">{start}</text>'
+        f'<text x="{width - pad}" y="{height - 4}" font-size="10" text-anchor="end">{end}</text>'
+        "</svg>"
+    )
+
+
+def _write_table(out: TextIO, headers: list[str], rows: list[list[Any]]) -> None:
+    out.write("<table><thead><tr>" + "".join(f"<th>{html.escape(header)}</th>" for header in headers) + "</tr></thead><tbody>\n")
+    for row in rows:
+        out.write("<tr>" + "".join(f"<td>{html.escape(_format(value))}</td>" for value in row) + "</tr>\n")
+    out.write("</tbody></table>\n")
+
+
+def _column_rows(data: dict[str, Any]) -> list[list[Any]]:
+    rows = []
+    for column, entry in data["profile"]["columns"].items():
+        stats = data["stats"].get(column, {})
+        rows.append(
+            [column, entry["type"], entry["nulls"], entry["approx_distinct"], entry.get("min"), entry.get("max")]
+            + [stats.get(key) for key in ("mean", "std", "p05", "p50", "p95")]
+        )
+    return rows
+
+
+COLUMN_HEADERS = ["Column", "Type", "Nulls", "~Distinct", "Min", "Max", "Mean", "Std", "P05", "P50", "P95"]
+
+
+def _tag_rows(data: dict[str, Any]) -> tuple[list[str], list[list[Any]]]:
+    headers = ["Tag", "Rows"] + (["Start", "End"] if data["time_column"] else [])
+    headers += [f"{column} {stat}" for column in data["value_columns"] for stat in ("mean", "min", "max")]
+    rows = []
+    for tag in data["tags"]:
+        row = [tag["tag"], tag["rows"]] + ([tag["start"], tag["end"]] if data["time_column"] else [])
+        row += [tag["values"][column][stat] for column in data["value_columns"] for stat in ("mean", "min", "max")]
+        rows.append(row)
+    return headers, rows
+
+
+def _write_html(path: Path, data: dict[str, Any], title: str) -> None:
+    profile, time = data["profile"], data["profile"]["time"]
+    with path.open("w", encoding="utf-8") as out:
+        out.write(
+            f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title>"
+            "<style>body{font-family:sans-serif;margin:24px}table{border-collapse:collapse;font-size:12px;margin-bottom:24px}"
+            "th,td{border:1px solid #ccc;padding:3px 6px;text-align:right}th:first-child,td:first-child{text-align:left}</style>"
+            f"</head><body>\n<h1>{html.escape(title)}</h1>\n"
+        )
+        out.write(f"<p>Dataset: {html.escape(data['dataset'])} &middot; {profile['rows']:,} rows &middot; {len(profile['columns'])} columns")
+        if time:
+            out.write(
+                f" &middot; {html.escape(_format(time['start']))} – {html.escape(_format(time['end']))}"
+                f" &middot; median interval {html.escape(_format(time['median_interval_s']))} s"
+            )
+        out.write("</p>\n<h2>Columns</h2>\n")
+        _write_table(out, COLUMN_HEADERS, _column_rows(data))
+        if data["tags"]:
+            out.write(f"<h2>Per {html.escape(data['tag_column'])} (top {len(data['tags'])} by rows)</h2>\n")
+            _write_table(out, *_tag_rows(data))
+        if data["charts"]:
+            out.write("<h2>Time series (min/max per interval)</h2>\n")
+            for column, series in data["charts"].items():
+                out.write(f"<div>{_svg_chart(column, series)}</div>\n")
+        out.write("</body></html>\n")
+
+
+def _write_pdf(path: Path, data: dict[str, Any], title: str) -> None:
     try:
-        from reportlab.lib.pagesizes import letter
+        from reportlab.lib.pagesizes import A4, landscape
         from reportlab.pdfgen import canvas
     except ImportError as exc:
         raise RuntimeError("reportlab is required for PDF export") from exc
 
-    reports_dir = project_dir / "reports"
-    reports_dir.mkdir(exist_ok=True)
-    output_path = reports_dir / f"{dataset}_report.pdf"
+    width, height = landscape(A4)
+    margin = 36
+    c = canvas.Canvas(str(path), pagesize=(width, height))
+    y = height - margin
 
-    c = canvas.Canvas(str(output_path), pagesize=letter)
-    width, height = letter
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(40, height - 50, title)
-    c.setFont("Helvetica", 12)
-    c.drawString(40, height - 80, f"Dataset: {dataset}")
-    c.drawString(40, height - 110, "Preview (first 5 rows):")
+    def need(space: float) -> None:
+        nonlocal y
+        if y - space < margin:
+            c.showPage()
+            y = height - margin
 
-    with connect(project_dir) as conn:
-        df = conn.execute(f"SELECT * FROM {dataset} LIMIT 5").fetchdf()
+    def line(text: str, font: str = "Helvetica", size: int = 9, step: float = 13) -> None:
+        nonlocal y
+        need(step)
+        c.setFont(font, size)
+        c.drawString(margin, y, text)
+        y -= step
 
-    y = height - 140
-    for _, row in df.iterrows():
-        c.drawString(40, y, ", ".join(str(value) for value in row.values))
-        y -= 20
+    def table(headers: list[str], rows: list[list[Any]]) -> None:
+        nonlocal y
+        column_width = (width - 2 * margin) / len(headers)
+        for index, row in enumerate([headers, *rows]):
+            need(12)
+            c.setFont("Helvetica-Bold" if index == 0 else "Helvetica", 7)
+            for position, value in enumerate(row):
+                text = value if index == 0 else _format(value)
+                c.drawString(margin + position * column_width, y, str(text)[: int(column_width / 3.6)])
+            y -= 12
+        y -= 8
 
+    profile, time = data["profile"], data["profile"]["time"]
+    line(title, "Helvetica-Bold", 16, 24)
+    summary = f"Dataset: {data['dataset']} - {profile['rows']:,} rows - {len(profile['columns'])} columns"
+    if time:
+        summary += f" - {_format(time['start'])} to {_format(time['end'])}, median interval {_format(time['median_interval_s'])} s"
+    line(summary, step=20)
+    line("Columns", "Helvetica-Bold", 12, 16)
+    table(COLUMN_HEADERS, _column_rows(data))
+    if data["tags"]:
+        line(f"Per {data['tag_column']} (top {len(data['tags'])} by rows)", "Helvetica-Bold", 12, 16)
+        table(*_tag_rows(data))
+    chart_height = 120
+    for column, series in data["charts"].items():
+        points = [(x, low, high) for x, low, high in zip(series["ts"], series["min"], series["max"]) if low is not None and high is not None]
+        need(chart_height + 30)
+        line(column, "Helvetica-Bold", 10, 14)
+        bottom = y - chart_height
+        c.rect(margin, bottom, width - 2 * margin, chart_height)
+        if points:
+            x0, x1 = points[0][0], points[-1][0]
+            y0, y1 = min(point[1] for point in points), max(point[2] for point in points)
+            scale_x = (width - 2 * margin) / ((x1 - x0) or 1)
+            scale_y = chart_height / ((y1 - y0) or 1)
+            c.setLineWidth(0.5)
+            c.lines([
+                (margin + (x - x0) * scale_x, bottom + (low - y0) * scale_y, margin + (x - x0) * scale_x, bottom + (high - y0) * scale_y)
+                for x, low, high in points
+            ])
+            c.setFont("Helvetica", 7)
+            c.drawString(margin, bottom - 9, datetime.fromtimestamp(x0 / 1000, timezone.utc).strftime("%Y-%m-%d %H:%M"))
+            c.drawRightString(width - margin, bottom - 9, datetime.fromtimestamp(x1 / 1000, timezone.utc).strftime("%Y-%m-%d %H:%M"))
+            c.drawRightString(width - margin, y + 2, f"{_format(y0)} ... {_format(y1)}")
+        y = bottom - 20
     c.showPage()
     c.save()
-    return output_path
+
+
+def _generate(
+    project_dir: Path,
+    dataset: str,
+    title: str,
+    extension: str,
+    write: Callable[[Path, dict[str, Any], str], None],
+    options: dict[str, Any],
+) -> dict[str, Any]:
+    """Write a report unless the one on disk was made from the same dataset version and options."""
+    started = time.perf_counter()
+    with connect(project_dir) as conn:
+        if dataset.startswith("_") or not table_exists(conn, dataset):
+            raise ValueError(f"Dataset '{dataset}' not found")
+        fingerprint = table_fingerprint(conn, dataset)
+    reports_dir = ensure_path_within(project_dir, project_dir / "reports")
+    reports_dir.mkdir(exist_ok=True)
+    output_path = ensure_path_within(reports_dir, reports_dir / f"{dataset}_report.{extension}")
+    payload = json.dumps([REPORT_VERSION, fingerprint, title, options], sort_keys=True, default=str)
+    key = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    # Tables without a fingerprint were written outside the store, so their reports are never reused.
+    cached = load_metadata(project_dir).get("reports", {}).get(output_path.name)
+    if fingerprint is not None and cached and cached["key"] == key and output_path.exists():
+        return {"path": str(output_path), "cached": True, "seconds": round(time.perf_counter() - started, 3)}
+
+    data = report_data(project_dir, dataset, **options)
+    temporary = output_path.with_name(f".{output_path.name}.tmp")
+    try:
+        write(temporary, data, title)
+        os.replace(temporary, output_path)
+    finally:
+        temporary.unlink(missing_ok=True)
+    with update_metadata(project_dir) as metadata:
+        metadata.setdefault("reports", {})[output_path.name] = {"key": key, "created_at": datetime.now(timezone.utc).isoformat()}
+    return {"path": str(output_path), "cached": False, "seconds": round(time.perf_counter() - started, 3)}
+
+
+def generate_html_report(project_dir: Path, dataset: str, title: str, **options: Any) -> dict[str, Any]:
+    """HTML report over the full dataset; `options` are passed to report_data."""
+    return _generate(project_dir, dataset, title, "html", _write_html, options)
+
+
+def generate_pdf_report(project_dir: Path, dataset: str, title: str, **options: Any) -> dict[str, Any]:
+    """PDF version of the HTML report, with the charts drawn as vector min/max bars."""
+    return _generate(project_dir, dataset, title, "pdf", _write_pdf, options)
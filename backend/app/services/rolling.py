@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import re
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+from app.db.duckdb_store import (
+    append_query,
+    connect,
+    load_metadata,
+    quote_identifier,
+    save_query,
+    table_exists,
+    update_metadata,
+)
+
+INTERVAL_PATTERN = re.compile(
+    r"^\s*\d+(\.\d+)?\s*(microseconds?|milliseconds?|ms|seconds?|s|minutes?|m|hours?|h|days?|d)\s*$",
+    re.IGNORECASE,
+)
+STAT_COLUMNS = ["rolling_mean", "rolling_std", "zscore", "is_outlier"]
+
+
+def _frame(window: int | None, window_interval: str | None) -> str:
+    if (window is None) == (window_interval is None):
+        raise ValueError("Specify exactly one of window (rows) or window_interval (time)")
+    if window is not None:
+        if int(window) < 1:
+            raise ValueError("Window must be at least 1 row")
+        return f"ROWS BETWEEN {int(window) - 1} PRECEDING AND CURRENT ROW"
+    if not INTERVAL_PATTERN.match(window_interval):
+        raise ValueError(f"Invalid window interval: {window_interval}")
+    return f"RANGE BETWEEN INTERVAL '{window_interval.strip()}' PRECEDING AND CURRENT ROW"
+
+
+def rolling_stats_sql(
+    source: str,
+    value_column: str = "value",
+    time_column: str = "ts",
+    partition_by: list[str] | None = None,
+    window: int | None = None,
+    window_interval: str | None = None,
+    threshold: float | None = None,
+) -> str:
+    """Rolling mean/std and z-score per partition as DuckDB window functions over `source` (a table or subquery)."""
+    value = quote_identifier(value_column)
+    partition = ", ".join(quote_identifier(column) for column in partition_by or [])
+    over = f"({'PARTITION BY ' + partition + ' ' if partition else ''}ORDER BY {quote_identifier(time_column)} {_frame(window, window_interval)})"
+    outlier = f"abs(zscore) > {float(threshold)!r}" if threshold is not None else "NULL::BOOLEAN"
+    return f"""
+        SELECT *, {outlier} AS is_outlier
+        FROM (
+            SELECT *, ({value} - rolling_mean) / CASE WHEN rolling_std = 0 THEN 1 ELSE rolling_std END AS zscore
+            FROM (
+                SELECT *,
+                    avg({value}) OVER {over} AS rolling_mean,
+                    coalesce(stddev_samp({value}) OVER {over}, 0) AS rolling_std
+                FROM {source}
+            )
+        )
+    """
+
+
+def _config(
+    source: str,
+    value_column: str,
+    time_column: str,
+    partition_by: list[str] | None,
+    window: int | None,
+    window_interval: str | None,
+    threshold: float | None,
+) -> dict[str, Any]:
+    return {
+        "source": source,
+        "value_column": value_column,
+        "time_column": time_column,
+        "partition_by": list(partition_by or []),
+        "window": window,
+        "window_interval": window_interval,
+        "threshold": threshold,
+    }
+
+
+def compute_rolling_stats(
+    project_dir: Path,
+    source: str,
+    target: str,
+    value_column: str = "value",
+    time_column: str = "ts",
+    partition_by: list[str] | None = None,
+    window: int | None = None,
+    window_interval: str | None = None,
+    threshold: float | None = None,
+) -> int:
+    config = _config(source, value_column, time_column, partition_by, window, window_interval, threshold)
+    order = ", ".join(quote_identifier(column) for column in [*config["partition_by"], time_column])
+    sql = rolling_stats_sql(quote_identifier(source), value_column, time_column, partition_by, window, window_interval, threshold)
+    rows = save_query(project_dir, target, f"{sql} ORDER BY {order}")
+    with update_metadata(project_dir) as metadata:
+        metadata.setdefault("rolling", {})[target] = config
+    return rows
+
+
+def update_rolling_stats(project_dir: Path, target: str) -> int:
+    """Append stats for source rows newer than the target's last timestamp per partition."""
+    config = load_metadata(project_dir).get("rolling", {}).get(target)
+    if not config:
+        raise ValueError(f"No rolling statistics configured for '{target}'")
+    source = quote_identifier(config["source"])
+    ts = quote_identifier(config["time_column"])
+    parts = [quote_identifier(column) for column in config["partition_by"]]
+    join = " AND ".join(f"s.{column} IS NOT DISTINCT FROM w.{column}" for column in parts) or "TRUE"
+    group = f"{', '.join(parts)}, " if parts else ""
+    if config["window"] is not None:
+        over_parts = f"PARTITION BY {', '.join('s.' + column for column in parts)} " if parts else ""
+        context = (
+            f"SELECT s.* FROM {source} s JOIN watermark w ON {join} WHERE s.{ts} <= w._last_ts "
+            f"QUALIFY row_number() OVER ({over_parts}ORDER BY s.{ts} DESC) < {int(config['window'])}"
+        )
+    else:
+        context = (
+            f"SELECT s.* FROM {source} s JOIN watermark w ON {join} "
+            f"WHERE s.{ts} <= w._last_ts AND s.{ts} >= w._last_ts - INTERVAL '{config['window_interval'].strip()}'"
+        )
+    tail = f"""(
+        WITH watermark AS (SELECT {group}max({ts}) AS _last_ts FROM {quote_identifier(target)} {'GROUP BY ' + ', '.join(parts) if parts else ''})
+        SELECT s.* FROM {source} s LEFT JOIN watermark w ON {join} WHERE w._last_ts IS NULL OR s.{ts} > w._last_ts
+        UNION ALL
+        {context}
+    )"""
+    stats = rolling_stats_sql(
+        tail,
+        config["value_column"],
+        config["time_column"],
+        config["partition_by"],
+        config["window"],
+        config["window_interval"],
+        config["threshold"],
+    )
+    watermark = f"(SELECT {group}max({ts}) AS _last_ts FROM {quote_identifier(target)} {'GROUP BY ' + ', '.join(parts) if parts else ''})"
+    order = ", ".join([*(f"s.{column}" for column in parts), f"s.{ts}"])
+    sql = f"SELECT s.* FROM ({stats}) s LEFT JOIN {watermark} w ON {join} WHERE w._last_ts IS NULL OR s.{ts} > w._last_ts ORDER BY {order}"
+    return append_query(project_dir, target, sql)
+
+
+def rolling_stats(
+    project_dir: Path,
+    source: str,
+    target: str | None = None,
+    value_column: str = "value",
+    time_column: str = "ts",
+    partition_by: list[str] | None = None,
+    window: int | None = None,
+    window_interval: str | None = None,
+    threshold: float | None = None,
+    incremental: bool = False,
+) -> pd.DataFrame | int:
+    """Return rolling stats as a DataFrame, or write them to `target` (incrementally if asked) and return its row count."""
+    if target is None:
+        sql = rolling_stats_sql(quote_identifier(source), value_column, time_column, partition_by, window, window_interval, threshold)
+        order = ", ".join(quote_identifier(column) for column in [*(partition_by or []), time_column])
+        with connect(project_dir) as conn:
+            return conn.execute(f"{sql} ORDER BY {order}").fetchdf()
+    config = _config(source, value_column, time_column, partition_by, window, window_interval, threshold)
+    if incremental and load_metadata(project_dir).get("rolling", {}).get(target) == config:
+        with connect(project_dir) as conn:
+            exists = table_exists(conn, target)
+        if exists:
+            update_rolling_stats(project_dir, target)
+            with connect(project_dir) as conn:
+                return conn.execute(f"SELECT count(*) FROM {quote_identifier(target)}").fetchone()[0]
+    return compute_rolling_stats(project_dir, source, target, value_column, time_column, partition_by, window, window_interval, threshold)
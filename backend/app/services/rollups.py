@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+from app.db.duckdb_store import (
+    NUMERIC_TYPES,
+    bump_version,
+    connect,
+    load_metadata,
+    quote_identifier,
+    table_exists,
+    update_metadata,
+    write_connection,
+)
+
+# (suffix, bucket seconds), finest first; each level is aggregated from the one before it.
+RESOLUTIONS = [("1s", 1), ("1m", 60), ("1h", 3_600), ("1d", 86_400)]
+STATS = ["min", "max", "sum", "count", "first", "last"]
+
+
+def stat_column(column: str, stat: str) -> str:
+    return quote_identifier(f"{column}__{stat}")
+
+
+def rollup_table(dataset: str, suffix: str) -> str:
+    # Leading underscore keeps rollups out of the dataset listing.
+    return f"_rollup_{dataset}_{suffix}"
+
+
+def rollup_config(project_dir: Path, dataset: str) -> dict[str, Any] | None:
+    return load_metadata(project_dir).get("rollups", {}).get(dataset)
+
+
+def utc_timestamp(expression: str, column_type: str) -> str:
+    """A time column as a naive UTC TIMESTAMP; a plain CAST turns TIMESTAMPTZ into session-local wall time."""
+    if column_type == "TIMESTAMP WITH TIME ZONE":
+        return f"timezone('UTC', {expression})"
+    return f"CAST({expression} AS TIMESTAMP)"
+
+
+def _time_type(conn: Any, dataset: str, time_column: str) -> str:
+    types = {row[0]: row[1] for row in conn.execute(f"DESCRIBE {quote_identifier(dataset)}").fetchall()}
+    return types[time_column]
+
+
+def _raw_sql(dataset: str, config: dict[str, Any], time_type: str) -> str:
+    """Finest level straight from the dataset, one min/max/sum/count/first/last set per value column."""
+    ts = utc_timestamp(quote_identifier(config["time_column"]), time_type)
+    tag = f"CAST({quote_identifier(config['tag_column'])} AS VARCHAR)" if config["tag_column"] else "NULL::VARCHAR"
+    aggregates = []
+    for column in config["value_columns"]:
+        value = f"CAST({quote_identifier(column)} AS DOUBLE)"
+        present = f"FILTER (WHERE {quote_identifier(column)} IS NOT NULL)"
+        aggregates += [
+            f"min({value}) AS {stat_column(column, 'min')}",
+            f"max({value}) AS {stat_column(column, 'max')}",
+            f"sum({value}) AS {stat_column(column, 'sum')}",
+            f"count({value}) AS {stat_column(column, 'count')}",
+            f"arg_min({value}, {ts}) {present} AS {stat_column(column, 'first')}",
+            f"arg_max({value}, {ts}) {present} AS {stat_column(column, 'last')}",
+        ]
+    return f"""
+        SELECT time_bucket(INTERVAL '1 second', {ts}) AS bucket, {tag} AS tag,
+            min({ts}) AS first_ts, max({ts}) AS last_ts, count(*) AS row_count, {', '.join(aggregates)}
+        FROM {quote_identifier(dataset)}
+        WHERE {ts} >= ?
+        GROUP BY ALL
+        ORDER BY bucket
+    """
+
+
+def _merge_sql(source: str, seconds: int, config: dict[str, Any]) -> str:
+    aggregates = []
+    for column in config["value_columns"]:
+        first, last = stat_column(column, "first"), stat_column(column, "last")
+        aggregates += [
+            f"min({stat_column(column, 'min')}) AS {stat_column(column, 'min')}",
+            f"max({stat_column(column, 'max')}) AS {stat_column(column, 'max')}",
+            f"sum({stat_column(column, 'sum')}) AS {stat_column(column, 'sum')}",
+            f"sum({stat_column(column, 'count')}) AS {stat_column(column, 'count')}",
+            f"arg_min({first}, first_ts) FILTER (WHERE {first} IS NOT NULL) AS {first}",
+            f"arg_max({last}, last_ts) FILTER (WHERE {last} IS NOT NULL) AS {last}",
+        ]
+    return f"""
+        SELECT time_bucket(INTERVAL '{seconds} seconds', bucket) AS bucket, tag,
+            min(first_ts) AS first_ts, max(last_ts) AS last_ts, sum(row_count) AS row_count, {', '.join(aggregates)}
+        FROM {quote_identifier(source)}
+        WHERE bucket >= ?
+        GROUP BY ALL
+        ORDER BY bucket
+    """
+
+
+def _refresh(project_dir: Path, dataset: str, config: dict[str, Any], since: Any) -> Any:
+    """Recompute every rollup bucket at or after `since` (all buckets when None); returns the new watermark."""
+    with write_connection(project_dir) as conn:
+        if not table_exists(conn, dataset):
+            raise ValueError(f"Dataset '{dataset}' not found")
+        time_type = _time_type(conn, dataset, config["time_column"])
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            previous = None
+            for suffix, seconds in RESOLUTIONS:
+                table = quote_identifier(rollup_table(dataset, suffix))
+                # Buckets are aligned to midnight, so flooring `since` to the bucket keeps partial buckets whole.
+                floor = pd.Timestamp(since).floor(f"{seconds}s").to_pydatetime() if since is not None else datetime.min
+                sql = _raw_sql(dataset, config, time_type) if previous is None else _merge_sql(previous, seconds, config)
+                if table_exists(conn, rollup_table(dataset, suffix)):
+                    conn.execute(f"DELETE FROM {table} WHERE bucket >= ?", [floor])
+                    conn.execute(f"INSERT INTO {table} {sql}", [floor])
+                else:
+                    conn.execute(f"CREATE TABLE {table} AS {sql}", [floor])
+                bump_version(conn, rollup_table(dataset, suffix))
+                previous = rollup_table(dataset, suffix)
+            ts = utc_timestamp(quote_identifier(config["time_column"]), time_type)
+            watermark = conn.execute(f"SELECT max({ts}) FROM {quote_identifier(dataset)}").fetchone()[0]
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    return watermark
+
+
+def enable_rollups(
+    project_dir: Path,
+    dataset: str,
+    time_column: str = "ts",
+    tag_column: str | None = None,
+    value_columns: list[str] | None = None,
+) -> dict[str, Any]:
+    """Flag a dataset as a time series and build its 1s/1m/1h/1d rollups."""
+    with connect(project_dir) as conn:
+        if not table_exists(conn, dataset):
+            raise ValueError(f"Dataset '{dataset}' not found")
+        types = {row[0]: row[1] for row in conn.execute(f"DESCRIBE {quote_identifier(dataset)}").fetchall()}
+    if time_column not in types:
+        raise ValueError(f"Missing time column: {time_column}")
+    if tag_column and tag_column not in types:
+        raise ValueError(f"Missing tag column: {tag_column}")
+    if not value_columns:
+        value_columns = [
+            name for name, column_type in types.items()
+            if name not in {time_column, tag_column} and column_type.startswith(NUMERIC_TYPES)
+        ]
+    missing = [column for column in value_columns if column not in types]
+    if missing or not value_columns:
+        raise ValueError(f"Invalid value columns: {', '.join(missing) or 'none numeric'}")
+    disable_rollups(project_dir, dataset)
+    config = {"time_column": time_column, "tag_column": tag_column, "value_columns": value_columns, "watermark": None}
+    watermark = _refresh(project_dir, dataset, config, None)
+    config["watermark"] = watermark.isoformat() if watermark is not None else None
+    with update_metadata(project_dir) as metadata:
+        metadata.setdefault("rollups", {})[dataset] = config
+    return {"dataset": dataset, **config, "tables": [rollup_table(dataset, suffix) for suffix, _ in RESOLUTIONS]}
+
+
+def disable_rollups(project_dir: Path, dataset: str) -> bool:
+    with update_metadata(project_dir) as metadata:
+        config = metadata.get("rollups", {}).pop(dataset, None)
+    with write_connection(project_dir) as conn:
+        for suffix, _ in RESOLUTIONS:
+            conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(rollup_table(dataset, suffix))}")
+    return config is not None
+
+
+def refresh_rollups(project_dir: Path, dataset: str, appended: bool = False) -> dict[str, Any] | None:
+    """Keep a flagged dataset's rollups current after a write; a no-op for other datasets.
+
+    After an append only buckets from the previous watermark onward are recomputed, so rows
+    appended with older timestamps than that are not reflected until the next full refresh.
+    """
+    config = rollup_config(project_dir, dataset)
+    if config is None:
+        return None
+    with connect(project_dir) as conn:
+        if not table_exists(conn, dataset):
+            return None
+    since = config["watermark"] if appended else None
+    watermark = _refresh(project_dir, dataset, config, since)
+    config["watermark"] = watermark.isoformat() if watermark is not None else None
+    with update_metadata(project_dir) as metadata:
+        if dataset in metadata.get("rollups", {}):
+            metadata["rollups"][dataset]["watermark"] = config["watermark"]
+    return {"dataset": dataset, "incremental": since is not None, "watermark": config["watermark"]}
+
+
+def choose_rollup(
+    config: dict[str, Any] | None,
+    bucket_seconds: float,
+    time_column: str,
+    value_columns: list[str],
+    tag_column: str | None,
+    bounds: list[datetime] | None = None,
+) -> tuple[str, int] | None:
+    """Coarsest rollup level whose buckets fit inside one output bucket and start at every bound, if the request can use rollups."""
+    if config is None or config["time_column"] != time_column:
+        return None
+    if tag_column is not None and tag_column != config["tag_column"]:
+        return None
+    if not set(value_columns) <= set(config["value_columns"]):
+        return None
+    # A bucket that straddles a bound would mix in rows outside the range; bounds are naive UTC.
+    usable = [
+        (suffix, seconds)
+        for suffix, seconds in RESOLUTIONS
+        if seconds <= bucket_seconds and all(pd.Timestamp(bound).floor(f"{seconds}s") == bound for bound in bounds or [])
+    ]
+    return usable[-1] if usable else None
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from app.db.duckdb_store import NUMERIC_TYPES, connect, quote_identifier, table_exists
+from app.services.rollups import choose_rollup, rollup_config, rollup_table, stat_column, utc_timestamp
+from app.services.storage import dataset_source
+
+MODES = {"minmax", "avg", "lttb"}
+MAX_WIDTH = 20_000
+
+
+def _is_time_type(column_type: str) -> bool:
+    return column_type.startswith("TIMESTAMP") or column_type == "DATE"
+
+
+def _axis_value(value: Any, is_time: bool) -> float:
+    """Position of a bound on the numeric axis (epoch microseconds for time columns)."""
+    if not is_time:
+        return float(value)
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert("UTC").tz_localize(None)
+    return float(timestamp.value // 1_000)
+
+
+def _filter_param(value: Any, column_type: str) -> Any:
+    """A bound as a parameter for column_type; like _axis_value, naive times are taken as UTC."""
+    if not _is_time_type(column_type):
+        return value
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert("UTC").tz_localize(None)
+    if column_type == "TIMESTAMP WITH TIME ZONE":
+        timestamp = timestamp.tz_localize("UTC")
+    return timestamp.to_pydatetime()
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets; returns the indices of the points to keep."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    previous = 0
+    for bucket in range(threshold - 2):
+        lo, hi = edges[bucket], max(edges[bucket + 1], edges[bucket] + 1)
+        next_lo, next_hi = edges[bucket + 1], edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x, next_y = x[next_lo:max(next_hi, next_lo + 1)].mean(), y[next_lo:max(next_hi, next_lo + 1)].mean()
+        area = np.abs((x[previous] - next_x) * (y[lo:hi] - y[previous]) - (x[previous] - x[lo:hi]) * (next_y - y[previous]))
+        previous = lo + int(np.argmax(area))
+        keep[bucket + 1] = previous
+    return keep
+
+
+def _resolve(conn: Any, dataset: str, time_column: str, value_columns: list[str] | None, tag_column: str | None) -> tuple[str, list[str]]:
+    if not table_exists(conn, dataset):
+        raise ValueError(f"Dataset '{dataset}' not found")
+    types = {row[0]: row[1] for row in conn.execute(f"DESCRIBE {quote_identifier(dataset)}").fetchall()}
+    if time_column not in types:
+        raise ValueError(f"Missing time column: {time_column}")
+    if value_columns:
+        missing = [column for column in value_columns if column not in types]
+        if missing:
+            raise ValueError(f"Unknown columns: {', '.join(missing)}")
+    else:
+        value_columns = [
+            name for name, column_type in types.items()
+            if name not in {time_column, tag_column} and column_type.startswith(NUMERIC_TYPES)
+        ]
+    if not value_columns:
+        raise ValueError("No numeric value columns to plot")
+    return types[time_column], value_columns
+
+
+def downsample_series(
+    project_dir: Path,
+    dataset: str,
+    time_column: str = "ts",
+    value_columns: list[str] | None = None,
+    start: Any = None,
+    end: Any = None,
+    width: int = 1000,
+    mode: str = "minmax",
+    tag_column: str | None = None,
+    tag: Any = None,
+) -> dict[str, Any]:
+    """Reduce a time range of a dataset to at most `width` points per value column.
+
+    minmax/avg aggregate fixed-width time buckets in one DuckDB scan. lttb first keeps each
+    bucket's first, last, min and max rows (M4) in DuckDB and runs LTTB on those candidates,
+    so only O(width) rows ever leave the database. Time is returned as epoch milliseconds.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unsupported mode: {mode}")
+    if not 1 <= width <= MAX_WIDTH:
+        raise ValueError(f"Width must be between 1 and {MAX_WIDTH}")
+    with connect(project_dir) as conn:
+        time_type, value_columns = _resolve(conn, dataset, time_column, value_columns, tag_column)
+        is_time = _is_time_type(time_type)
+        ts = quote_identifier(time_column)
+        axis = f"CAST(epoch_us({utc_timestamp(ts, time_type)}) AS DOUBLE)" if is_time else f"CAST({ts} AS DOUBLE)"
+        conditions, params = [f"{ts} IS NOT NULL"], []
+        if start is not None:
+            conditions.append(f"{ts} >= ?")
+            params.append(_filter_param(start, time_type))
+        if end is not None:
+            conditions.append(f"{ts} < ?")
+            params.append(_filter_param(end, time_type))
+        if tag_column and tag is not None:
+            conditions.append(f"{quote_identifier(tag_column)} = ?")
+            params.append(tag)
+        columns = ", ".join(quote_identifier(column) for column in value_columns)
+        source = f"SELECT {axis} AS _x, {columns} FROM {dataset_source(project_dir, dataset, time_column, start, end)} WHERE {' AND '.join(conditions)}"
+
+        config = rollup_config(project_dir, dataset) if is_time else None
+        lower = _axis_value(start, is_time) if start is not None else None
+        upper = _axis_value(end, is_time) if end is not None else None
+        if lower is None or upper is None:
+            if choose_rollup(config, float("inf"), time_column, value_columns, tag_column if tag is not None else None):
+                # The daily rollup knows the first and last timestamp without scanning the raw rows.
+                daily = quote_identifier(rollup_table(dataset, "1d"))
+                tag_filter, tag_params = ("WHERE tag = ?", [str(tag)]) if tag is not None else ("", [])
+                bounds_sql = f"SELECT CAST(epoch_us(min(first_ts)) AS DOUBLE), CAST(epoch_us(max(last_ts)) AS DOUBLE) FROM {daily} {tag_filter}"
+                bounds = conn.execute(bounds_sql, tag_params).fetchone()
+            else:
+                bounds = conn.execute(f"SELECT min(_x), max(_x) FROM ({source})", params).fetchone()
+            lower = bounds[0] if lower is None else lower
+            upper = bounds[1] if upper is None else upper
+        result = {"dataset": dataset, "mode": mode, "time_unit": "ms" if is_time else None, "rows": 0, "bucket": None, "series": {}}
+        if lower is None or upper is None:
+            result["series"] = {column: {"ts": []} for column in value_columns}
+            return result
+        bucket_width = max((upper - lower) / width, 1e-9)
+        bucket = f"greatest(least(CAST(floor((_x - {lower!r}) / {bucket_width!r}) AS BIGINT), {width - 1}), 0)"
+        rollup = None
+        if mode != "lttb":
+            bounds = [_filter_param(value, "TIMESTAMP") for value in (start, end) if value is not None]
+            rollup = choose_rollup(
+                config, bucket_width / 1_000_000, time_column, value_columns, tag_column if tag is not None else None, bounds
+            )
+        if rollup is not None:
+            result["source"] = rollup_table(dataset, rollup[0])
+            source, aggregates, params = _rollup_source(result["source"], value_columns, mode, start, end, tag)
+        else:
+            result["source"] = dataset
+            aggregates = ["count(*)", *_aggregates(value_columns, mode)]
+        rows = conn.execute(
+            f"SELECT {bucket} AS _b, {', '.join(aggregates)} FROM ({source}) GROUP BY _b ORDER BY _b",
+            params,
+        ).fetchall()
+
+    scale = 1_000 if is_time else 1
+    result["rows"] = int(sum(row[1] or 0 for row in rows))
+    result["bucket"] = bucket_width / scale
+    if mode == "lttb":
+        result["series"] = _lttb_series(rows, value_columns, width, scale)
+    else:
+        bucket_ts = [(lower + row[0] * bucket_width) / scale for row in rows]
+        stats = ["min", "max"] if mode == "minmax" else ["avg"]
+        for index, column in enumerate(value_columns):
+            series: dict[str, list[Any]] = {"ts": bucket_ts}
+            for offset, stat in enumerate(stats):
+                series[stat] = [row[2 + index * len(stats) + offset] for row in rows]
+            result["series"][column] = series
+    return result
+
+
+def _rollup_source(
+    table: str, value_columns: list[str], mode: str, start: Any, end: Any, tag: Any
+) -> tuple[str, list[str], list[Any]]:
+    """Rollup rows for the range plus the aggregates that combine them: mins of mins, maxes of
+    maxes, and sum/count for averages. The bounds fall on bucket starts (see choose_rollup)."""
+    conditions, params = ["TRUE"], []
+    if start is not None:
+        conditions.append("bucket >= ?")
+        params.append(_filter_param(start, "TIMESTAMP"))
+    if end is not None:
+        conditions.append("bucket < ?")
+        params.append(_filter_param(end, "TIMESTAMP"))
+    if tag is not None:
+        conditions.append("tag = ?")
+        params.append(str(tag))
+    aggregates = ["sum(row_count)"]
+    for column in value_columns:
+        if mode == "minmax":
+            aggregates += [f"min({stat_column(column, 'min')})", f"max({stat_column(column, 'max')})"]
+        else:
+            aggregates.append(f"sum({stat_column(column, 'sum')}) / sum({stat_column(column, 'count')})")
+    source = f"SELECT CAST(epoch_us(bucket) AS DOUBLE) AS _x, * FROM {quote_identifier(table)} WHERE {' AND '.join(conditions)}"
+    return source, aggregates, params
+
+
+def _aggregates(value_columns: list[str], mode: str) -> list[str]:
+    aggregates = []
+    for column in value_columns:
+        value = quote_identifier(column)
+        if mode == "minmax":
+            aggregates += [f"min({value})", f"max({value})"]
+        elif mode == "avg":
+            aggregates.append(f"avg({value})")
+        else:
+            present = f"FILTER (WHERE {value} IS NOT NULL)"
+            aggregates += [
+                f"min(_x) {present}", f"arg_min({value}, _x) {present}",
+                f"max(_x) {present}", f"arg_max({value}, _x) {present}",
+                f"arg_min(_x, {value})", f"min({value})",
+                f"arg_max(_x, {value})", f"max({value})",
+            ]
+    return aggregates
+
+
+def _lttb_series(rows: list[tuple], value_columns: list[str], width: int, scale: int) -> dict[str, dict[str, list[Any]]]:
+    series = {}
+    for index, column in enumerate(value_columns):
+        offset = 2 + index * 8
+        points = {
+            row[offset + pair]: row[offset + pair + 1]
+            for row in rows
+            for pair in range(0, 8, 2)
+            if row[offset + pair] is not None
+        }
+        x = np.array(sorted(points), dtype=float)
+        y = np.array([float(points[key]) for key in sorted(points)], dtype=float)
+        keep = lttb(x, y, width)
+        series[column] = {"ts": (x[keep] / scale).tolist(), "value": y[keep].tolist()}
+    return series
+
+
+def series_to_arrow(result: dict[str, Any]) -> bytes:
+    """Arrow IPC stream of a downsample_series result in long format (series, ts, stats...)."""
+    try:
+        import pyarrow as pa
+    except ImportError as exc:
+        raise RuntimeError("pyarrow is required for Arrow output") from exc
+    frames = [pd.DataFrame(values).assign(series=column) for column, values in result["series"].items()]
+    frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame({"series": [], "ts": []})
+    table = pa.Table.from_pandas(frame[["series", *[name for name in frame.columns if name != "series"]]], preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,442 @@
+from __future__ import annotations
+
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Any, Iterable
+
+import pandas as pd
+
+from app.db.duckdb_store import (
+    bump_version,
+    connect,
+    load_metadata,
+    quote_identifier,
+    save_batches,
+    table_exists,
+    table_fingerprint,
+    table_type,
+    update_metadata,
+    write_connection,
+)
+from app.services.profiles import appended_profile, refresh_profile, store_appended_profile
+from app.utils.file_utils import ensure_path_within
+
+# Partition keys sort in time order, so a time range maps to a contiguous run of partitions.
+PARTITION_FORMATS = {"day": "%Y-%m-%d", "month": "%Y-%m"}
+PARQUET_DIR = "parquet"
+PARTITION_COLUMN = "_partition"
+WRITE_MODES = ("replace", "append", "upsert")
+
+
+def storage_config(project_dir: Path, dataset: str) -> dict[str, Any] | None:
+    return load_metadata(project_dir).get("storage", {}).get(dataset)
+
+
+def _save_config(project_dir: Path, dataset: str, config: dict[str, Any] | None) -> None:
+    with update_metadata(project_dir) as metadata:
+        if config is None:
+            metadata.get("storage", {}).pop(dataset, None)
+        else:
+            metadata.setdefault("storage", {})[dataset] = config
+
+
+def partition_dir(project_dir: Path, dataset: str) -> Path:
+    return ensure_path_within(project_dir, project_dir / PARQUET_DIR / dataset)
+
+
+def _key_sql(expression: str, partition: str) -> str:
+    return f"strftime(CAST({expression} AS TIMESTAMP), '{PARTITION_FORMATS[partition]}')"
+
+
+def _path_sql(path: Path) -> str:
+    return "'" + str(path).replace("'", "''") + "'"
+
+
+def _files_sql(files: list[Path]) -> str:
+    paths = ", ".join(_path_sql(path) for path in files)
+    return f"read_parquet([{paths}], union_by_name = true, hive_partitioning = false)"
+
+
+def _partition_files(directory: Path) -> dict[str, list[Path]]:
+    prefix = f"{PARTITION_COLUMN}="
+    partitions = {}
+    for child in sorted(directory.glob(f"{prefix}*")):
+        files = sorted(child.glob("*.parquet"))
+        if files:
+            partitions[child.name[len(prefix):]] = files
+    return partitions
+
+
+def _is_partitioned(conn: Any, config: dict[str, Any] | None, dataset: str) -> bool:
+    # A later full rewrite (recipe save_table, re-import) replaces the view with a plain table.
+    return bool(config) and config["layout"] == "parquet" and table_type(conn, dataset) == "VIEW"
+
+
+def _create_view(conn: Any, project_dir: Path, dataset: str) -> None:
+    # Relative paths resolve against the project directory (file_search_path), so the view survives a move.
+    root = project_dir.resolve()
+    files = [path.relative_to(root) for paths in _partition_files(partition_dir(project_dir, dataset)).values() for path in paths]
+    conn.execute(f"CREATE OR REPLACE VIEW {quote_identifier(dataset)} AS SELECT * FROM {_files_sql(files)}")
+
+
+def _check_time_column(conn: Any, dataset: str, time_column: str) -> None:
+    if not table_exists(conn, dataset):
+        raise ValueError(f"Dataset '{dataset}' not found")
+    columns = [row[0] for row in conn.execute(f"DESCRIBE {quote_identifier(dataset)}").fetchall()]
+    if time_column not in columns:
+        raise ValueError(f"Missing time column: {time_column}")
+
+
+def set_storage(
+    project_dir: Path, dataset: str, time_column: str, partition: str | None = None, presorted: bool = False
+) -> dict[str, Any]:
+    """Store a dataset ordered by its time column, optionally as day/month Parquet partitions.
+
+    Sorted storage keeps DuckDB's per-row-group min/max useful, so time-range filters skip
+    most of the table. Partitioned datasets become a view over one Parquet file per period.
+    `presorted` skips the rewrite for tables the caller has just written in time order.
+    """
+    if partition is not None and partition not in PARTITION_FORMATS:
+        raise ValueError(f"Unsupported partition: {partition}")
+    ts = quote_identifier(time_column)
+    name = quote_identifier(dataset)
+    directory = partition_dir(project_dir, dataset)
+    with write_connection(project_dir) as conn:
+        _check_time_column(conn, dataset, time_column)
+        if partition is None:
+            if table_type(conn, dataset) == "VIEW" or not presorted:
+                sorted_table = quote_identifier(f"_sorted_{dataset}")
+                conn.execute("BEGIN TRANSACTION")
+                try:
+                    conn.execute(f"CREATE OR REPLACE TABLE {sorted_table} AS SELECT * FROM {name} ORDER BY {ts}")
+                    if table_type(conn, dataset) == "VIEW":
+                        conn.execute(f"DROP VIEW {name}")
+                    else:
+                        conn.execute(f"DROP TABLE {name}")
+                    conn.execute(f"ALTER TABLE {sorted_table} RENAME TO {name}")
+                    bump_version(conn, dataset)
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+            partitions = 0
+        else:
+            staging = directory.with_name(f".{dataset}.tmp")
+            shutil.rmtree(staging, ignore_errors=True)
+            staging.parent.mkdir(parents=True, exist_ok=True)
+            key = _key_sql(ts, partition)
+            conn.execute(
+                f"COPY (SELECT *, {key} AS {PARTITION_COLUMN} FROM {name} ORDER BY {ts}) "
+                f"TO {_path_sql(staging)} (FORMAT PARQUET, PARTITION_BY ({PARTITION_COLUMN}))"
+            )
+            shutil.rmtree(directory, ignore_errors=True)
+            os.replace(staging, directory)
+            conn.execute("BEGIN TRANSACTION")
+            try:
+                if table_type(conn, dataset) == "BASE TABLE":
+                    conn.execute(f"DROP TABLE {name}")
+                _create_view(conn, project_dir, dataset)
+                bump_version(conn, dataset)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            partitions = len(_partition_files(directory))
+    if partition is None:
+        shutil.rmtree(directory, ignore_errors=True)
+    config = {"layout": "parquet" if partition else "sorted", "time_column": time_column, "partition": partition}
+    _save_config(project_dir, dataset, config)
+    return {"dataset": dataset, **config, "partitions": partitions}
+
+
+def clear_storage(project_dir: Path, dataset: str) -> None:
+    """Forget the layout of a dataset that was rewritten as a plain, unsorted table."""
+    if storage_config(project_dir, dataset) is not None:
+        _save_config(project_dir, dataset, None)
+    shutil.rmtree(partition_dir(project_dir, dataset), ignore_errors=True)
+
+
+def staging_table(dataset: str) -> str:
+    """A fresh staging table name for one write, so concurrent writers to a dataset never share one."""
+    return f"_staging_{dataset}_{uuid.uuid4().hex[:12]}"
+
+
+def drop_staging(project_dir: Path, staging: str) -> None:
+    with write_connection(project_dir) as conn:
+        conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(staging)}")
+
+
+def resolve_write_mode(project_dir: Path, dataset: str, mode: str, key: list[str] | None = None) -> list[str] | None:
+    """Validate a write mode; without an explicit key the one declared by an earlier upsert is used."""
+    if mode not in WRITE_MODES:
+        raise ValueError(f"Unsupported mode: {mode}")
+    if isinstance(key, str):
+        key = [key]
+    key = list(key) if key else load_metadata(project_dir).get("keys", {}).get(dataset)
+    if mode == "upsert" and not key:
+        raise ValueError("Upsert requires a key")
+    return key
+
+
+def _types(conn: Any, relation: str) -> dict[str, str]:
+    return {row[0]: row[1] for row in conn.execute(f"DESCRIBE {relation}").fetchall()}
+
+
+def _widen_schema(conn: Any, dataset: str, staging: str, alter: bool) -> None:
+    """Add new columns and widen changed ones (INTEGER -> BIGINT, DATE -> TIMESTAMP, ...).
+
+    DuckDB's own union typing decides the widened type; a column that would fall back to
+    VARCHAR is a conflict rather than a widening.
+    """
+    name, staged = quote_identifier(dataset), quote_identifier(staging)
+    current, incoming = _types(conn, name), _types(conn, staged)
+    combined = _types(conn, f"SELECT * FROM (FROM {name} LIMIT 0) UNION ALL BY NAME (FROM {staged} LIMIT 0)")
+    conflicts = [
+        f"{column} ({current[column]} vs {incoming[column]})"
+        for column, column_type in combined.items()
+        if column in current and column in incoming and column_type != current[column] and column_type == "VARCHAR"
+    ]
+    if conflicts:
+        raise ValueError(f"Incompatible column types: {', '.join(conflicts)}")
+    if not alter:
+        return
+    for column, column_type in combined.items():
+        if column not in current:
+            conn.execute(f"ALTER TABLE {name} ADD COLUMN {quote_identifier(column)} {column_type}")
+        elif column_type != current[column]:
+            conn.execute(f"ALTER TABLE {name} ALTER {quote_identifier(column)} SET DATA TYPE {column_type}")
+
+
+def _match_sql(key: list[str], left: str, right: str) -> str:
+    return " AND ".join(
+        f"{left}.{quote_identifier(column)} IS NOT DISTINCT FROM {right}.{quote_identifier(column)}" for column in key
+    )
+
+
+def write_batches(
+    project_dir: Path,
+    dataset: str,
+    batches: Iterable[pd.DataFrame],
+    mode: str = "append",
+    key: list[str] | None = None,
+) -> dict[str, int]:
+    """Write frames to a dataset with mode replace, append or upsert; see merge_staging."""
+    key = resolve_write_mode(project_dir, dataset, mode, key)
+    with connect(project_dir) as conn:
+        exists = table_exists(conn, dataset)
+    if mode == "replace" or not exists:
+        rows = save_batches(project_dir, dataset, batches)
+        refresh_profile(project_dir, dataset)
+        return {"rows": rows, "inserted": rows, "updated": 0, "skipped": 0}
+    staging = staging_table(dataset)
+    try:
+        save_batches(project_dir, staging, batches)
+    except BaseException:
+        drop_staging(project_dir, staging)
+        raise
+    return merge_staging(project_dir, dataset, staging, mode, key)
+
+
+def merge_staging(
+    project_dir: Path,
+    dataset: str,
+    staging: str,
+    mode: str = "append",
+    key: list[str] | None = None,
+    keep_on_error: bool = False,
+) -> dict[str, int]:
+    """Move the rows of a staging table (see staging_table) into a dataset and drop the staging table.
+
+    Appends check the schema (new columns are added, numeric and time types widened) and run in
+    one transaction. With a key, rows repeated inside the batch are collapsed and rows whose key
+    already exists are skipped (append) or replace the stored row (upsert), using set-based
+    anti-joins in DuckDB. Sorted tables are re-sorted only when new rows reach back before the
+    current end. For partitioned datasets only the partitions the new rows fall in are rewritten,
+    and keys are matched within a partition, so they should include the time column; each file
+    is replaced atomically, but a failure part-way can leave earlier partitions updated. With
+    keep_on_error a failed merge leaves the staging table in place for a retry.
+    """
+    key = resolve_write_mode(project_dir, dataset, mode, key)
+    staged, name = quote_identifier(staging), quote_identifier(dataset)
+    config = storage_config(project_dir, dataset)
+    failed = False
+    try:
+        with write_connection(project_dir) as conn:
+            if not table_exists(conn, staging):
+                return {"rows": 0, "inserted": 0, "updated": 0, "skipped": 0}
+            if not table_exists(conn, dataset):
+                conn.execute(f"ALTER TABLE {staged} RENAME TO {name}")
+                rows = conn.execute(f"SELECT count(*) FROM {name}").fetchone()[0]
+                bump_version(conn, dataset)
+                return {"rows": rows, "inserted": rows, "updated": 0, "skipped": 0}
+            rows = conn.execute(f"SELECT count(*) FROM {staged}").fetchone()[0]
+            if key:
+                missing = [column for column in key if column not in _types(conn, staged)]
+                if missing:
+                    raise ValueError(f"Missing key columns: {', '.join(missing)}")
+                # The last copy of a key in the batch wins for upserts, the first for appends.
+                order = "DESC" if mode == "upsert" else "ASC"
+                partition = ", ".join(quote_identifier(column) for column in key)
+                conn.execute(
+                    f"CREATE OR REPLACE TABLE {staged} AS SELECT * FROM {staged} "
+                    f"QUALIFY row_number() OVER (PARTITION BY {partition} ORDER BY rowid {order}) = 1"
+                )
+            unique = conn.execute(f"SELECT count(*) FROM {staged}").fetchone()[0]
+            partitioned = _is_partitioned(conn, config, dataset)
+            before = conn.execute(f"SELECT count(*) FROM {name}").fetchone()[0]
+            previous = table_fingerprint(conn, dataset)
+            profile = None
+            if partitioned and mode == "append" and not key:
+                profile = appended_profile(conn, project_dir, dataset, staged, previous)
+            if partitioned:
+                # Parquet files are rewritten whole, so only the type check applies; the view unions by name.
+                _widen_schema(conn, dataset, staging, alter=False)
+                _rewrite_partitions(conn, project_dir, dataset, staging, config, mode, key)
+            conn.execute("BEGIN TRANSACTION")
+            try:
+                if partitioned:
+                    _create_view(conn, project_dir, dataset)
+                else:
+                    _widen_schema(conn, dataset, staging, alter=True)
+                    _merge_table(conn, dataset, staging, config, mode, key)
+                    if mode == "append":
+                        # The staging table now holds exactly the inserted rows.
+                        profile = appended_profile(conn, project_dir, dataset, staged, previous)
+                after = conn.execute(f"SELECT count(*) FROM {name}").fetchone()[0]
+                fingerprint = bump_version(conn, dataset)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        if not (failed and keep_on_error):
+            drop_staging(project_dir, staging)
+    if key:
+        with update_metadata(project_dir) as metadata:
+            metadata.setdefault("keys", {})[dataset] = key
+    store_appended_profile(project_dir, dataset, profile, fingerprint)
+    inserted = after - before
+    updated = unique - inserted if mode == "upsert" else 0
+    return {"rows": rows, "inserted": inserted, "updated": updated, "skipped": rows - inserted - updated}
+
+
+def replace_with_staging(project_dir: Path, dataset: str, staging: str) -> int:
+    """Swap a staging table in as the whole dataset, in one transaction; returns its row count."""
+    name = quote_identifier(dataset)
+    with write_connection(project_dir) as conn:
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            kind = table_type(conn, dataset)
+            if kind == "VIEW":
+                conn.execute(f"DROP VIEW {name}")
+            elif kind is not None:
+                conn.execute(f"DROP TABLE {name}")
+            conn.execute(f"ALTER TABLE {quote_identifier(staging)} RENAME TO {name}")
+            rows = conn.execute(f"SELECT count(*) FROM {name}").fetchone()[0]
+            bump_version(conn, dataset)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    clear_storage(project_dir, dataset)
+    refresh_profile(project_dir, dataset)
+    return rows
+
+
+def _merge_table(
+    conn: Any, dataset: str, staging: str, config: dict[str, Any] | None, mode: str, key: list[str] | None
+) -> None:
+    name, staged = quote_identifier(dataset), quote_identifier(staging)
+    ts = quote_identifier(config["time_column"]) if config else None
+    if key and mode == "upsert":
+        conn.execute(f"DELETE FROM {name} AS t USING {staged} AS s WHERE {_match_sql(key, 't', 's')}")
+    if key and mode == "append":
+        conn.execute(f"DELETE FROM {staged} AS s WHERE EXISTS (SELECT 1 FROM {name} AS t WHERE {_match_sql(key, 't', 's')})")
+    previous_end = conn.execute(f"SELECT max({ts}) FROM {name}").fetchone()[0] if ts else None
+    conn.execute(f"INSERT INTO {name} BY NAME SELECT * FROM {staged}" + (f" ORDER BY {ts}" if ts else ""))
+    if previous_end is not None:
+        earliest = conn.execute(f"SELECT min({ts}) FROM {staged}").fetchone()[0]
+        if earliest is not None and earliest < previous_end:
+            conn.execute(f"CREATE OR REPLACE TABLE {name} AS SELECT * FROM {name} ORDER BY {ts}")
+
+
+def _rewrite_partitions(
+    conn: Any,
+    project_dir: Path,
+    dataset: str,
+    staging: str,
+    config: dict[str, Any],
+    mode: str,
+    key: list[str] | None,
+) -> None:
+    ts = quote_identifier(config["time_column"])
+    partition_key = _key_sql(ts, config["partition"])
+    staged = quote_identifier(staging)
+    directory = partition_dir(project_dir, dataset)
+    existing = _partition_files(directory)
+    touched = [row[0] for row in conn.execute(f"SELECT DISTINCT {partition_key} FROM {staged} WHERE {ts} IS NOT NULL").fetchall()]
+    if conn.execute(f"SELECT count(*) FROM {staged} WHERE {ts} IS NULL").fetchone()[0]:
+        touched.append(None)
+    for value in touched:
+        label = value if value is not None else "NULL"
+        target = directory / f"{PARTITION_COLUMN}={label}"
+        target.mkdir(parents=True, exist_ok=True)
+        condition = f"{partition_key} = ?" if value is not None else f"{ts} IS NULL"
+        params = [value] if value is not None else []
+        sql = f"SELECT * FROM {staged} AS s WHERE {condition}"
+        if label in existing:
+            stored = f"SELECT * FROM {_files_sql(existing[label])} AS t"
+            if key and mode == "upsert":
+                stored += f" WHERE NOT EXISTS (SELECT 1 FROM {staged} AS s WHERE {_match_sql(key, 't', 's')})"
+            elif key:
+                sql += f" AND NOT EXISTS (SELECT 1 FROM {_files_sql(existing[label])} AS t WHERE {_match_sql(key, 't', 's')})"
+            sql = f"{stored} UNION ALL BY NAME {sql}"
+        temporary = target / "data_0.parquet.tmp"
+        conn.execute(f"COPY ({sql} ORDER BY {ts}) TO {_path_sql(temporary)} (FORMAT PARQUET)", params)
+        # Replace first: a crash before the cleanup leaves stale files next to the new one, never a gap.
+        replaced = target / "data_0.parquet"
+        os.replace(temporary, replaced)
+        for path in existing.get(label, []):
+            if path != replaced:
+                path.unlink()
+
+
+def dataset_source(project_dir: Path, dataset: str, time_column: str, start: Any = None, end: Any = None) -> str:
+    """FROM-clause for reading a dataset filtered on time_column between start and end.
+
+    For partitioned datasets this names only the Parquet files whose period overlaps the
+    range, so DuckDB never opens the others; everything else reads the table itself.
+    """
+    config = storage_config(project_dir, dataset)
+    if config is None or config["time_column"] != time_column or (start is None and end is None):
+        return quote_identifier(dataset)
+    with connect(project_dir) as conn:
+        if not _is_partitioned(conn, config, dataset):
+            return quote_identifier(dataset)
+        bounds = [
+            conn.execute(f"SELECT {_key_sql('?', config['partition'])}", [_time_value(value)]).fetchone()[0]
+            if value is not None else None
+            for value in (start, end)
+        ]
+    files = [
+        path
+        for label, paths in _partition_files(partition_dir(project_dir, dataset)).items()
+        if label != "NULL" and (bounds[0] is None or label >= bounds[0]) and (bounds[1] is None or label <= bounds[1])
+        for path in paths
+    ]
+    if not files:
+        return f"(SELECT * FROM {quote_identifier(dataset)} LIMIT 0)"
+    return f"(SELECT * FROM {_files_sql(files)})"
+
+
+def _time_value(value: Any) -> Any:
+    if isinstance(value, str):
+        return pd.Timestamp(value).to_pydatetime()
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value
@@ -0,0 +1,394 @@
+from __future__ import annotations
+
+import copy
+import io
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+import pandas as pd
+
+from app.db.duckdb_store import load_metadata, update_metadata
+from app.services.bulk_import import SOURCE_FILE_COLUMN, ensure_import_root, match_files
+from app.services.importer import apply_timestamp_options
+from app.services.rollups import refresh_rollups
+from app.services.storage import write_batches
+from app.services.text_logs import REJECTS_SUFFIX
+from app.settings import WATCH_READ_BYTES
+from app.utils.file_utils import sanitize_name
+
+WATCH_FORMATS = {"csv", "text"}
+# Throughput is reported over the flushes of this many trailing seconds.
+RATE_WINDOW_SECONDS = 60.0
+
+
+@dataclass
+class WatchConfig:
+    """A local file, or the files matching pattern in a directory, followed like `tail -F`.
+
+    csv files take their header from the first line; text files become one row per line
+    with the time it was read. New rows are appended to dataset every interval_seconds or
+    as soon as max_rows are waiting, whichever comes first.
+    """
+
+    name: str
+    dataset: str
+    path: str
+    pattern: str = "*.log"
+    format: str = "csv"
+    delimiter: str = ","
+    encoding: str = "utf-8"
+    timestamp_column: Optional[str] = None
+    key: Optional[list[str]] = None
+    interval_seconds: float = 5.0
+    max_rows: int = 10_000
+    poll_seconds: float = 1.0
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def save_watch_config(project_dir: Path, config: WatchConfig) -> None:
+    if config.format not in WATCH_FORMATS:
+        raise ValueError(f"Unsupported watch format: {config.format}")
+    if config.interval_seconds <= 0 or config.max_rows < 1 or config.poll_seconds <= 0:
+        raise ValueError("interval_seconds, max_rows and poll_seconds must be positive")
+    root = ensure_import_root(Path(config.path))
+    if not root.is_file():
+        match_files(root, config.pattern)
+    config.dataset = sanitize_name(config.dataset)
+    with update_metadata(project_dir) as metadata:
+        watches = metadata.setdefault("watches", {})
+        previous = watches.get(config.name, {})
+        entry = {"config": asdict(config), "files": {}, "stats": {}, "active": previous.get("active", False)}
+        # Re-registering keeps the offsets unless the files or the way they are parsed changed.
+        same_source = {"dataset", "path", "pattern", "format", "delimiter", "encoding"}
+        if previous and all(previous["config"].get(name) == entry["config"][name] for name in same_source):
+            entry["files"], entry["stats"] = previous.get("files", {}), previous.get("stats", {})
+        watches[config.name] = entry
+
+
+def get_watch(project_dir: Path, name: str) -> dict[str, Any]:
+    entry = load_metadata(project_dir).get("watches", {}).get(name)
+    if not entry:
+        raise ValueError(f"Watch '{name}' not found")
+    return entry
+
+
+def list_watches(project_dir: Path) -> dict[str, dict[str, Any]]:
+    return load_metadata(project_dir).get("watches", {})
+
+
+def delete_watch(project_dir: Path, name: str) -> None:
+    with update_metadata(project_dir) as metadata:
+        metadata.get("watches", {}).pop(name, None)
+
+
+def _update_watch(project_dir: Path, name: str, **values: Any) -> None:
+    with update_metadata(project_dir) as metadata:
+        entry = metadata.get("watches", {}).get(name)
+        if entry is not None:
+            entry.update(values)
+
+
+class TailFollower:
+    """Reads the complete lines appended since the last committed offset of every followed file.
+
+    Files are tracked by inode, so a rotated file (app.log renamed to app.log.1) is read to its
+    end under the new name while the new app.log starts from zero; the new name is found in the
+    same directory even when the pattern does not match it. A file that shrinks is read again
+    from the start. CSV lines that do not parse go to <dataset>_rejects. Offsets are committed to project metadata only after the rows read up to them
+    are in the dataset, so a restart resumes without losing lines. A crash between the write and
+    the commit re-reads that batch; declare a key to have it deduplicated. When a write fails the
+    batch is kept and retried, and nothing new is read until it succeeds.
+    """
+
+    def __init__(self, project_dir: Path, name: str) -> None:
+        entry = get_watch(project_dir, name)
+        self.project_dir = project_dir
+        self.config = WatchConfig(**entry["config"])
+        self.committed: dict[str, dict[str, Any]] = entry.get("files", {})
+        self.stats: dict[str, Any] = {"rows": 0, "flushes": 0, "last_flush": None, "last_rows": 0, **entry.get("stats", {})}
+        self.last_error: str | None = None
+        self._positions = copy.deepcopy(self.committed)
+        self._pending: list[pd.DataFrame] = []
+        self._rejects: list[pd.DataFrame] = []
+        self._pending_rows = 0
+        self._pending_since: float | None = None
+        self._flush_failed = False
+        self._flushes: deque[tuple[float, int]] = deque()
+        self._started = time.time()
+        self._lock = threading.Lock()
+
+    def _files(self) -> dict[str, Any]:
+        root = ensure_import_root(Path(self.config.path))
+        if root.is_dir():
+            paths = match_files(root, self.config.pattern)
+        else:
+            # A single followed file may be missing for a moment while it is rotated.
+            paths = [root] if root.exists() else []
+        stats = {}
+        for path in paths:
+            try:
+                stats[str(path)] = path.stat()
+            except FileNotFoundError:
+                continue
+        return stats
+
+    @staticmethod
+    def _renamed(previous: str, inode: int) -> tuple[str, Any] | None:
+        """The file with this inode in the directory of its previous path, e.g. app.log -> app.log.1."""
+        try:
+            entries = list(os.scandir(Path(previous).parent))
+        except OSError:
+            return None
+        for entry in entries:
+            try:
+                if entry.inode() == inode and entry.is_file():
+                    return str(ensure_import_root(Path(entry.path))), entry.stat()
+            except (OSError, ValueError):
+                continue
+        return None
+
+    def poll(self) -> int:
+        current = self._files()
+        by_inode = {stat.st_ino: path for path, stat in current.items()}
+        positions = {}
+        rotated = {}
+        for previous, position in self._positions.items():
+            moved = by_inode.get(position["inode"])
+            if moved is not None:
+                positions[moved] = position
+                continue
+            renamed = self._renamed(previous, position["inode"])
+            if renamed is not None and renamed[1].st_size > position["offset"]:
+                # Rotated to a name the pattern does not match: followed until its tail is read.
+                rotated[renamed[0]] = renamed[1]
+                positions[renamed[0]] = position
+        rows = 0
+        try:
+            for path, stat in {**rotated, **current}.items():
+                position = positions.get(path)
+                if position is None or position["inode"] != stat.st_ino or stat.st_size < position["offset"]:
+                    position = {"inode": stat.st_ino, "offset": 0, "header": None}
+                if stat.st_size > position["offset"]:
+                    read, position = self._read(Path(path), position, stat.st_size)
+                    rows += read
+                positions[path] = position
+        finally:
+            # A file whose read failed keeps its old offset and is read again on the next poll.
+            self._positions = positions
+        return rows
+
+    def _read(self, path: Path, position: dict[str, Any], size: int) -> tuple[int, dict[str, Any]]:
+        """Stage the complete lines after position; returns the rows read and the advanced position."""
+        with path.open("rb") as handle:
+            handle.seek(position["offset"])
+            data = handle.read(min(size - position["offset"], WATCH_READ_BYTES))
+        end = data.rfind(b"\n")
+        if end < 0:
+            # Only part of a line so far; it is read once the writer finishes it.
+            return 0, position
+        data = data[: end + 1]
+        advanced = {**position, "offset": position["offset"] + len(data)}
+        encoding = self.config.encoding
+        rejects = None
+        if self.config.format == "csv":
+            if advanced["header"] is None:
+                header, _, data = data.partition(b"\n")
+                advanced["header"] = header.decode(encoding).rstrip("\r")
+            if not data.strip():
+                return 0, advanced
+            frame, rejects = self._parse_csv(advanced["header"], data)
+        else:
+            lines = data.decode(encoding, errors="replace").splitlines()
+            frame = pd.DataFrame({"ingested_at": pd.Timestamp.now(tz="UTC").tz_localize(None), "line": lines})
+        frame[SOURCE_FILE_COLUMN] = path.name
+        self._pending.append(frame)
+        if rejects is not None:
+            rejects.insert(0, SOURCE_FILE_COLUMN, path.name)
+            self._rejects.append(rejects)
+        self._pending_rows += len(frame)
+        if self._pending_since is None:
+            self._pending_since = time.monotonic()
+        return len(frame), advanced
+
+    def _parse_csv(self, header: str, data: bytes) -> tuple[pd.DataFrame, pd.DataFrame | None]:
+        """Parse CSV lines under header; lines with extra fields or a bad timestamp are split off as rejects."""
+        encoding, delimiter = self.config.encoding, self.config.delimiter
+        text = io.BytesIO(header.encode(encoding) + b"\n" + data)
+        options = {"delimiter": delimiter, "encoding": encoding, "encoding_errors": "replace"}
+        bad: list[list[str]] = []
+        try:
+            frame = pd.read_csv(text, **options)
+        except pd.errors.ParserError:
+            text.seek(0)
+            frame = pd.read_csv(text, engine="python", on_bad_lines=lambda fields: bad.append(fields), **options)
+        rejects = [{"reason": "Wrong number of fields", "line": delimiter.join(fields)} for fields in bad]
+        column = self.config.timestamp_column
+        if column and column in frame.columns:
+            invalid = pd.to_datetime(frame[column], errors="coerce").isna() & frame[column].notna()
+            invalid_rows = frame[invalid]
+            lines = invalid_rows.astype("string").fillna("").agg(delimiter.join, axis=1)
+            rejects += [{"reason": f"Invalid timestamp: {value}", "line": line} for value, line in zip(invalid_rows[column], lines)]
+            frame = frame[~invalid]
+        frame = apply_timestamp_options(frame, {"timestamp_column": column})
+        return frame, pd.DataFrame(rejects, columns=["reason", "line"]) if rejects else None
+
+    def due(self) -> bool:
+        if self._pending_rows >= self.config.max_rows:
+            return True
+        return self._pending_since is not None and time.monotonic() - self._pending_since >= self.config.interval_seconds
+
+    def flush(self) -> int:
+        rows = self._pending_rows
+        try:
+            if rows:
+                # Files with different headers add columns; concat unions them before the schema-checked append.
+                frame = pd.concat(self._pending, ignore_index=True)
+                write_batches(self.project_dir, self.config.dataset, [frame], "append", self.config.key)
+                self._pending, self._pending_rows = [], 0
+                refresh_rollups(self.project_dir, self.config.dataset, appended=True)
+                self._flushes.append((time.time(), rows))
+                self.stats.update(
+                    rows=self.stats["rows"] + rows, flushes=self.stats["flushes"] + 1, last_flush=_now(), last_rows=rows
+                )
+            if self._rejects:
+                rejects = pd.concat(self._rejects, ignore_index=True)
+                write_batches(self.project_dir, self.config.dataset + REJECTS_SUFFIX, [rejects], "append")
+                self._rejects = []
+        except Exception:
+            # Keep what was not written for the next attempt; step() reads nothing new meanwhile.
+            self._flush_failed = True
+            raise
+        self._flush_failed = False
+        if rows or self._positions != self.committed:
+            self.committed = copy.deepcopy(self._positions)
+            with update_metadata(self.project_dir) as metadata:
+                entry = metadata.get("watches", {}).get(self.config.name)
+                if entry is not None:
+                    entry.update(files=copy.deepcopy(self.committed), stats=dict(self.stats))
+                if rows:
+                    metadata["datasets"] = sorted(set(metadata.get("datasets", [])) | {self.config.dataset})
+        self._pending_since = None
+        return rows
+
+    def step(self, force: bool = False) -> int:
+        """One poll, flushing when the batch is due (or always with force); returns rows written."""
+        with self._lock:
+            if not self._flush_failed:
+                self.poll()
+            if force or self._flush_failed or self.due():
+                return self.flush()
+            return 0
+
+    def run(self, stop: threading.Event) -> None:
+        while not stop.wait(self.config.poll_seconds):
+            try:
+                self.step()
+                self.last_error = None
+            except Exception as exc:  # noqa: BLE001 - a follower keeps running; the error is shown in status
+                self.last_error = str(exc)
+        with self._lock:
+            try:
+                self.flush()
+            except Exception as exc:  # noqa: BLE001
+                self.last_error = str(exc)
+
+    def status(self) -> dict[str, Any]:
+        now = time.time()
+        while self._flushes and now - self._flushes[0][0] > RATE_WINDOW_SECONDS:
+            self._flushes.popleft()
+        window = min(RATE_WINDOW_SECONDS, max(now - self._started, 1e-9))
+        try:
+            sizes = {path: stat.st_size for path, stat in self._files().items()}
+        except ValueError:
+            sizes = {}
+        behind = sum(max(size - self.committed.get(path, {}).get("offset", 0), 0) for path, size in sizes.items())
+        return {
+            "name": self.config.name,
+            "dataset": self.config.dataset,
+            "files": len(sizes),
+            "pending_rows": self._pending_rows,
+            "bytes_behind": behind,
+            # How long the oldest row read but not yet written has been waiting.
+            "lag_seconds": round(time.monotonic() - self._pending_since, 3) if self._pending_since is not None else 0.0,
+            "rows_per_second": round(sum(rows for _, rows in self._flushes) / window, 1),
+            "last_error": self.last_error,
+            **self.stats,
+        }
+
+
+class WatchManager:
+    """Runs one follower thread per active watch; watches left active resume at startup."""
+
+    def __init__(self) -> None:
+        self._followers: dict[tuple[str, str], tuple[TailFollower, threading.Event, threading.Thread]] = {}
+        self._lock = threading.Lock()
+
+    def start(self, project_dir: Path, name: str) -> dict[str, Any]:
+        with self._lock:
+            running = self._followers.get((str(project_dir), name))
+            if running is None:
+                follower = TailFollower(project_dir, name)
+                stop = threading.Event()
+                thread = threading.Thread(target=follower.run, args=(stop,), name=f"watch-{name}", daemon=True)
+                self._followers[(str(project_dir), name)] = running = (follower, stop, thread)
+                thread.start()
+        _update_watch(project_dir, name, active=True)
+        return {"status": "running", **running[0].status()}
+
+    def stop(self, project_dir: Path, name: str, deactivate: bool = True) -> dict[str, Any]:
+        with self._lock:
+            running = self._followers.pop((str(project_dir), name), None)
+        if deactivate:
+            get_watch(project_dir, name)
+            _update_watch(project_dir, name, active=False)
+        if running is None:
+            return {"status": "stopped", "name": name}
+        follower, stop, thread = running
+        stop.set()
+        thread.join(timeout=max(follower.config.poll_seconds * 2, 30))
+        return {"status": "stopped", **follower.status()}
+
+    def status(self, project_dir: Path, name: str) -> dict[str, Any]:
+        running = self._followers.get((str(project_dir), name))
+        if running is not None:
+            return {"status": "running", **running[0].status()}
+        return {"status": "stopped", **TailFollower(project_dir, name).status()}
+
+    def poll(self, project_dir: Path, name: str) -> dict[str, Any]:
+        """Ingest everything new right away, through the running follower if there is one."""
+        running = self._followers.get((str(project_dir), name))
+        follower = running[0] if running is not None else TailFollower(project_dir, name)
+        written = follower.step(force=True)
+        return {"status": "running" if running else "stopped", "written": written, **follower.status()}
+
+    def resume(self, projects_dir: Path) -> list[str]:
+        started = []
+        for metadata_path in sorted(projects_dir.glob("*/metadata.json")):
+            project_dir = metadata_path.parent
+            for name, entry in list_watches(project_dir).items():
+                if entry.get("active"):
+                    try:
+                        self.start(project_dir, name)
+                    except ValueError:
+                        continue
+                    started.append(f"{project_dir.name}/{name}")
+        return started
+
+    def shutdown(self) -> None:
+        with self._lock:
+            keys = list(self._followers)
+        for project_dir, name in keys:
+            # Stopped for shutdown only: the watch stays active and resumes on the next start.
+            self.stop(Path(project_dir), name, deactivate=False)
+
+
+watch_manager = WatchManager()
@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Any
+
+import duckdb
+
+from app.db.duckdb_store import (
+    bump_version,
+    drop_view,
+    list_tables,
+    quote_identifier,
+    register_datasets,
+    table_columns,
+    write_connection,
+)
+from app.services.bulk_import import SOURCE_FILE_COLUMN
+from app.services.importer import DUCKDB_CSV_ENCODINGS, ImportResult, finish_import, import_target
+from app.services.jobs import report_progress
+from app.settings import UPLOAD_CHUNK_SIZE
+from app.utils.file_utils import sanitize_name
+
+TEXT_LOG_DATASET = "text_logs"
+TIMESTAMP_FIELD = "ts"
+DEFAULT_TEMPLATE = "{ts} {level} {message}"
+# Patterns for template fields written without one ("{name:regex}" sets it); other fields are one token.
+FIELD_PATTERNS = {
+    "ts": r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?",
+    "level": r"[A-Za-z]+",
+    "message": r".*",
+}
+TOKEN_PATTERN = r"\S+"
+FIELD_TYPES = {"VARCHAR", "BIGINT", "INTEGER", "DOUBLE", "BOOLEAN", "DATE", "TIME", "TIMESTAMP"}
+REJECTS_SUFFIX = "_rejects"
+
+_TEMPLATE_FIELD = re.compile(r"\{(\w+)(?::((?:[^{}]|\{[^{}]*\})+))?\}")
+_REGEX_SPECIAL = re.compile(r"([.^$*+?()\[\]{}|\\])")
+_KEY_NAME = re.compile(r"^\w+$")
+# Lines are read as a single VARCHAR column: no quoting, and a delimiter that does not occur in text.
+# ignore_errors is left off: with it, DuckDB's parallel reader can split lines at buffer boundaries.
+_LINES = "read_csv(?, columns={'line': 'VARCHAR'}, header=false, delim=?, quote='', escape='', auto_detect=false)"
+_LINE_DELIMITER = "\x00"
+_MATCH = "__match"
+_LINE = "__line"
+
+
+def _literal(text: str) -> str:
+    # Any run of whitespace in the template matches any run of whitespace in the log.
+    return r"\s+".join(_REGEX_SPECIAL.sub(r"\\\1", chunk) for chunk in re.split(r"\s+", text))
+
+
+def template_pattern(template: str) -> str:
+    """Anchored regex for a template such as "{ts} [{level}] {message}", one named group per field."""
+    parts, position = ["^"], 0
+    for match in _TEMPLATE_FIELD.finditer(template):
+        name, pattern = match.group(1), match.group(2)
+        parts.append(_literal(template[position : match.start()]))
+        parts.append(f"(?P<{name}>{pattern or FIELD_PATTERNS.get(name, TOKEN_PATTERN)})")
+        position = match.end()
+    parts.append(_literal(template[position:]) + "$")
+    return "".join(parts)
+
+
+def text_log_parser(options: dict[str, Any]) -> tuple[str, list[str | None]]:
+    """The regex to apply and the name of each capture group by position (None if unnamed)."""
+    if options.get("pattern") and options.get("template"):
+        raise ValueError("Give either pattern or template, not both")
+    pattern = options.get("pattern") or template_pattern(options.get("template") or DEFAULT_TEMPLATE)
+    try:
+        compiled = re.compile(pattern)
+    except re.error as exc:
+        raise ValueError(f"Invalid pattern: {exc}") from exc
+    # DuckDB matches with RE2, which has no lookaround or backreferences; Python's re accepts both.
+    try:
+        with duckdb.connect() as conn:
+            conn.execute("SELECT regexp_matches('', ?)", [pattern]).fetchall()
+    except duckdb.Error as exc:
+        raise ValueError(f"Invalid pattern: {str(exc).splitlines()[0]}") from exc
+    if not compiled.groupindex:
+        raise ValueError("The pattern needs at least one named group, e.g. (?P<message>.*)")
+    names = {index: name for name, index in compiled.groupindex.items()}
+    groups = [names.get(index) for index in range(1, compiled.groups + 1)]
+    for name in (SOURCE_FILE_COLUMN, "reason", _MATCH, _LINE):
+        if name in names.values():
+            raise ValueError(f"Reserved field name: {name}")
+    return pattern, groups
+
+
+def _sql_string(value: str) -> str:
+    # Patterns and formats are inlined: DuckDB compiles a constant regex once, a parameter per row.
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _columns(fields: list[str], options: dict[str, Any]) -> list[str]:
+    """Typed output columns over the extracted fields."""
+    types = {name: str(value).upper() for name, value in (options.get("types") or {}).items()}
+    key_values = options.get("key_values") or []
+    for name, column_type in types.items():
+        if name not in fields and name not in key_values:
+            raise ValueError(f"Unknown field in types: {name}")
+        if column_type not in FIELD_TYPES:
+            raise ValueError(f"Unsupported type for {name}: {column_type}")
+    expressions = []
+    for name in fields:
+        value = f"nullif({quote_identifier(name)}, '')"
+        if name == TIMESTAMP_FIELD and name not in types:
+            if options.get("timestamp_format"):
+                value = f"try_strptime({value}, {_sql_string(options['timestamp_format'])})"
+            else:
+                # Log timestamps often have a comma before the milliseconds (log4j and many PLC loggers).
+                value = f"TRY_CAST(replace({value}, ',', '.') AS TIMESTAMP)"
+            if options.get("timezone"):
+                value = f"timezone({_sql_string(options['timezone'])}, {value})"
+        elif name in types:
+            value = f"TRY_CAST({value} AS {types[name]})"
+        expressions.append(f"{value} AS {quote_identifier(name)}")
+    if key_values and "message" not in fields:
+        raise ValueError("key_values are read from the message field")
+    message = quote_identifier("message")
+    for key in key_values:
+        if not _KEY_NAME.match(key) or key in fields:
+            raise ValueError(f"Invalid key_values name: {key}")
+        pattern = _sql_string(rf'(?:^|[\s,;]){key}=("[^"]*"|[^\s,;]*)')
+        # contains() first: most lines lack most keys, and the substring test is far cheaper than the regex.
+        value = f"CASE WHEN contains({message}, {_sql_string(key + '=')}) THEN nullif(trim(regexp_extract({message}, {pattern}, 1), '\"'), '') END"
+        if key in types:
+            value = f"TRY_CAST({value} AS {types[key]})"
+        expressions.append(f"{value} AS {quote_identifier(key)}")
+    return expressions
+
+
+def _transcode(file_path: Path, encoding: str) -> Path:
+    """UTF-8 copy of a log, since DuckDB's reader only decodes valid UTF-8."""
+    target = file_path.with_name(file_path.name + ".utf8")
+    with file_path.open("r", encoding=encoding, errors="replace", newline="") as source:
+        with target.open("w", encoding="utf-8", newline="") as handle:
+            shutil.copyfileobj(source, handle, UPLOAD_CHUNK_SIZE)
+    return target
+
+
+def _parse(
+    project_dir: Path,
+    file_path: Path,
+    target: str,
+    rejects: str,
+    pattern: str,
+    groups: list[str | None],
+    options: dict[str, Any],
+    replace: bool,
+) -> tuple[int, int]:
+    fields = [name for name in groups if name]
+    expressions = _columns(fields, options)
+    # One regexp_extract per line: the outer group tells whether the line matched at all.
+    names = [_MATCH] + [name or f"__group{index}" for index, name in enumerate(groups, 1)]
+    extract = f"regexp_extract(line, {_sql_string('(' + pattern + ')')}, [{', '.join(_sql_string(name) for name in names)}])"
+    lines = f"SELECT unnest({extract}), line AS {_LINE} FROM {_LINES} WHERE trim(line) <> ''"
+    columns = f"SELECT {', '.join(expressions)}, {_MATCH}, {_LINE} FROM ({lines})"
+    # Lines that do not match, or whose timestamp does not parse, go to the rejects table.
+    invalid_timestamp = f"WHEN {quote_identifier(TIMESTAMP_FIELD)} IS NULL THEN 'invalid timestamp' " if TIMESTAMP_FIELD in fields else ""
+    reason = f"CASE WHEN {_MATCH} = '' THEN 'no match' {invalid_timestamp}END"
+    parsed = (
+        f"SELECT * EXCLUDE ({_MATCH}, {_LINE}), ? AS {quote_identifier(SOURCE_FILE_COLUMN)}, {reason} AS reason, "
+        f"CASE WHEN {reason} IS NOT NULL THEN {_LINE} END AS {_LINE} FROM ({columns})"
+    )
+    params = [options.get("source_name") or file_path.name, str(file_path), _LINE_DELIMITER]
+    rejects_name = quote_identifier(rejects)
+    target_name = quote_identifier(target)
+    with write_connection(project_dir) as conn:
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            # Parsed in one pass into the target; rejected lines are then moved out, which is cheap.
+            drop_view(conn, target)
+            conn.execute(f"CREATE OR REPLACE TABLE {target_name} AS {parsed}", params)
+            create = "CREATE OR REPLACE TABLE" if replace else "CREATE TABLE IF NOT EXISTS"
+            conn.execute(f"{create} {rejects_name} ({quote_identifier(SOURCE_FILE_COLUMN)} VARCHAR, reason VARCHAR, line VARCHAR)")
+            rejected = conn.execute(
+                f"INSERT INTO {rejects_name} SELECT {quote_identifier(SOURCE_FILE_COLUMN)}, reason, {_LINE} FROM {target_name} WHERE reason IS NOT NULL"
+            ).fetchone()[0]
+            if rejected:
+                conn.execute(f"DELETE FROM {target_name} WHERE reason IS NOT NULL")
+            conn.execute(f"ALTER TABLE {target_name} DROP COLUMN reason")
+            conn.execute(f"ALTER TABLE {target_name} DROP COLUMN {_LINE}")
+            if TIMESTAMP_FIELD in fields:
+                # Logs are nearly always written in time order; sort only when some line is out of order.
+                ts = quote_identifier(TIMESTAMP_FIELD)
+                unordered = conn.execute(
+                    f"SELECT count(*) FROM (SELECT {ts}, lag({ts}) OVER (ORDER BY rowid) AS previous FROM {target_name}) WHERE {ts} < previous"
+                ).fetchone()[0]
+                if unordered:
+                    conn.execute(f"CREATE OR REPLACE TABLE {target_name} AS SELECT * FROM {target_name} ORDER BY {ts}")
+            bump_version(conn, target)
+            if replace or rejected:
+                bump_version(conn, rejects)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        rows = conn.execute(f"SELECT count(*) FROM {target_name}").fetchone()[0]
+    return rows, rejected
+
+
+def import_text_log(project_dir: Path, file_path: Path, options: dict[str, Any]) -> ImportResult:
+    """Parse a plain-text controller or SCADA log into a typed dataset (text_logs by default).
+
+    Each line is matched against a named regex or a template such as "{ts} [{level}] {message}";
+    every named group becomes a column, ts is parsed as a timestamp and the rows are stored in
+    time order. key_values lists keys whose key=value pairs in the message become columns too,
+    and types casts fields or keys. Parsing runs in DuckDB, one regexp_extract per line over a
+    parallel line scan. Lines that do not match or whose timestamp does not parse are kept in
+    <dataset>_rejects with the reason; bytes that do not decode are replaced with U+FFFD.
+    """
+    started = time.perf_counter()
+    dataset_name = sanitize_name(options.get("dataset_name") or TEXT_LOG_DATASET)
+    pattern, groups = text_log_parser(options)
+    mode = options.get("mode") or "replace"
+    target = import_target(project_dir, dataset_name, options)
+    rejects = dataset_name + REJECTS_SUFFIX
+    encoding = options.get("encoding") or "utf-8"
+
+    options = {"source_name": file_path.name, **options}
+    replace = mode == "replace"
+    path = file_path
+    try:
+        if encoding.lower() not in DUCKDB_CSV_ENCODINGS:
+            report_progress(0.0, f"Converting from {encoding}")
+            path = _transcode(file_path, encoding)
+        report_progress(0.1, "Parsing lines")
+        try:
+            rows, rejected = _parse(project_dir, path, target, rejects, pattern, groups, options, replace)
+        except duckdb.InvalidInputException as exc:
+            if "unicode" not in str(exc).lower() or path != file_path:
+                raise
+            # Stray bytes in a UTF-8 log: parse a copy with them replaced by U+FFFD.
+            report_progress(0.1, "Replacing invalid UTF-8 and parsing again")
+            path = _transcode(file_path, encoding)
+            rows, rejected = _parse(project_dir, path, target, rejects, pattern, groups, options, replace)
+    finally:
+        if path != file_path:
+            path.unlink(missing_ok=True)
+    timestamp_column = TIMESTAMP_FIELD if TIMESTAMP_FIELD in groups else None
+    merged = finish_import(project_dir, dataset_name, target, {**options, "timestamp_column": timestamp_column})
+
+    register_datasets(project_dir, [dataset_name])
+
+    seconds = time.perf_counter() - started
+    size = file_path.stat().st_size
+    return ImportResult(
+        dataset_name=dataset_name,
+        rows=rows,
+        rejected=rejected,
+        rejects_table=rejects,
+        columns=list(table_columns(project_dir, dataset_name)),
+        pattern=pattern,
+        mode=mode,
+        merged=merged,
+        seconds=round(seconds, 3),
+        mb_per_second=round(size / 1024**2 / seconds, 2) if seconds else 0.0,
+        tables=list_tables(project_dir),
+    )
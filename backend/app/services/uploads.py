@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from app.db.duckdb_store import connect, load_metadata, table_fingerprint, update_metadata
+from app.settings import UPLOAD_CHUNK_SIZE
+from app.utils.file_utils import ensure_path_within, hash_file
+
+
+# One lock per resumable upload, so the offset check and the write happen as one step.
+_upload_locks: dict[str, asyncio.Lock] = {}
+
+
+def _upload_lock(project_dir: Path, upload_id: str) -> asyncio.Lock:
+    return _upload_locks.setdefault(f"{project_dir.resolve()}:{upload_id}", asyncio.Lock())
+
+
+@dataclass
+class StoredUpload:
+    path: Path
+    filename: str
+    sha256: str
+    size: int
+
+
+def uploads_dir(project_dir: Path) -> Path:
+    path = ensure_path_within(project_dir, project_dir / "uploads")
+    path.mkdir(exist_ok=True)
+    return path
+
+
+async def save_upload(project_dir: Path, upload: UploadFile) -> StoredUpload:
+    filename = upload.filename or "upload"
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_name = tempfile.mkstemp(dir=uploads_dir(project_dir), suffix=Path(filename).suffix)
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+                await run_in_threadpool(handle.write, chunk)
+                size += len(chunk)
+    except BaseException:
+        Path(temp_name).unlink(missing_ok=True)
+        raise
+    return StoredUpload(path=Path(temp_name), filename=filename, sha256=digest.hexdigest(), size=size)
+
+
+def _session_paths(project_dir: Path, upload_id: str) -> tuple[Path, Path]:
+    try:
+        uuid.UUID(upload_id)
+    except ValueError as exc:
+        raise ValueError("Invalid upload id") from exc
+    directory = uploads_dir(project_dir)
+    return directory / f"{upload_id}.json", directory / f"{upload_id}.part"
+
+
+def _load_session(project_dir: Path, upload_id: str) -> dict[str, Any]:
+    state_path, _ = _session_paths(project_dir, upload_id)
+    if not state_path.exists():
+        raise FileNotFoundError(f"Upload '{upload_id}' not found")
+    return json.loads(state_path.read_text(encoding="utf-8"))
+
+
+def create_upload_session(project_dir: Path, filename: str, total_size: int | None = None) -> dict[str, Any]:
+    upload_id = str(uuid.uuid4())
+    state_path, part_path = _session_paths(project_dir, upload_id)
+    session = {"upload_id": upload_id, "filename": Path(filename).name, "total_size": total_size, "offset": 0}
+    part_path.touch()
+    state_path.write_text(json.dumps(session, indent=2), encoding="utf-8")
+    return session
+
+
+def get_upload_session(project_dir: Path, upload_id: str) -> dict[str, Any]:
+    session = _load_session(project_dir, upload_id)
+    _, part_path = _session_paths(project_dir, upload_id)
+    # The part file is the source of truth; a crash between write and state update must not lose bytes.
+    session["offset"] = part_path.stat().st_size
+    return session
+
+
+async def append_upload_chunk(
+    project_dir: Path, upload_id: str, offset: int, chunks: AsyncIterator[bytes]
+) -> dict[str, Any]:
+    async with _upload_lock(project_dir, upload_id):
+        session = get_upload_session(project_dir, upload_id)
+        if offset != session["offset"]:
+            raise ValueError(f"Upload offset mismatch: expected {session['offset']}, got {offset}")
+        state_path, part_path = _session_paths(project_dir, upload_id)
+        with part_path.open("ab") as handle:
+            async for chunk in chunks:
+                if chunk:
+                    await run_in_threadpool(handle.write, chunk)
+        session["offset"] = part_path.stat().st_size
+        state_path.write_text(json.dumps(session, indent=2), encoding="utf-8")
+        return session
+
+
+def complete_upload(project_dir: Path, upload_id: str, expected_sha256: str | None = None) -> StoredUpload:
+    session = get_upload_session(project_dir, upload_id)
+    if session.get("total_size") is not None and session["offset"] != session["total_size"]:
+        raise ValueError(f"Upload incomplete: {session['offset']} of {session['total_size']} bytes received")
+    state_path, part_path = _session_paths(project_dir, upload_id)
+    sha256 = hash_file(part_path)
+    if expected_sha256 and expected_sha256.lower() != sha256:
+        raise ValueError("Upload checksum mismatch")
+    # Keep the original extension so readers that dispatch on suffix (e.g. Excel) still work.
+    path = part_path.with_name(f"{upload_id}{Path(session['filename']).suffix}")
+    part_path.replace(path)
+    state_path.unlink(missing_ok=True)
+    return StoredUpload(path=path, filename=session["filename"], sha256=sha256, size=path.stat().st_size)
+
+
+async def finish_upload(project_dir: Path, upload_id: str, expected_sha256: str | None = None) -> StoredUpload:
+    """complete_upload off the event loop (hashing a large file takes seconds), after pending chunk writes."""
+    async with _upload_lock(project_dir, upload_id):
+        upload = await run_in_threadpool(complete_upload, project_dir, upload_id, expected_sha256)
+    _upload_locks.pop(f"{project_dir.resolve()}:{upload_id}", None)
+    return upload
+
+
+def _import_options(options: dict[str, Any] | None) -> dict[str, Any]:
+    # Round-trip through JSON so options compare equal to the copy stored in metadata.
+    return json.loads(json.dumps(options or {}, sort_keys=True, default=str))
+
+
+def find_previous_import(
+    project_dir: Path, sha256: str, dataset_name: str, options: dict[str, Any] | None = None
+) -> dict[str, Any] | None:
+    """The earlier import of this file if the dataset still holds exactly what it wrote, with the same options."""
+    previous = load_metadata(project_dir).get("imports", {}).get(sha256)
+    target = (previous or {}).get("targets", {}).get(dataset_name)
+    if not target or target["options"] != _import_options(options):
+        return None
+    with connect(project_dir) as conn:
+        if target["fingerprint"] is None or table_fingerprint(conn, dataset_name) != target["fingerprint"]:
+            return None
+    return previous
+
+
+def record_import(
+    project_dir: Path, upload: StoredUpload, dataset_names: list[str], options: dict[str, Any] | None = None
+) -> None:
+    record_imports(project_dir, [upload], dataset_names, options)
+
+
+def record_imports(
+    project_dir: Path, uploads: list[StoredUpload], dataset_names: list[str], options: dict[str, Any] | None = None
+) -> None:
+    with connect(project_dir) as conn:
+        fingerprints = {name: table_fingerprint(conn, name) for name in dataset_names}
+    targets = {name: {"fingerprint": fingerprint, "options": _import_options(options)} for name, fingerprint in fingerprints.items()}
+    with update_metadata(project_dir) as metadata:
+        imports = metadata.setdefault("imports", {})
+        for upload in uploads:
+            entry = imports.get(upload.sha256, {"filename": upload.filename, "size": upload.size, "datasets": []})
+            entry["datasets"] = sorted(set(entry["datasets"]) | set(dataset_names))
+            entry.setdefault("targets", {}).update(targets)
+            imports[upload.sha256] = entry
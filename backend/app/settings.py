@@ -1,9 +1,50 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parents[2]
 DATA_DIR = BASE_DIR / "data"
 PROJECTS_DIR = DATA_DIR / "projects"
 
+# Upper bound for DuckDB's buffer manager; larger imports spill to disk next to the project database.
+DUCKDB_MEMORY_LIMIT = os.environ.get("DATAANALYZER_DUCKDB_MEMORY_LIMIT", "2GB")
+DUCKDB_THREADS = int(os.environ.get("DATAANALYZER_DUCKDB_THREADS", os.cpu_count() or 1))
+# Project databases stay open between requests and are closed after this many idle seconds.
+DUCKDB_IDLE_TTL_SECONDS = float(os.environ.get("DATAANALYZER_DUCKDB_IDLE_TTL_SECONDS", 300))
+
+# Uploads are copied to disk in fixed-size chunks so request bodies never sit in memory whole.
+UPLOAD_CHUNK_SIZE = int(os.environ.get("DATAANALYZER_UPLOAD_CHUNK_SIZE", 1024 * 1024))
+
+# Server-local directories bulk imports may read from, separated by os.pathsep.
+IMPORT_ROOTS = [
+    Path(root) for root in os.environ.get("DATAANALYZER_IMPORT_ROOTS", str(DATA_DIR / "imports")).split(os.pathsep) if root
+]
+# Threads used to hash files before a bulk import.
+IMPORT_HASH_WORKERS = int(os.environ.get("DATAANALYZER_IMPORT_HASH_WORKERS", min(8, (os.cpu_count() or 1) * 2)))
+
+# Bytes read from one followed log file per poll, so a large backlog is ingested in steps.
+WATCH_READ_BYTES = int(os.environ.get("DATAANALYZER_WATCH_READ_BYTES", 64 * 1024**2))
+
+# Worker processes used to parse workbook sheets in parallel.
+EXCEL_MAX_WORKERS = int(os.environ.get("DATAANALYZER_EXCEL_MAX_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Background jobs: worker threads, concurrent jobs per project and finished jobs kept for status queries.
+JOB_THREAD_WORKERS = int(os.environ.get("DATAANALYZER_JOB_THREAD_WORKERS", 8))
+JOB_PROJECT_CONCURRENCY = int(os.environ.get("DATAANALYZER_JOB_PROJECT_CONCURRENCY", 2))
+JOB_HISTORY_LIMIT = int(os.environ.get("DATAANALYZER_JOB_HISTORY_LIMIT", 500))
+
+# Recipe pipelines: steps run concurrently once their upstream steps are done.
+PIPELINE_MAX_WORKERS = int(os.environ.get("DATAANALYZER_PIPELINE_MAX_WORKERS", 4))
+
+# Recipe result cache per project: total snapshot size, entry count and maximum entry age.
+RECIPE_CACHE_MAX_BYTES = int(os.environ.get("DATAANALYZER_RECIPE_CACHE_MAX_BYTES", 1024**3))
+RECIPE_CACHE_MAX_ENTRIES = int(os.environ.get("DATAANALYZER_RECIPE_CACHE_MAX_ENTRIES", 200))
+RECIPE_CACHE_MAX_AGE_SECONDS = int(os.environ.get("DATAANALYZER_RECIPE_CACHE_MAX_AGE_SECONDS", 7 * 24 * 3600))
+
+# Recipe run history per project: runs and age kept, and appends between compactions that apply both limits.
+RECIPE_HISTORY_MAX_RUNS = int(os.environ.get("DATAANALYZER_RECIPE_HISTORY_MAX_RUNS", 10_000))
+RECIPE_HISTORY_MAX_AGE_SECONDS = int(os.environ.get("DATAANALYZER_RECIPE_HISTORY_MAX_AGE_SECONDS", 90 * 24 * 3600))
+RECIPE_HISTORY_COMPACT_EVERY = int(os.environ.get("DATAANALYZER_RECIPE_HISTORY_COMPACT_EVERY", 500))
+
 PROJECTS_DIR.mkdir(parents=True, exist_ok=True)
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import hashlib
 import re
 from pathlib import Path
 
 SAFE_NAME_PATTERN = re.compile(r"[^a-zA-Z0-9._-]+")
+HASH_CHUNK_SIZE = 1024 * 1024
 
 
 def sanitize_name(value: str) -> str:
@@ -17,3 +19,11 @@ def ensure_path_within(base: Path, target: Path) -> Path:
     if resolved_base not in resolved_target.parents and resolved_target != resolved_base:
         raise ValueError("Invalid path outside project scope")
     return resolved_target
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        while chunk := handle.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
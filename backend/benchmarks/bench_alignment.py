@@ -0,0 +1,71 @@
+"""Compare DuckDB ASOF alignment against a chained pandas.merge_asof.
+
+Run from backend/: python -m benchmarks.bench_alignment --sources 10 --rows 200000
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.db.duckdb_store import connect, create_project, save_dataframe
+from app.services.alignment import align_series
+
+
+def generate(sources: int, rows: int) -> dict[str, pd.DataFrame]:
+    rng = np.random.default_rng(0)
+    start = pd.Timestamp("2024-01-01")
+    frames = {}
+    for index in range(sources):
+        offsets = np.sort(rng.uniform(0, rows, rows))
+        ts = (start + pd.to_timedelta(offsets, unit="s")).astype("datetime64[us]")
+        frames[f"s{index}"] = pd.DataFrame({"ts": ts, "value": rng.normal(size=rows)})
+    return frames
+
+
+def pandas_chain(frames: dict[str, pd.DataFrame], tolerance: str) -> pd.DataFrame:
+    names = list(frames)
+    aligned = frames[names[0]].rename(columns={"value": f"value_{names[0]}"})
+    for name in names[1:]:
+        right = frames[name].rename(columns={"value": f"value_{name}"})
+        aligned = pd.merge_asof(aligned, right, on="ts", direction="nearest", tolerance=pd.Timedelta(tolerance))
+    return aligned
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sources", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--tolerance", default="2 seconds")
+    args = parser.parse_args()
+
+    frames = generate(args.sources, args.rows)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        project_dir = Path(temp_dir) / "bench"
+        create_project(project_dir, "bench", None)
+        for name, frame in frames.items():
+            save_dataframe(project_dir, name, frame)
+
+        # The pandas path loads every table into memory first, like the old recipe did.
+        started = time.perf_counter()
+        with connect(project_dir) as conn:
+            loaded = {name: conn.execute(f"SELECT * FROM {name} ORDER BY ts").fetchdf() for name in frames}
+        expected = pandas_chain(loaded, args.tolerance)
+        pandas_seconds = time.perf_counter() - started
+
+        sources = [{"table": name, "tolerance": args.tolerance} for name in frames]
+        started = time.perf_counter()
+        rows = align_series(project_dir, sources, target="aligned", direction="nearest")
+        duckdb_seconds = time.perf_counter() - started
+
+    print(f"sources={args.sources} rows/source={args.rows} aligned_rows={rows} (pandas {len(expected)})")
+    print(f"pandas merge_asof chain: {pandas_seconds:.3f}s")
+    print(f"duckdb ASOF align_series: {duckdb_seconds:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
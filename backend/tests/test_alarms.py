@@ -0,0 +1,109 @@
+from pathlib import Path
+
+import pandas as pd
+
+from app.db.duckdb_store import append_query, connect, create_project, save_dataframe
+from app.services.alarms import active_alarms, chattering_alarms, top_alarms, update_alarm_episodes
+from app.services.recipes import run_recipe
+
+RECIPES_DIR = Path(__file__).resolve().parents[1] / "app" / "recipes"
+
+
+def _logs(rows: list[tuple[str, str, str]]) -> pd.DataFrame:
+    frame = pd.DataFrame(rows, columns=["ts", "level", "message"])
+    frame["ts"] = pd.to_datetime(frame["ts"])
+    return frame
+
+
+def _episodes(project_dir: Path) -> list[tuple]:
+    with connect(project_dir) as conn:
+        return conn.execute("SELECT tag, start_ts, end_ts, duration_s FROM alarm_episodes ORDER BY start_ts").fetchall()
+
+
+def test_episodes_pair_raise_and_clear_incrementally(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    save_dataframe(project_dir, "text_logs", _logs([
+        ("2024-01-01 00:00:00", "ALARM", "Pump P1 tripped"),
+        ("2024-01-01 00:00:05", "ALARM", "Pump P1 tripped"),
+        ("2024-01-01 00:00:10", "INFO", "Pump P1 tripped cleared"),
+        ("2024-01-01 00:00:20", "WARN", "High level LT1"),
+        ("2024-01-01 00:00:30", "INFO", "Operator login"),
+    ]))
+
+    first = update_alarm_episodes(project_dir)
+
+    assert first["episodes"] == 2
+    assert _episodes(project_dir)[1][2] is None
+
+    save_dataframe(project_dir, "new_logs", _logs([
+        ("2024-01-01 00:01:00", "OK", "High level LT1 normal"),
+        ("2024-01-01 00:01:10", "ALARM", "Pump P1 tripped"),
+    ]))
+    append_query(project_dir, "text_logs", "SELECT * FROM new_logs")
+    second = update_alarm_episodes(project_dir)
+
+    assert second == {"target": "alarm_episodes", "new_episodes": 1, "episodes": 3, "rebuilt": False}
+    episodes = _episodes(project_dir)
+    assert [(tag, duration) for tag, _, _, duration in episodes] == [
+        ("Pump P1 tripped", 10.0),
+        ("High level LT1", 40.0),
+        ("Pump P1 tripped", None),
+    ]
+    update_alarm_episodes(project_dir, rebuild=True)
+    assert _episodes(project_dir) == episodes
+
+
+def test_alarm_messages_mentioning_clear_words_still_raise(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    save_dataframe(project_dir, "text_logs", _logs([
+        ("2024-01-01 00:00:00", "ALARM", "Temperature above normal"),
+        ("2024-01-01 00:00:05", "ALARM", "Reset valve failed"),
+        ("2024-01-01 00:00:20", "INFO", "Temperature above normal cleared"),
+        ("2024-01-01 00:00:30", "INFO", "Counter reset by operator"),
+    ]))
+
+    update_alarm_episodes(project_dir)
+
+    assert [(tag, duration) for tag, _, _, duration in _episodes(project_dir)] == [
+        ("Temperature above", 20.0),
+        ("valve failed", None),
+    ]
+
+
+def test_interval_top_and_chattering_queries(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    rows = []
+    for minute in range(5):
+        rows.append((f"2024-01-01 00:{minute:02d}:00", "ALARM", "Valve V2 open"))
+        rows.append((f"2024-01-01 00:{minute:02d}:10", "CLEAR", "Valve V2 open"))
+    rows.append(("2024-01-01 00:00:30", "ALARM", "Temp TT1 high"))
+    rows.append(("2024-01-01 00:03:00", "CLEAR", "Temp TT1 high"))
+    save_dataframe(project_dir, "text_logs", _logs(rows))
+    update_alarm_episodes(project_dir)
+
+    active = active_alarms(project_dir, "2024-01-01 00:02:20", "2024-01-01 00:02:40")
+    assert [row["tag"] for row in active] == ["Temp TT1 high"]
+    assert len(active_alarms(project_dir, "2024-01-01 00:02:05", "2024-01-01 00:02:06")) == 2
+
+    top = top_alarms(project_dir, limit=1)
+    assert top[0]["tag"] == "Valve V2 open" and top[0]["episodes"] == 5
+
+    chattering = chattering_alarms(project_dir, window="3 minutes", min_count=3)
+    assert [(row["tag"], row["max_in_window"]) for row in chattering] == [("Valve V2 open", 4)]
+
+
+def test_alarm_recipe_builds_episodes(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    save_dataframe(project_dir, "text_logs", _logs([
+        ("2024-01-01 00:00:00", "ALARM", "Pump P1 tripped"),
+        ("2024-01-01 00:00:10", "INFO", "Pump P1 tripped cleared"),
+    ]))
+
+    result = run_recipe(project_dir, RECIPES_DIR / "alarm_event_timeline.py", {})
+
+    assert result.outputs == ["alarm_timeline", "alarm_episodes"]
+    assert _episodes(project_dir)[0][3] == 10.0
@@ -0,0 +1,70 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.db.duckdb_store import connect, create_project, save_dataframe
+from app.services.alignment import align_series
+from app.services.recipes import run_recipe
+
+RECIPES_DIR = Path(__file__).resolve().parents[1] / "app" / "recipes"
+
+
+def _series(seed: int, periods: int, freq: str) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    ts = pd.Timestamp("2024-01-01") + pd.to_timedelta(np.sort(rng.uniform(0, periods, periods)), unit="s")
+    return pd.DataFrame({"ts": ts.astype("datetime64[us]"), "value": rng.normal(size=periods)})
+
+
+@pytest.mark.parametrize("direction", ["backward", "forward", "nearest"])
+def test_alignment_matches_merge_asof_chain(tmp_path: Path, direction: str) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    frames = {f"s{index}": _series(index, 200, "s") for index in range(3)}
+    for name, frame in frames.items():
+        save_dataframe(project_dir, name, frame)
+
+    aligned = align_series(
+        project_dir,
+        [{"table": name, "tolerance": "2 seconds"} for name in frames],
+        direction=direction,
+    )
+
+    expected = frames["s0"].rename(columns={"value": "value_s0"})
+    for name in ("s1", "s2"):
+        expected = pd.merge_asof(
+            expected,
+            frames[name].rename(columns={"value": f"value_{name}"}),
+            on="ts",
+            direction=direction,
+            tolerance=pd.Timedelta("2s"),
+        )
+    pd.testing.assert_frame_equal(aligned, expected, check_dtype=False)
+
+
+def test_alignment_resamples_onto_grid(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    save_dataframe(project_dir, "a", pd.DataFrame({"ts": pd.to_datetime(["2024-01-01 00:00:00", "2024-01-01 00:00:05"]), "value": [1.0, 2.0]}))
+    save_dataframe(project_dir, "b", pd.DataFrame({"ts": pd.to_datetime(["2024-01-01 00:00:03"]), "level": [7]}))
+
+    aligned = align_series(project_dir, ["a", "b"], direction="backward", grid="2 seconds")
+
+    assert list(aligned.columns) == ["ts", "value_a", "level_b"]
+    assert aligned["value_a"].tolist() == [1.0, 1.0, 1.0]
+    assert aligned["level_b"].fillna(-1).tolist() == [-1, -1, 7]
+
+
+def test_db_join_time_sync_recipe(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    save_dataframe(project_dir, "sql_series", pd.DataFrame({"ts": pd.to_datetime(["2024-01-01 00:00:00", "2024-01-01 00:00:10"]), "value": [1, 2]}))
+    save_dataframe(project_dir, "csv_series", pd.DataFrame({"ts": pd.to_datetime(["2024-01-01 00:00:00.400"]), "value": [5]}))
+
+    result = run_recipe(project_dir, RECIPES_DIR / "db_join_time_sync.py", {})
+
+    assert result.outputs == ["joined_time_sync"]
+    with connect(project_dir) as conn:
+        rows = conn.execute("SELECT value_sql, value_csv FROM joined_time_sync ORDER BY ts").fetchall()
+    assert rows == [(1, 5), (2, None)]
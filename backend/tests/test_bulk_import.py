@@ -0,0 +1,73 @@
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from app.db.duckdb_store import connect, create_project
+from app.services import bulk_import
+from app.services.bulk_import import directory_files, extract_zip, import_csv_files
+
+DAY1 = "ts,tag,value\n2024-01-01 00:00:00,P1,1\n2024-01-01 00:01:00,P1,2\n"
+DAY2 = "ts,tag,value,state\n2024-01-02 00:00:00,P1,3.5,RUN\n"
+
+
+def _archive(tmp_path: Path) -> Path:
+    archive = tmp_path / "logs.zip"
+    with zipfile.ZipFile(archive, "w") as zipped:
+        zipped.writestr("logs/day1.csv", DAY1)
+        zipped.writestr("logs/day2.csv", DAY2)
+        zipped.writestr("logs/copy_of_day1.csv", DAY1)
+        zipped.writestr("logs/broken.csv", b"ts,tag,value\n2024-01-03 00:00:00,P1,\xff\xfe\n")
+        zipped.writestr("readme.txt", "not a log")
+    return archive
+
+
+def test_zip_import_unions_schemas_and_reports_bad_files(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    root = tmp_path / "extracted"
+    files = extract_zip(_archive(tmp_path), root, "*.csv")
+    assert [name for name, _ in files] == ["logs/broken.csv", "logs/copy_of_day1.csv", "logs/day1.csv", "logs/day2.csv"]
+
+    result = import_csv_files(project_dir, root, files, {"dataset_name": "plc", "timestamp_column": "ts"})
+
+    statuses = {item["file"]: item["status"] for item in result["files"]}
+    assert statuses == {
+        "logs/broken.csv": "error",
+        "logs/copy_of_day1.csv": "imported",
+        "logs/day1.csv": "skipped",
+        "logs/day2.csv": "imported",
+    }
+    assert (result["imported"], result["skipped"], result["errors"], result["rows"]) == (2, 1, 1, 3)
+    with connect(project_dir) as conn:
+        rows = conn.execute("SELECT source_file, value, state FROM plc ORDER BY ts").fetchall()
+    assert rows == [("logs/copy_of_day1.csv", 1.0, None), ("logs/copy_of_day1.csv", 2.0, None), ("logs/day2.csv", 3.5, "RUN")]
+
+    again = import_csv_files(project_dir, root, files, {"dataset_name": "plc", "timestamp_column": "ts"})
+    assert (again["imported"], again["skipped"], again["errors"]) == (0, 3, 1)
+
+
+def test_directory_import_is_limited_to_import_roots(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    logs = tmp_path / "imports" / "line1"
+    (logs / "2024").mkdir(parents=True)
+    (logs / "2024" / "day1.csv").write_text(DAY1, encoding="utf-8")
+    (logs / "day2.csv").write_text(DAY2, encoding="utf-8")
+
+    with pytest.raises(ValueError, match="outside the allowed import roots"):
+        directory_files(logs, "*.csv")
+    monkeypatch.setattr(bulk_import, "IMPORT_ROOTS", [tmp_path / "imports"])
+    assert [name for name, _ in directory_files(logs, "*.csv")] == ["day2.csv"]
+    (tmp_path / "secret.csv").write_text(DAY1, encoding="utf-8")
+    (logs / "link.csv").symlink_to(tmp_path / "secret.csv")
+    for pattern in ("../../*.csv", str(tmp_path / "*.csv")):
+        with pytest.raises(ValueError, match="Invalid file pattern"):
+            directory_files(logs, pattern)
+    assert "link.csv" not in [name for name, _ in directory_files(logs, "*.csv")]
+
+    files = directory_files(logs, "**/*.csv")
+    result = import_csv_files(project_dir, logs, files, {"dataset_name": "plc", "mode": "append", "key": ["tag", "ts"]})
+    assert result["rows"] == 3 and result["errors"] == 0
+    with connect(project_dir) as conn:
+        assert conn.execute("SELECT DISTINCT source_file FROM plc ORDER BY 1").fetchall() == [("2024/day1.csv",), ("day2.csv",)]
@@ -0,0 +1,49 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+from app.db import catalog
+from app.db.duckdb_store import create_project, load_metadata, register_datasets, update_metadata
+
+
+def test_concurrent_metadata_updates_keep_every_change(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+
+    def register(worker: int) -> None:
+        for item in range(25):
+            register_datasets(project_dir, [f"d{worker}_{item}"])
+            with update_metadata(project_dir) as metadata:
+                metadata.setdefault("keys", {})[f"d{worker}_{item}"] = ["ts"]
+
+    threads = [threading.Thread(target=register, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    metadata = load_metadata(project_dir)
+    assert len(metadata["datasets"]) == len(metadata["keys"]) == 200
+    assert sorted(path.name for path in project_dir.iterdir() if path.suffix in {".json", ".tmp"}) == ["metadata.json"]
+
+    # Loaded copies are private, and a hand edit of the file is picked up on the next read.
+    load_metadata(project_dir)["datasets"].clear()
+    path = project_dir / "metadata.json"
+    edited = {**json.loads(path.read_text(encoding="utf-8")), "description": "edited"}
+    path.write_text(json.dumps(edited), encoding="utf-8")
+    os.utime(path, ns=(0, 1))
+    metadata = load_metadata(project_dir)
+    assert metadata["description"] == "edited" and len(metadata["datasets"]) == 200
+
+
+def test_project_index_lookup(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(catalog, "PROJECT_INDEX", tmp_path / "index.json")
+    assert catalog.project_entry("missing") is None
+
+    catalog.register_project("a", "Line A", tmp_path / "a")
+    catalog.register_project("b", "Line B", tmp_path / "b")
+
+    assert catalog.project_entry("b") == {"name": "Line B", "path": str(tmp_path / "b")}
+    assert sorted(catalog.list_projects()) == ["a", "b"]
+    assert json.loads((tmp_path / "index.json").read_text(encoding="utf-8"))["a"]["name"] == "Line A"
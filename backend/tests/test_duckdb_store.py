@@ -0,0 +1,77 @@
+import shutil
+import threading
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+
+from app.db import duckdb_store
+from app.db.duckdb_store import checkpointed, close_project, connect, create_project, save_dataframe
+
+
+def test_connections_share_one_database_handle(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+
+    with connect(project_dir) as first, connect(project_dir) as second:
+        assert first._project is second._project
+        assert close_project(project_dir) is False
+    assert close_project(project_dir) is True
+
+    with connect(project_dir) as conn:
+        assert conn.execute("SELECT 42").fetchone() == (42,)
+
+
+def test_idle_projects_are_closed_after_ttl(tmp_path: Path, monkeypatch) -> None:
+    first_dir = tmp_path / "first"
+    second_dir = tmp_path / "second"
+    create_project(first_dir, "First", None)
+    create_project(second_dir, "Second", None)
+    first_db = (first_dir / "project.duckdb").resolve()
+    assert first_db in duckdb_store._databases
+
+    monkeypatch.setattr(duckdb_store, "DUCKDB_IDLE_TTL_SECONDS", -1)
+    connect(second_dir).close()
+
+    assert first_db not in duckdb_store._databases
+
+
+def test_concurrent_writers_are_serialized(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    save_dataframe(project_dir, "signals", pd.DataFrame({"value": [0]}))
+    errors: list[Exception] = []
+
+    def write(index: int) -> None:
+        try:
+            for _ in range(5):
+                save_dataframe(project_dir, "signals", pd.DataFrame({"value": [index]}))
+        except Exception as exc:  # pragma: no cover - surfaced by the assertion below
+            errors.append(exc)
+
+    threads = [threading.Thread(target=write, args=(index,)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with connect(project_dir) as conn:
+        assert conn.execute("SELECT count(*) FROM signals").fetchone() == (1,)
+
+
+def test_checkpointed_file_can_be_copied_while_writers_wait(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    save_dataframe(project_dir, "signal", pd.DataFrame({"value": range(1000)}))
+    copy = tmp_path / "copy.duckdb"
+    with connect(project_dir):
+        with checkpointed(project_dir):
+            writer = threading.Thread(target=save_dataframe, args=(project_dir, "other", pd.DataFrame({"value": [1]})))
+            writer.start()
+            writer.join(timeout=0.2)
+            assert writer.is_alive()
+            shutil.copy(project_dir / "project.duckdb", copy)
+        writer.join()
+
+    assert duckdb.connect(str(copy), read_only=True).execute("SELECT count(*) FROM signal").fetchone() == (1000,)
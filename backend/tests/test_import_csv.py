@@ -2,7 +2,7 @@ from pathlib import Path
 
 import pandas as pd
 
-from app.db.duckdb_store import create_project, list_tables
+from app.db.duckdb_store import connect, create_project, list_tables
 from app.services.importer import import_csv
 
 
@@ -18,3 +18,45 @@ def test_import_csv_with_timestamp(tmp_path: Path) -> None:
 
     assert result["dataset_name"] == "sensor_data"
     assert "sensor_data" in list_tables(project_dir)
+
+
+def test_import_csv_duckdb_engine_honors_options(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+
+    sample = "ts;value\n2024-01-01 00:00:00;1,5\n2024-01-01 00:00:01;2,5\n"
+    file_path = project_dir / "sample.csv"
+    file_path.write_text(sample, encoding="utf-8")
+
+    result = import_csv(
+        project_dir,
+        file_path,
+        {
+            "dataset_name": "plc_log",
+            "delimiter": ";",
+            "decimal": ",",
+            "timestamp_column": "ts",
+            "timezone": "Europe/Stockholm",
+        },
+    )
+
+    assert result["engine"] == "duckdb"
+    assert result["rows"] == 2
+    with connect(project_dir) as conn:
+        column_types = dict(conn.execute("SELECT column_name, data_type FROM information_schema.columns WHERE table_name = 'plc_log'").fetchall())
+        total = conn.execute("SELECT sum(value) FROM plc_log").fetchone()[0]
+    assert column_types["ts"] == "TIMESTAMP WITH TIME ZONE"
+    assert total == 4.0
+
+
+def test_import_csv_falls_back_to_pandas_for_other_encodings(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+
+    file_path = project_dir / "latin1.csv"
+    file_path.write_bytes("tag,value\nTemperatur \xe5\xe4\xf6,1\n".encode("latin-1"))
+
+    result = import_csv(project_dir, file_path, {"dataset_name": "latin", "encoding": "latin-1"})
+
+    assert result["engine"] == "pandas"
+    assert result["columns"] == ["tag", "value"]
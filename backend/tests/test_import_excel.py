@@ -2,8 +2,8 @@ from pathlib import Path
 
 import pandas as pd
 
-from app.db.duckdb_store import create_project, list_tables
-from app.services.importer import import_excel
+from app.db.duckdb_store import connect, create_project, list_tables, save_dataframe
+from app.services.importer import import_excel, import_excel_workbook
 
 
 def test_import_excel_with_sheet_and_header(tmp_path: Path) -> None:
@@ -19,3 +19,53 @@ def test_import_excel_with_sheet_and_header(tmp_path: Path) -> None:
 
     assert result["dataset_name"] == "excel_data"
     assert "excel_data" in list_tables(project_dir)
+
+
+def test_import_excel_workbook_imports_sheets_in_parallel_and_skips_unchanged(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+
+    file_path = project_dir / "historian.xlsx"
+    with pd.ExcelWriter(file_path) as writer:
+        pd.DataFrame({"ts": ["2024-01-01"], "value": [1]}).to_excel(writer, sheet_name="Line 1", index=False)
+        pd.DataFrame({"ts": ["2024-01-01", "2024-01-02"], "value": [1, 2]}).to_excel(writer, sheet_name="Line 2", index=False)
+        pd.DataFrame({"note": ["x"]}).to_excel(writer, sheet_name="Notes", index=False)
+
+    result = import_excel_workbook(project_dir, file_path, {"dataset_name": "historian", "sheet_names": ["Line 1", "Line 2"]})
+
+    assert [sheet["table"] for sheet in result["sheets"]] == ["historian_Line_1", "historian_Line_2"]
+    assert [sheet["rows"] for sheet in result["sheets"]] == [1, 2]
+    assert all("parse_seconds" in sheet for sheet in result["sheets"])
+    assert "historian_Notes" not in list_tables(project_dir)
+
+    again = import_excel_workbook(project_dir, file_path, {"dataset_name": "historian", "all_sheets": True})
+
+    assert [sheet["status"] for sheet in again["sheets"]] == ["skipped", "skipped", "imported"]
+    assert "historian_Notes" in list_tables(project_dir)
+
+    # Other parse options must re-read the sheet instead of keeping the old table.
+    parsed = import_excel_workbook(
+        project_dir, file_path, {"dataset_name": "historian", "sheet_names": ["Line 1", "Line 2"], "timestamp_column": "ts"}
+    )
+
+    assert [sheet["status"] for sheet in parsed["sheets"]] == ["imported", "imported"]
+    with connect(project_dir) as conn:
+        assert conn.execute("SELECT typeof(ts) FROM historian_Line_2 LIMIT 1").fetchone()[0].startswith("TIMESTAMP")
+
+
+def test_import_excel_workbook_reimports_a_sheet_whose_table_was_rewritten(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+
+    file_path = project_dir / "historian.xlsx"
+    with pd.ExcelWriter(file_path) as writer:
+        pd.DataFrame({"ts": ["2024-01-01"], "value": [1]}).to_excel(writer, sheet_name="Line 1", index=False)
+
+    import_excel_workbook(project_dir, file_path, {"dataset_name": "historian", "all_sheets": True})
+    save_dataframe(project_dir, "historian_Line_1", pd.DataFrame({"value": [7, 8, 9]}))
+
+    again = import_excel_workbook(project_dir, file_path, {"dataset_name": "historian", "all_sheets": True})
+
+    assert [sheet["status"] for sheet in again["sheets"]] == ["imported"]
+    with connect(project_dir) as conn:
+        assert conn.execute("SELECT count(*) FROM historian_Line_1").fetchone()[0] == 1
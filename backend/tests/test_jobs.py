@@ -0,0 +1,59 @@
+import threading
+import time
+
+from app.services.jobs import CANCELLED, FAILED, SUCCEEDED, JobManager, report_progress
+
+
+def _wait(manager: JobManager, job_id: str, timeout: float = 5.0) -> str:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = manager.get(job_id).status
+        if status in {SUCCEEDED, FAILED, CANCELLED}:
+            return status
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+def test_job_reports_result_and_errors() -> None:
+    manager = JobManager(thread_workers=2)
+
+    def work() -> int:
+        report_progress(0.5, "halfway")
+        return 42
+
+    def broken() -> None:
+        raise ValueError("bad input")
+
+    ok = manager.submit("test", "p1", work)
+    failed = manager.submit("test", "p1", broken)
+
+    assert _wait(manager, ok.job_id) == SUCCEEDED
+    assert manager.get(ok.job_id).result == 42
+    assert _wait(manager, failed.job_id) == FAILED
+    assert "bad input" in manager.get(failed.job_id).error
+    manager.shutdown()
+
+
+def test_project_limit_queues_jobs_and_cancel_stops_them() -> None:
+    manager = JobManager(thread_workers=4, project_concurrency=1)
+    release = threading.Event()
+
+    def blocking() -> None:
+        while not release.is_set():
+            report_progress(0.1)
+            time.sleep(0.01)
+
+    running = manager.submit("test", "p1", blocking)
+    queued = manager.submit("test", "p1", blocking)
+    other_project = manager.submit("test", "p2", lambda: "done")
+
+    assert _wait(manager, other_project.job_id) == SUCCEEDED
+    assert manager.get(queued.job_id).status == "queued"
+
+    manager.cancel(queued.job_id)
+    manager.cancel(running.job_id)
+
+    assert _wait(manager, queued.job_id) == CANCELLED
+    assert _wait(manager, running.job_id) == CANCELLED
+    release.set()
+    manager.shutdown()
@@ -0,0 +1,114 @@
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+import pytest
+
+from app.db.duckdb_store import connect, create_project, list_tables, load_metadata, save_dataframe
+from app.services import query_runner
+from app.services.query_runner import build_window_query, extract_partitioned, split_time_range
+
+
+class FlakyClient:
+    def __init__(self, fail_on: str | None = None) -> None:
+        self.conn = duckdb.connect()
+        source = pd.DataFrame({"ts": pd.date_range("2024-01-01", periods=96, freq="h"), "value": range(96)})
+        self.conn.execute("CREATE TABLE signals AS SELECT * FROM source")
+        self.fail_on = pd.Timestamp(fail_on) if fail_on else None
+        self.queries: list[tuple[str, list]] = []
+
+    def fetch_dataframe(self, query: str) -> pd.DataFrame:
+        return self.conn.cursor().execute(query).fetchdf()
+
+    def iter_batches(self, query: str, batch_size: int, params=None):
+        self.queries.append((query, list(params or [])))
+        if self.fail_on is not None and params and params[0] == self.fail_on:
+            raise ConnectionError("socket closed")
+        frame = self.conn.cursor().execute(query, params or []).fetchdf()
+        # Like pandas.read_sql, an empty result carries no column types.
+        yield frame.astype(object) if frame.empty else frame
+
+
+def test_split_time_range_covers_range() -> None:
+    windows = split_time_range("2024-01-01", "2024-01-05", 4)
+    assert windows[0][0] == pd.Timestamp("2024-01-01")
+    assert windows[-1][1] == pd.Timestamp("2024-01-05")
+    assert all(left[1] == right[0] for left, right in zip(windows, windows[1:]))
+
+
+def test_partitioned_extract_resumes_after_failed_window(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    args = ("SELECT * FROM signals", "ts", "2024-01-01", "2024-01-05")
+
+    with pytest.raises(ConnectionError):
+        extract_partitioned(FlakyClient(fail_on="2024-01-03"), project_dir, "sql_series", *args, partitions=4, max_workers=1)
+    assert load_metadata(project_dir)["extractions"]["sql_series"]["completed"] == 2
+
+    client = FlakyClient()
+    result = extract_partitioned(client, project_dir, "sql_series", *args, partitions=4, max_workers=2)
+
+    assert result.resumed_from == 2
+    assert len(client.queries) == 2
+    assert "sql_series" not in load_metadata(project_dir)["extractions"]
+    assert list_tables(project_dir) == ["sql_series"]
+    with connect(project_dir) as conn:
+        assert conn.execute("SELECT count(*), count(DISTINCT ts), sum(value) FROM sql_series").fetchone() == (96, 96, sum(range(96)))
+
+
+def test_resume_after_crash_before_checkpoint_does_not_duplicate_a_window(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    # The first window is empty, so the table starts out with untyped columns.
+    args = ("SELECT * FROM signals", "ts", "2023-12-31", "2024-01-05")
+    saved = query_runner.update_metadata
+    calls = []
+
+    def crash_on_third_checkpoint(project_dir: Path):
+        # The first call clears any earlier checkpoint; then one per loaded window.
+        calls.append(project_dir)
+        if len(calls) == 4:
+            raise RuntimeError("process killed")
+        return saved(project_dir)
+
+    monkeypatch.setattr(query_runner, "update_metadata", crash_on_third_checkpoint)
+    with pytest.raises(RuntimeError):
+        extract_partitioned(FlakyClient(), project_dir, "sql_series", *args, partitions=5, max_workers=1)
+    monkeypatch.undo()
+    assert load_metadata(project_dir)["extractions"]["sql_series"]["completed"] == 2
+
+    result = extract_partitioned(FlakyClient(), project_dir, "sql_series", *args, partitions=5, max_workers=2)
+
+    assert result.resumed_from == 2
+    with connect(project_dir) as conn:
+        assert conn.execute("SELECT count(*), count(DISTINCT ts), sum(value) FROM sql_series").fetchone() == (96, 96, sum(range(96)))
+        assert {row[0]: row[1] for row in conn.execute("DESCRIBE sql_series").fetchall()}["ts"] == "TIMESTAMP_NS"
+
+
+def test_failed_upsert_resumes_into_its_staging_table_and_leaves_the_dataset_alone(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    existing = pd.DataFrame({"ts": pd.date_range("2024-01-01", periods=2, freq="h"), "value": [-1, -1]})
+    save_dataframe(project_dir, "sql_series", existing)
+    args = ("SELECT * FROM signals ORDER BY ts", "ts", "2024-01-01", "2024-01-05")
+
+    with pytest.raises(ConnectionError):
+        extract_partitioned(
+            FlakyClient(fail_on="2024-01-04"), project_dir, "sql_series", *args, partitions=4, max_workers=1, mode="upsert", key=["ts"]
+        )
+    with connect(project_dir) as conn:
+        assert conn.execute("SELECT sum(value) FROM sql_series").fetchone() == (-2,)
+
+    client = FlakyClient()
+    result = extract_partitioned(client, project_dir, "sql_series", *args, partitions=4, max_workers=1, mode="upsert", key=["ts"])
+    assert result.resumed_from == 3 and len(client.queries) == 1
+    assert result.merged["updated"] == 2
+    assert list_tables(project_dir) == ["sql_series"]
+    with connect(project_dir) as conn:
+        assert conn.execute("SELECT count(*), sum(value) FROM sql_series").fetchone() == (96, sum(range(96)))
+
+
+def test_window_query_binds_bounds_and_drops_a_trailing_order_by() -> None:
+    sql, params = build_window_query("SELECT ts, value FROM signals ORDER BY ts;", "ts", pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-02"))
+    assert sql == 'SELECT * FROM (SELECT ts, value FROM signals) AS src WHERE src."ts" >= ? AND src."ts" < ?'
+    assert [str(value) for value in params] == ["2024-01-01 00:00:00", "2024-01-02 00:00:00"]
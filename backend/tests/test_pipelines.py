@@ -0,0 +1,88 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from app.db.duckdb_store import connect, create_project, save_dataframe
+from app.services.pipelines import PipelineStep, pipeline_graph, run_pipeline, save_pipeline
+
+SLOW_COPY = """
+import time
+started = time.time()
+time.sleep(params.get("sleep", 0))
+df = load(params["source"])
+save_table(params["target"], df.assign(value=df["value"] * params.get("factor", 1), started=started, finished=time.time()))
+"""
+JOIN = """
+left, right = load("a"), load("b")
+save_table("c", pd.concat([left, right]))
+"""
+
+
+def _project(tmp_path: Path) -> tuple[Path, Path]:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    for name in ("raw1", "raw2"):
+        save_dataframe(project_dir, name, pd.DataFrame({"ts": pd.date_range("2024-01-01", periods=3, freq="h"), "value": [1, 2, 3]}))
+    recipes_dir = tmp_path / "recipes"
+    recipes_dir.mkdir()
+    (recipes_dir / "copy.py").write_text(SLOW_COPY, encoding="utf-8")
+    (recipes_dir / "join.py").write_text("import pandas as pd\n" + JOIN, encoding="utf-8")
+    (recipes_dir / "fail.py").write_text("raise RuntimeError('broken')\n", encoding="utf-8")
+    return project_dir, recipes_dir
+
+
+def _steps(sleep: float = 0.0, factor: int = 1) -> list[PipelineStep]:
+    return [
+        PipelineStep("c", "join.py", {}, ["a", "b"], ["c"]),
+        PipelineStep("a", "copy.py", {"source": "raw1", "target": "a", "sleep": sleep}, ["raw1"], ["a"]),
+        PipelineStep("b", "copy.py", {"source": "raw2", "target": "b", "sleep": sleep, "factor": factor}, ["raw2"], ["b"]),
+    ]
+
+
+def test_pipeline_runs_independent_steps_in_parallel_and_only_reruns_changed_ones(tmp_path: Path) -> None:
+    project_dir, recipes_dir = _project(tmp_path)
+    saved = save_pipeline(project_dir, "nightly", _steps(sleep=1.0), recipes_dir)
+    assert saved["graph"] == {"c": ["a", "b"], "a": [], "b": []}
+
+    first = run_pipeline(project_dir, "nightly", recipes_dir, max_workers=2)
+    assert (first["status"], first["ran"]) == ("success", 3)
+    with connect(project_dir) as conn:
+        assert conn.execute("SELECT count(*) FROM c").fetchone()[0] == 6
+        (a_started, a_finished), (b_started, b_finished) = (
+            conn.execute(f"SELECT any_value(started), any_value(finished) FROM {name}").fetchone() for name in ("a", "b")
+        )
+    # a and b were running at the same time.
+    assert a_started < b_finished and b_started < a_finished
+
+    assert run_pipeline(project_dir, "nightly", recipes_dir)["skipped"] == 3
+
+    save_dataframe(project_dir, "raw2", pd.DataFrame({"ts": pd.date_range("2024-01-02", periods=2, freq="h"), "value": [5, 6]}))
+    statuses = {name: step["status"] for name, step in run_pipeline(project_dir, "nightly", recipes_dir)["steps"].items()}
+    assert statuses == {"c": "ran", "a": "skipped", "b": "ran"}
+
+    # Re-saving with changed parameters keeps the state of unchanged steps.
+    save_pipeline(project_dir, "nightly", _steps(sleep=1.0, factor=10), recipes_dir)
+    statuses = {name: step["status"] for name, step in run_pipeline(project_dir, "nightly", recipes_dir)["steps"].items()}
+    assert statuses == {"c": "ran", "a": "skipped", "b": "ran"}
+    assert run_pipeline(project_dir, "nightly", recipes_dir, force=True)["ran"] == 3
+
+
+def test_failed_steps_block_downstream_and_invalid_graphs_are_rejected(tmp_path: Path) -> None:
+    project_dir, recipes_dir = _project(tmp_path)
+    steps = _steps()
+    steps[2] = PipelineStep("b", "fail.py", {}, ["raw2"], ["b"])
+    save_pipeline(project_dir, "broken", steps, recipes_dir)
+
+    result = run_pipeline(project_dir, "broken", recipes_dir)
+    assert result["status"] == "error"
+    assert result["steps"]["b"] == {"status": "failed", "error": "RuntimeError: broken"}
+    assert result["steps"]["c"] == {"status": "blocked", "upstream": ["b"]}
+    assert result["steps"]["a"]["status"] == "ran"
+
+    with pytest.raises(ValueError, match="cycle"):
+        pipeline_graph([PipelineStep("x", "copy.py", {}, ["y"], ["x"]), PipelineStep("y", "copy.py", {}, ["x"], ["y"])])
+    with pytest.raises(ValueError, match="produced by both"):
+        pipeline_graph([PipelineStep("x", "copy.py", {}, [], ["t"]), PipelineStep("y", "copy.py", {}, [], ["t"])])
+    with pytest.raises(ValueError, match="not found"):
+        save_pipeline(project_dir, "missing", [PipelineStep("x", "nope.py")], recipes_dir)
@@ -0,0 +1,66 @@
+from pathlib import Path
+
+import pandas as pd
+
+from app.db.duckdb_store import connect, create_project, load_metadata, save_dataframe
+from app.services.importer import import_csv
+from app.services.profiles import dataset_profile, dataset_summaries
+from app.services.storage import write_batches
+
+
+def _frame(start: str, periods: int, tag: str, offset: float) -> pd.DataFrame:
+    ts = pd.date_range(start, periods=periods, freq="10s").astype("datetime64[us]")
+    values = [offset + index if index % 3 else None for index in range(periods)]
+    return pd.DataFrame({"ts": ts, "tag": tag, "value": values})
+
+
+def test_profile_is_taken_at_import_and_extended_on_append(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    csv_path = tmp_path / "readings.csv"
+    _frame("2024-01-01", 6, "P1", 0).to_csv(csv_path, index=False)
+    import_csv(project_dir, csv_path, {"dataset_name": "readings", "timestamp_column": "ts"})
+
+    stored = load_metadata(project_dir)["profiles"]["readings"]
+    assert stored["rows"] == 6 and stored["appends"] == 0
+    assert stored["columns"]["value"] == {"type": "DOUBLE", "nulls": 2, "approx_distinct": 4, "min": "1.0", "max": "5.0"}
+    assert stored["time"] == {"column": "ts", "start": "2024-01-01 00:00:00", "end": "2024-01-01 00:00:50", "median_interval_s": 10.0}
+
+    # Two rows repeat existing keys, so only the four new ones are folded into the profile.
+    write_batches(project_dir, "readings", [_frame("2024-01-01 00:00:40", 6, "P1", 10)], "append", ["ts", "tag"])
+    appended = dataset_profile(project_dir, "readings")
+    assert (appended["appends"], appended["rows"]) == (1, 10)
+    assert appended["time"]["end"] == "2024-01-01 00:01:30"
+    assert (appended["columns"]["value"]["min"], appended["columns"]["value"]["max"]) == ("1.0", "15.0")
+
+    full = dataset_profile(project_dir, "readings", refresh=True)
+    assert full["appends"] == 0
+    for column in ("ts", "tag", "value"):
+        for field in ("type", "nulls", "min", "max"):
+            assert appended["columns"][column][field] == full["columns"][column][field]
+
+
+def test_listing_uses_stored_profiles_and_flags_stale_ones(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    write_batches(project_dir, "events", [_frame("2024-01-01", 3, "P1", 0)], "replace")
+    with connect(project_dir) as conn:
+        conn.execute("CREATE TABLE manual AS SELECT 1 AS x")
+
+    summaries = dataset_summaries(project_dir)
+    assert summaries["manual"] is None
+    assert summaries["events"] == {
+        "rows": 3,
+        "columns": 3,
+        "time": {"column": "ts", "start": "2024-01-01 00:00:00", "end": "2024-01-01 00:00:20", "median_interval_s": 10.0},
+        "stale": False,
+    }
+
+    write_batches(project_dir, "events", [_frame("2024-01-02", 2, "P2", 0)], "upsert", ["ts", "tag"])
+    assert dataset_summaries(project_dir)["events"]["rows"] == 5
+    # Writers that do not maintain profiles leave the summary marked stale until the profile is read.
+    save_dataframe(project_dir, "events", _frame("2024-01-03", 4, "P3", 0))
+    assert dataset_summaries(project_dir)["events"]["stale"] is True
+    assert dataset_profile(project_dir, "events")["rows"] == 4
+    assert dataset_summaries(project_dir)["events"]["stale"] is False
+    assert dataset_profile(project_dir, "manual")["columns"] == {"x": {"type": "INTEGER", "nulls": 0, "approx_distinct": 1, "min": "1", "max": "1"}}
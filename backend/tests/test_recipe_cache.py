@@ -0,0 +1,67 @@
+from pathlib import Path
+
+import pandas as pd
+
+from app.db.duckdb_store import connect, create_project, save_dataframe
+from app.services.recipe_cache import clear_cache, list_cache_entries
+from app.services.recipes import run_recipe
+from app.services.rollups import enable_rollups, refresh_rollups, rollup_table
+from app.services.storage import set_storage
+
+RECIPE = """
+signal = load("analog_signal")
+signal["scaled"] = signal["value"] * params.get("factor", 1)
+save_table("scaled_signal", signal)
+log(f"Scaled {len(signal)} rows")
+"""
+
+
+def test_recipe_results_are_cached_until_inputs_change(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    save_dataframe(project_dir, "analog_signal", pd.DataFrame({"ts": [1, 2], "value": [1.0, 2.0]}))
+    recipe_path = tmp_path / "scale.py"
+    recipe_path.write_text(RECIPE, encoding="utf-8")
+
+    first = run_recipe(project_dir, recipe_path, {"factor": 2})
+    second = run_recipe(project_dir, recipe_path, {"factor": 2})
+    assert (first.cached, second.cached) == (False, True)
+    assert second.logs == ["Scaled 2 rows"]
+    assert run_recipe(project_dir, recipe_path, {"factor": 3}).cached is False
+
+    save_dataframe(project_dir, "scaled_signal", pd.DataFrame({"ts": [9]}))
+    restored = run_recipe(project_dir, recipe_path, {"factor": 2})
+    assert restored.cached is True
+    with connect(project_dir) as conn:
+        assert conn.execute("SELECT sum(scaled) FROM scaled_signal").fetchone() == (6.0,)
+
+    save_dataframe(project_dir, "analog_signal", pd.DataFrame({"ts": [1], "value": [5.0]}))
+    assert run_recipe(project_dir, recipe_path, {"factor": 2}).cached is False
+
+    assert len(list_cache_entries(project_dir)) == 2
+    assert clear_cache(project_dir) == 2
+    assert list_cache_entries(project_dir) == []
+
+
+def test_restored_outputs_rebuild_rollups_and_partitioned_outputs_rerun(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    ts = pd.date_range("2024-01-01", periods=4, freq="12h")
+    save_dataframe(project_dir, "analog_signal", pd.DataFrame({"ts": ts, "value": [1.0, 2.0, 3.0, 4.0]}))
+    recipe_path = tmp_path / "scale.py"
+    recipe_path.write_text(RECIPE, encoding="utf-8")
+
+    run_recipe(project_dir, recipe_path, {"factor": 2})
+    enable_rollups(project_dir, "scaled_signal")
+    save_dataframe(project_dir, "scaled_signal", pd.DataFrame({"ts": ts[:1], "value": [0.0], "scaled": [100.0]}))
+    refresh_rollups(project_dir, "scaled_signal")
+
+    assert run_recipe(project_dir, recipe_path, {"factor": 2}).cached is True
+    with connect(project_dir) as conn:
+        rolled = conn.execute(f'SELECT sum("scaled__sum") FROM {rollup_table("scaled_signal", "1d")}').fetchone()[0]
+        assert conn.execute("SELECT sum(scaled) FROM scaled_signal").fetchone()[0] == rolled == 20.0
+
+    set_storage(project_dir, "scaled_signal", "ts", partition="day")
+    assert run_recipe(project_dir, recipe_path, {"factor": 2}).cached is False
+    with connect(project_dir) as conn:
+        assert conn.execute("SELECT sum(scaled) FROM scaled_signal").fetchone()[0] == 20.0
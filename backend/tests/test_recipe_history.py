@@ -0,0 +1,68 @@
+import json
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from app.db.duckdb_store import create_project, save_dataframe
+from app.services import recipe_history
+from app.services.recipe_history import compact_history, query_history
+from app.services.recipes import run_recipe
+
+
+def _recipe(tmp_path: Path, name: str, body: str) -> Path:
+    path = tmp_path / name
+    path.write_text(body, encoding="utf-8")
+    return path
+
+
+def test_runs_are_appended_with_timings_inputs_and_output_rows(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    save_dataframe(project_dir, "signal", pd.DataFrame({"ts": pd.date_range("2024-01-01", periods=5, freq="h"), "value": range(5)}))
+    (project_dir / "recipe_history.json").write_text(
+        json.dumps([{"recipe": "old.py", "parameters": {}, "outputs": ["legacy"], "logs": ["done"]}]), encoding="utf-8"
+    )
+    copy = _recipe(tmp_path, "copy.py", 'save_table("copy", load("signal", where=f"value >= {params[\'min\']}"))\nlog("copied")\n')
+    broken = _recipe(tmp_path, "broken.py", 'load("signal")\nraise RuntimeError("boom")\n')
+
+    result = run_recipe(project_dir, copy, {"min": 2})
+    cached = run_recipe(project_dir, copy, {"min": 2})
+    with pytest.raises(RuntimeError):
+        run_recipe(project_dir, broken, {})
+
+    assert not (project_dir / "recipe_history.json").exists()
+    history = query_history(project_dir)
+    assert history["total"] == 4
+    newest, again, first, legacy = history["runs"]
+    assert (newest["recipe"], newest["status"], newest["error"], newest["inputs"]) == ("broken.py", "error", "RuntimeError: boom", ["signal"])
+    assert (first["run_id"], first["inputs"], first["outputs"], first["cached"]) == (result.run_id, ["signal"], {"copy": 3}, False)
+    assert first["seconds"] >= 0 and "logs" not in first
+    assert again["cached"] and again["outputs"] == {"copy": 3}
+    assert legacy["recipe"] == "old.py" and legacy["started_at"] is None
+    assert cached.run_id == again["run_id"]
+
+    page = query_history(project_dir, recipe="copy.py", offset=1, limit=1, include_logs=True)
+    assert page["total"] == 2 and page["runs"][0]["run_id"] == result.run_id and page["runs"][0]["logs"] == ["copied"]
+    assert query_history(project_dir, status="error", since=first["started_at"])["total"] == 1
+    assert query_history(project_dir, until="2000-01-01")["total"] == 0
+    with pytest.raises(ValueError, match="Unsupported status"):
+        query_history(project_dir, status="failed")
+
+
+def test_compaction_applies_run_limit_and_age(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    monkeypatch.setattr(recipe_history, "RECIPE_HISTORY_MAX_RUNS", 3)
+    monkeypatch.setattr(recipe_history, "RECIPE_HISTORY_COMPACT_EVERY", 4)
+    recipe_history.append_run(project_dir, {"run_id": "old", "started_at": "2000-01-01T00:00:00+00:00"})
+    recipe = _recipe(tmp_path, "noop.py", "log('ok')\n")
+    for _ in range(3):
+        run_recipe(project_dir, recipe, {}, use_cache=False)
+
+    # The fourth append triggered a compaction: the old run is past the retention age.
+    lines = (project_dir / "recipe_history.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["recipe"] for line in lines] == ["noop.py"] * 3
+    run_recipe(project_dir, recipe, {}, use_cache=False)
+    assert compact_history(project_dir) == {"removed": 1}
+    assert query_history(project_dir)["total"] == 3
@@ -0,0 +1,62 @@
+from pathlib import Path
+
+import pandas as pd
+
+from app.db.duckdb_store import create_project, save_dataframe
+from app.services.recipes import build_load_query, run_recipe
+
+RECIPES_DIR = Path(__file__).resolve().parents[1] / "app" / "recipes"
+
+
+def test_build_load_query_pushes_down_filters() -> None:
+    sql, params = build_load_query(
+        "analog_signal", columns=["ts", "value"], start="2024-01-01", end="2024-01-02", where="value > 0", limit=10
+    )
+    assert sql == (
+        'SELECT "ts", "value" FROM "analog_signal" WHERE "ts" >= ? AND "ts" < ? AND (value > 0) LIMIT 10'
+    )
+    assert params == [pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-02")]
+
+
+def test_load_supports_projection_time_range_and_lazy_relations(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    save_dataframe(
+        project_dir,
+        "analog_signal",
+        pd.DataFrame({"ts": pd.date_range("2024-01-01", periods=48, freq="h"), "value": range(48), "tag": "T1"}),
+    )
+    recipe_path = tmp_path / "day.py"
+    recipe_path.write_text(
+        """
+day = load("analog_signal", columns=["ts", "value"], start="2024-01-02", end="2024-01-03")
+log(f"{len(day)} {list(day.columns)}")
+peak = load("analog_signal", lazy=True).filter("value >= 40").aggregate("count(*) AS n").fetchone()[0]
+log(str(peak))
+""",
+        encoding="utf-8",
+    )
+
+    result = run_recipe(project_dir, recipe_path, {})
+
+    assert result.logs == ["24 ['ts', 'value']", "8"]
+
+
+def test_alarm_timeline_filters_levels_in_sql(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    save_dataframe(
+        project_dir,
+        "text_logs",
+        pd.DataFrame(
+            {
+                "ts": pd.to_datetime(["2024-01-01 00:00:02", "2024-01-01 00:00:01", "2024-01-01 00:00:03"]),
+                "level": ["alarm", "info", "WARN"],
+                "message": ["Pump trip", "Started", "High temp"],
+            }
+        ),
+    )
+
+    result = run_recipe(project_dir, RECIPES_DIR / "alarm_event_timeline.py", {})
+
+    assert result.logs[0] == "Saved 2 alarm events"
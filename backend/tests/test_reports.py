@@ -0,0 +1,54 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.db.duckdb_store import create_project, save_dataframe
+from app.services.reports import CHART_POINTS, generate_html_report, generate_pdf_report
+
+
+def _project(tmp_path: Path, rows: int = 5000) -> Path:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    frame = pd.DataFrame(
+        {
+            "ts": pd.date_range("2024-01-01", periods=rows, freq="s").astype("datetime64[us]"),
+            "tag": np.where(np.arange(rows) % 4 == 0, "pump", "<valve>"),
+            "value": np.arange(rows, dtype="float64"),
+        }
+    )
+    save_dataframe(project_dir, "signal", frame)
+    return project_dir
+
+
+def test_html_report_summarizes_the_whole_dataset_and_is_cached(tmp_path: Path) -> None:
+    project_dir = _project(tmp_path)
+    first = generate_html_report(project_dir, "signal", "Signal <report>")
+    assert not first["cached"]
+    content = Path(first["path"]).read_text(encoding="utf-8")
+    assert "Signal &lt;report&gt;" in content and "&lt;valve&gt;" in content
+    # Statistics cover all rows, not a preview: max and median come from the full table.
+    assert "5,000 rows" in content and "<td>4999</td>" in content and "<td>2499" in content
+    assert "<td>3750</td>" in content and "<td>1250</td>" in content
+    assert content.count("<svg") == 1 and content.count("<polygon") == 1
+    assert CHART_POINTS < 5000
+
+    assert generate_html_report(project_dir, "signal", "Signal <report>")["cached"]
+    assert not generate_html_report(project_dir, "signal", "Other title")["cached"]
+    save_dataframe(project_dir, "signal", pd.DataFrame({"ts": pd.date_range("2025-01-01", periods=3, freq="s"), "tag": "pump", "value": 1.0}))
+    assert not generate_html_report(project_dir, "signal", "Other title")["cached"]
+
+    with pytest.raises(ValueError, match="not found"):
+        generate_html_report(project_dir, "missing", "Report")
+    with pytest.raises(ValueError, match="Unknown tag column"):
+        generate_html_report(project_dir, "signal", "Report", tag_column="nope")
+
+
+def test_pdf_report_is_written(tmp_path: Path) -> None:
+    project_dir = _project(tmp_path, rows=500)
+    result = generate_pdf_report(project_dir, "signal", "Signal", value_columns=["value"])
+    path = Path(result["path"])
+    assert path.name == "signal_report.pdf" and path.read_bytes().startswith(b"%PDF")
+    assert not list(path.parent.glob(".*.tmp"))
+    assert generate_pdf_report(project_dir, "signal", "Signal", value_columns=["value"])["cached"]
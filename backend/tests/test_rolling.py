@@ -0,0 +1,56 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.db.duckdb_store import connect, create_project, save_dataframe
+from app.services.recipes import run_recipe
+from app.services.rolling import compute_rolling_stats, update_rolling_stats
+
+RECIPES_DIR = Path(__file__).resolve().parents[1] / "app" / "recipes"
+
+
+def _signal(start: str, periods: int, offset: int = 0) -> pd.DataFrame:
+    ts = pd.date_range(start, periods=periods, freq="s")
+    frames = [
+        pd.DataFrame({"tag": tag, "ts": ts, "value": np.sin(np.arange(offset, offset + periods) * scale)})
+        for tag, scale in (("T1", 0.3), ("T2", 0.7))
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_trend_recipe_matches_pandas_rolling(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    signal = _signal("2024-01-01", 50).query("tag == 'T1'")[["ts", "value"]]
+    save_dataframe(project_dir, "analog_signal", signal)
+
+    result = run_recipe(project_dir, RECIPES_DIR / "trend_and_deviation.py", {"window": 5, "threshold": 1.0})
+
+    expected_mean = signal["value"].rolling(5, min_periods=1).mean()
+    expected_std = signal["value"].rolling(5, min_periods=1).std().fillna(0)
+    with connect(project_dir) as conn:
+        actual = conn.execute("SELECT rolling_mean, rolling_std FROM analog_trend_outliers ORDER BY ts").fetchdf()
+    assert result.outputs == ["analog_trend_outliers"]
+    np.testing.assert_allclose(actual["rolling_mean"], expected_mean)
+    np.testing.assert_allclose(actual["rolling_std"], expected_std)
+
+
+def test_incremental_update_matches_full_recompute(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    history = _signal("2024-01-01", 40)
+    save_dataframe(project_dir, "analog_signal", history)
+
+    for options in ({"window": 7}, {"window_interval": "5 seconds"}):
+        compute_rolling_stats(project_dir, "analog_signal", "incremental", partition_by=["tag"], threshold=1.5, **options)
+        save_dataframe(project_dir, "analog_signal", pd.concat([history, _signal("2024-01-01 00:00:40", 15, offset=40)]))
+        appended = update_rolling_stats(project_dir, "incremental")
+        compute_rolling_stats(project_dir, "analog_signal", "recomputed", partition_by=["tag"], threshold=1.5, **options)
+        save_dataframe(project_dir, "analog_signal", history)
+
+        with connect(project_dir) as conn:
+            incremental = conn.execute("SELECT * FROM incremental ORDER BY tag, ts").fetchdf()
+            full = conn.execute("SELECT * FROM recomputed ORDER BY tag, ts").fetchdf()
+        assert appended == 30
+        pd.testing.assert_frame_equal(incremental, full)
@@ -0,0 +1,69 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.db.duckdb_store import connect, create_project, save_dataframe
+from app.services.recipes import run_recipe
+from app.services.rollups import disable_rollups, enable_rollups, refresh_rollups, rollup_table
+from app.services.series import downsample_series
+
+
+def _signal(start: str, periods: int) -> pd.DataFrame:
+    ts = pd.date_range(start, periods=periods, freq="250ms")
+    frames = [
+        pd.DataFrame({"ts": ts, "tag": tag, "value": np.sin(np.arange(periods) * scale)})
+        for tag, scale in (("T1", 0.01), ("T2", 0.03))
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _rollup_rows(project_dir: Path, suffix: str) -> pd.DataFrame:
+    with connect(project_dir) as conn:
+        return conn.execute(f"SELECT * FROM {rollup_table('signal', suffix)} ORDER BY bucket, tag").fetchdf()
+
+
+def test_series_uses_coarsest_rollup_with_same_result(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    save_dataframe(project_dir, "signal", _signal("2024-01-01", 4 * 3600 * 6))
+    enable_rollups(project_dir, "signal", tag_column="tag")
+
+    options = {"start": "2024-01-01 00:00:00", "end": "2024-01-01 06:00:00", "width": 6, "tag_column": "tag", "tag": "T2"}
+    rolled = downsample_series(project_dir, "signal", **options)
+    assert rolled["source"] == rollup_table("signal", "1h")
+
+    disable_rollups(project_dir, "signal")
+    raw = downsample_series(project_dir, "signal", **options)
+    assert raw["source"] == "signal"
+    assert rolled["rows"] == raw["rows"] == 4 * 3600 * 6
+    assert rolled["series"]["value"]["ts"] == raw["series"]["value"]["ts"]
+    np.testing.assert_allclose(rolled["series"]["value"]["min"], raw["series"]["value"]["min"])
+    np.testing.assert_allclose(rolled["series"]["value"]["max"], raw["series"]["value"]["max"])
+
+
+def test_appended_timeseries_updates_rollups_incrementally(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    recipe = tmp_path / "append.py"
+    recipe.write_text(
+        "import pandas as pd\n"
+        "frame = pd.read_pickle(params['path'])\n"
+        "save_timeseries('signal', frame, append=params['append'], rollup=True, tag_col='tag')\n",
+        encoding="utf-8",
+    )
+    full = _signal("2024-01-01 23:50:00", 8000).sort_values("ts", ignore_index=True)
+    middle = len(full) // 2 + 7
+    for index, (part, append) in enumerate(((full.iloc[:middle], False), (full.iloc[middle:], True))):
+        path = tmp_path / f"part{index}.pkl"
+        part.to_pickle(path)
+        run_recipe(project_dir, recipe, {"path": str(path), "append": append}, use_cache=False)
+    incremental = {suffix: _rollup_rows(project_dir, suffix) for suffix in ("1s", "1m", "1h", "1d")}
+
+    refresh_rollups(project_dir, "signal")
+
+    for suffix, rows in incremental.items():
+        pd.testing.assert_frame_equal(rows, _rollup_rows(project_dir, suffix))
+    daily = incremental["1d"]
+    assert daily["value__count"].sum() == len(full)
+    assert daily.loc[daily["tag"] == "T1", "value__first"].iloc[0] == 0.0
@@ -0,0 +1,111 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.db.duckdb_store import connect, create_project, save_dataframe
+from app.services.rollups import enable_rollups, rollup_table
+from app.services.series import downsample_series, lttb
+
+
+def _project(tmp_path: Path, periods: int = 10_000) -> Path:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    ts = pd.date_range("2024-01-01", periods=periods, freq="s")
+    value = np.sin(np.arange(periods) / 100.0)
+    value[periods // 2] = 25.0
+    save_dataframe(project_dir, "signal", pd.DataFrame({"ts": ts, "value": value, "label": "a"}))
+    return project_dir
+
+
+def test_minmax_buckets_match_pandas(tmp_path: Path) -> None:
+    project_dir = _project(tmp_path)
+
+    result = downsample_series(project_dir, "signal", start="2024-01-01 00:00:00", end="2024-01-01 01:00:00", width=60)
+
+    series = result["series"]["value"]
+    assert list(result["series"]) == ["value"]
+    assert result["rows"] == 3600 and len(series["ts"]) == 60
+    expected = pd.Series(np.sin(np.arange(3600) / 100.0)).groupby(np.arange(3600) // 60)
+    np.testing.assert_allclose(series["min"], expected.min())
+    np.testing.assert_allclose(series["max"], expected.max())
+    assert series["ts"][1] - series["ts"][0] == 60_000
+
+
+def test_avg_and_lttb_are_bounded_and_keep_peaks(tmp_path: Path) -> None:
+    project_dir = _project(tmp_path)
+
+    averaged = downsample_series(project_dir, "signal", width=100, mode="avg")
+    reduced = downsample_series(project_dir, "signal", width=200, mode="lttb")
+
+    assert len(averaged["series"]["value"]["avg"]) == 100
+    assert len(reduced["series"]["value"]["ts"]) == 200
+    assert max(reduced["series"]["value"]["value"]) == 25.0
+    assert reduced["series"]["value"]["ts"] == sorted(reduced["series"]["value"]["ts"])
+
+
+def test_lttb_keeps_endpoints() -> None:
+    x = np.arange(1000, dtype=float)
+    keep = lttb(x, np.cos(x / 50.0), 50)
+
+    assert len(keep) == 50 and keep[0] == 0 and keep[-1] == 999
+    assert (np.diff(keep) > 0).all()
+
+
+def test_rejects_unknown_mode(tmp_path: Path) -> None:
+    project_dir = _project(tmp_path, periods=10)
+
+    with pytest.raises(ValueError):
+        downsample_series(project_dir, "signal", mode="median")
+
+
+def test_timezone_aware_series_use_utc_on_a_non_utc_host(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    ts = pd.date_range("2024-01-01", periods=7200, freq="s", tz="UTC")
+    save_dataframe(project_dir, "signal", pd.DataFrame({"ts": ts, "value": np.arange(7200.0)}))
+    # Only this project's database handle sees the setting.
+    with connect(project_dir) as conn:
+        conn.execute("SET GLOBAL TimeZone = 'Europe/Stockholm'")
+    options = {"start": "2024-01-01 00:00:00", "end": "2024-01-01 02:00:00", "width": 2}
+    raw = downsample_series(project_dir, "signal", **options)
+    enable_rollups(project_dir, "signal")
+    rolled = downsample_series(project_dir, "signal", **options)
+
+    assert rolled["source"] == rollup_table("signal", "1h")
+    for result in (raw, rolled):
+        assert result["rows"] == 7200
+        assert result["series"]["value"]["ts"] == [1704067200000.0, 1704070800000.0]
+        assert result["series"]["value"]["min"] == [0.0, 3600.0]
+
+
+def test_rollup_row_counts_include_rows_without_a_value(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    ts = pd.date_range("2024-01-01", periods=7200, freq="s")
+    value = np.where(np.arange(7200) % 2 == 0, np.nan, 1.0)
+    save_dataframe(project_dir, "signal", pd.DataFrame({"ts": ts, "value": value}))
+    options = {"start": "2024-01-01 00:00:00", "end": "2024-01-01 02:00:00", "width": 2}
+    raw = downsample_series(project_dir, "signal", **options)
+    enable_rollups(project_dir, "signal")
+    rolled = downsample_series(project_dir, "signal", **options)
+
+    assert rolled["source"] == rollup_table("signal", "1h")
+    assert raw["rows"] == rolled["rows"] == 7200
+
+
+def test_rollups_are_not_used_where_a_bucket_straddles_the_range_bounds(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    ts = pd.date_range("2024-01-01", periods=7200, freq="s")
+    save_dataframe(project_dir, "signal", pd.DataFrame({"ts": ts, "value": np.arange(7200.0)}))
+    enable_rollups(project_dir, "signal")
+
+    half_hour = downsample_series(project_dir, "signal", start="2024-01-01 00:30:00", end="2024-01-01 01:30:00", width=1)
+    assert half_hour["source"] == rollup_table("signal", "1m")
+    assert (half_hour["rows"], half_hour["series"]["value"]["min"], half_hour["series"]["value"]["max"]) == (3600, [1800.0], [5399.0])
+
+    offset = downsample_series(project_dir, "signal", start="2024-01-01 00:30:00.5", end="2024-01-01 01:30:00", width=1)
+    assert offset["source"] == "signal"
+    assert offset["series"]["value"]["min"] == [1801.0]
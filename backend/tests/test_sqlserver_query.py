@@ -2,8 +2,17 @@ from pathlib import Path
 
 import pandas as pd
 
-from app.db.duckdb_store import create_project, list_tables, save_dataframe
-from app.services.query_runner import build_sqlserver_connection_string, run_query
+import sqlite3
+
+from app.db.duckdb_store import connect, create_project, list_tables, save_batches, save_dataframe, table_columns
+from app.services.query_runner import (
+    SqlServerClient,
+    build_sqlserver_connection_string,
+    dispose_engines,
+    extract_to_duckdb,
+    get_engine,
+    run_query,
+)
 
 
 def test_build_sqlserver_connection_string() -> None:
@@ -32,3 +41,50 @@ def test_mock_sqlserver_query_fetch(tmp_path: Path) -> None:
     save_dataframe(project_dir, "sql_series", result)
 
     assert "sql_series" in list_tables(project_dir)
+
+
+def test_streaming_extract_appends_batches(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+
+    source_path = tmp_path / "historian.db"
+    with sqlite3.connect(source_path) as source:
+        source.execute("CREATE TABLE signals (ts TEXT, value REAL)")
+        source.executemany("INSERT INTO signals VALUES (?, ?)", [(f"2024-01-01 00:00:{i:02d}", float(i)) for i in range(25)])
+
+    client = SqlServerClient(f"sqlite:///{source_path}", name="local")
+    try:
+        assert get_engine(client.connection_string, "local") is get_engine(client.connection_string, "local")
+        result = extract_to_duckdb(client, project_dir, "sql_series", "SELECT * FROM signals ORDER BY ts", batch_size=10)
+    finally:
+        dispose_engines()
+
+    assert result.rows == 25
+    assert result.batches == 3
+    assert result.bytes > 0
+    with connect(project_dir) as conn:
+        assert conn.execute("SELECT count(*), sum(value) FROM sql_series").fetchone() == (25, 300.0)
+
+
+def test_streaming_extract_takes_column_types_from_later_batches(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    source_path = tmp_path / "historian.db"
+    with sqlite3.connect(source_path) as source:
+        source.execute("CREATE TABLE events (id INTEGER, note TEXT)")
+        source.executemany("INSERT INTO events VALUES (?, ?)", [(i, None if i < 10 else "hello") for i in range(15)])
+
+    client = SqlServerClient(f"sqlite:///{source_path}", name="events")
+    try:
+        # The note column is all NULL in the first batch.
+        result = extract_to_duckdb(client, project_dir, "events", "SELECT * FROM events ORDER BY id", batch_size=10)
+    finally:
+        dispose_engines()
+
+    assert result.rows == 15
+    with connect(project_dir) as conn:
+        assert conn.execute("SELECT count(note), max(note) FROM events").fetchone() == (5, "hello")
+    # An empty first window leaves untyped columns that the first rows then decide.
+    save_batches(project_dir, "windowed", [pd.DataFrame(columns=["ts", "value"])])
+    save_batches(project_dir, "windowed", [pd.DataFrame({"ts": pd.to_datetime(["2024-01-01"]), "value": [1.5]})], append=True)
+    assert table_columns(project_dir, "windowed") == {"ts": "TIMESTAMP_NS", "value": "DOUBLE"}
@@ -0,0 +1,83 @@
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+
+from app.db.duckdb_store import connect, create_project
+from app.services.connections import SyncConfig, build_incremental_query, get_sync_config, run_sync, save_sync_config
+
+
+class FakeClient:
+    def __init__(self, source: pd.DataFrame) -> None:
+        self.conn = duckdb.connect()
+        self.conn.register("signals", source)
+        self.transferred = 0
+
+    def fetch_dataframe(self, query: str, params: list | None = None) -> pd.DataFrame:
+        return self.conn.execute(query, params or []).fetchdf()
+
+    def iter_batches(self, query: str, batch_size: int, params: list | None = None):
+        df = self.fetch_dataframe(query, params)
+        self.transferred += len(df)
+        for start in range(0, max(len(df), 1), batch_size):
+            yield df.iloc[start:start + batch_size]
+
+
+def test_sync_only_transfers_rows_after_watermark(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    save_sync_config(
+        project_dir,
+        SyncConfig(dataset="signals", connection="plant_sql", query="SELECT * FROM signals", watermark_column="ts"),
+    )
+
+    history = pd.DataFrame({"ts": pd.date_range("2024-01-01", periods=5, freq="h"), "value": range(5)})
+    client = FakeClient(history)
+    first = run_sync(project_dir, client, "signals", batch_size=2)
+    assert first["mode"] == "full"
+    assert client.transferred == 5
+
+    newer = pd.DataFrame({"ts": pd.date_range("2024-01-01 05:00", periods=3, freq="h"), "value": range(5, 8)})
+    client = FakeClient(pd.concat([history, newer]))
+    second = run_sync(project_dir, client, "signals", batch_size=2)
+
+    assert second["mode"] == "append"
+    # The watermark instant is read again, so rows committed later with that timestamp are not missed.
+    assert client.transferred == 4 and second["rows"] == 3
+    assert second["watermark"] == "2024-01-01 07:00:00"
+    assert get_sync_config(project_dir, "signals").last_rows == 3
+    with connect(project_dir) as conn:
+        assert conn.execute("SELECT count(*), count(DISTINCT ts) FROM signals").fetchone() == (8, 8)
+
+
+def test_incremental_query_binds_watermark_and_drops_inner_order_by() -> None:
+    watermark = pd.Timestamp("2024-01-01 05:00:00.123456")
+    sql, params = build_incremental_query("SELECT ts, value FROM signals\nORDER BY ts DESC;", "ts", watermark)
+    assert sql == 'SELECT * FROM (SELECT ts, value FROM signals) AS src WHERE src."ts" >= ? ORDER BY src."ts"'
+    assert params == [watermark.to_pydatetime()]
+
+    top = "SELECT TOP 100 ts, value FROM signals ORDER BY ts"
+    assert build_incremental_query(top, "ts", None) == (f'SELECT * FROM ({top}) AS src ORDER BY src."ts"', [])
+    nested = "SELECT * FROM signals WHERE ts IN (SELECT ts FROM events ORDER BY ts OFFSET 0 ROWS)"
+    assert build_incremental_query(nested, "ts", None)[0].startswith(f"SELECT * FROM ({nested})")
+
+
+def test_sync_picks_up_rows_committed_late_at_the_watermark_instant(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    save_sync_config(
+        project_dir, SyncConfig(dataset="signals", connection="plant_sql", query="SELECT * FROM signals", watermark_column="ts")
+    )
+    ts = pd.Timestamp("2024-01-01 00:00:01")
+    first = pd.DataFrame({"ts": [ts, ts], "tag": ["P1", "P2"], "value": [1.0, 2.0]})
+    run_sync(project_dir, FakeClient(first), "signals")
+
+    late = pd.DataFrame({"ts": [ts, ts + pd.Timedelta(seconds=1)], "tag": ["P3", "P1"], "value": [3.0, 4.0]})
+    result = run_sync(project_dir, FakeClient(pd.concat([first, late])), "signals")
+
+    assert result["rows"] == 2
+    with connect(project_dir) as conn:
+        assert conn.execute("SELECT tag, value FROM signals ORDER BY ts, tag").fetchall() == [
+            ("P1", 1.0), ("P2", 2.0), ("P3", 3.0), ("P1", 4.0),
+        ]
+    assert run_sync(project_dir, FakeClient(pd.concat([first, late])), "signals")["rows"] == 0
@@ -0,0 +1,93 @@
+from pathlib import Path
+
+import pandas as pd
+
+from app.db.duckdb_store import close_all, connect, create_project, save_dataframe, table_type
+from app.services.importer import import_csv
+from app.services.recipes import build_load_query
+from app.services.storage import dataset_source, partition_dir, set_storage, write_batches
+
+
+def _readings(start: str, periods: int, freq: str = "1h") -> pd.DataFrame:
+    ts = pd.date_range(start, periods=periods, freq=freq)
+    return pd.DataFrame({"ts": ts, "value": range(periods)})
+
+
+def _rows(project_dir: Path, sql: str) -> pd.DataFrame:
+    with connect(project_dir) as conn:
+        return conn.execute(sql).fetchdf()
+
+
+def test_csv_import_sorts_by_timestamp_and_partitions(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    csv_path = tmp_path / "readings.csv"
+    _readings("2024-01-01", 72).sample(frac=1, random_state=3).to_csv(csv_path, index=False)
+
+    import_csv(project_dir, csv_path, {"dataset_name": "sorted", "timestamp_column": "ts"})
+    assert _rows(project_dir, "SELECT ts FROM sorted")["ts"].is_monotonic_increasing
+
+    import_csv(project_dir, csv_path, {"dataset_name": "readings", "timestamp_column": "ts", "partition": "day"})
+    with connect(project_dir) as conn:
+        assert table_type(conn, "readings") == "VIEW"
+    assert sorted(path.name for path in partition_dir(project_dir, "readings").iterdir()) == [
+        "_partition=2024-01-01", "_partition=2024-01-02", "_partition=2024-01-03",
+    ]
+    assert len(_rows(project_dir, "SELECT * FROM readings")) == 72
+
+    source = dataset_source(project_dir, "readings", "ts", "2024-01-02 06:00", "2024-01-02 12:00")
+    assert "2024-01-02" in source and "2024-01-01" not in source and "2024-01-03" not in source
+    sql, params = build_load_query("readings", start="2024-01-02 06:00", end="2024-01-02 12:00", source=source)
+    with connect(project_dir) as conn:
+        loaded = conn.execute(sql, params).fetchdf()
+    assert loaded["value"].tolist() == list(range(30, 36))
+
+
+def test_append_rewrites_only_touched_partitions(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    save_dataframe(project_dir, "readings", _readings("2024-01-01", 72))
+    set_storage(project_dir, "readings", "ts", "day")
+    directory = partition_dir(project_dir, "readings")
+    untouched = directory / "_partition=2024-01-01" / "data_0.parquet"
+    before = untouched.stat().st_mtime_ns
+
+    late = _readings("2024-01-02 00:30", 3).assign(value=lambda df: df["value"] + 100)
+    fresh = _readings("2024-01-04", 2).assign(value=-1)
+    assert write_batches(project_dir, "readings", [late, fresh])["inserted"] == 5
+
+    assert untouched.stat().st_mtime_ns == before
+    assert (directory / "_partition=2024-01-04" / "data_0.parquet").exists()
+    day_two = _rows(project_dir, f"SELECT * FROM {dataset_source(project_dir, 'readings', 'ts', '2024-01-02', '2024-01-02 23:00')}")
+    assert len(day_two) == 27 and day_two["ts"].is_monotonic_increasing
+    assert len(_rows(project_dir, "SELECT * FROM readings")) == 77
+
+
+def test_sorted_table_append_and_rewrite_back_to_table(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    save_dataframe(project_dir, "readings", _readings("2024-01-02", 10).sort_values("ts", ascending=False))
+    set_storage(project_dir, "readings", "ts")
+    write_batches(project_dir, "readings", [_readings("2024-01-01", 5)])
+    frame = _rows(project_dir, "SELECT ts FROM readings")
+    assert len(frame) == 15 and frame["ts"].is_monotonic_increasing
+
+    set_storage(project_dir, "readings", "ts", "month")
+    save_dataframe(project_dir, "readings", _readings("2024-02-01", 3))
+    with connect(project_dir) as conn:
+        assert table_type(conn, "readings") == "BASE TABLE"
+    assert dataset_source(project_dir, "readings", "ts", "2024-02-01") == '"readings"'
+
+
+def test_partitioned_view_survives_moving_the_project(tmp_path: Path) -> None:
+    project_dir = tmp_path / "o'project"
+    create_project(project_dir, "Test", None)
+    save_dataframe(project_dir, "readings", _readings("2024-01-01", 48))
+    set_storage(project_dir, "readings", "ts", "day")
+    write_batches(project_dir, "readings", [_readings("2024-01-02 00:30", 2)])
+    close_all()
+
+    moved = project_dir.rename(tmp_path / "restored")
+    assert len(_rows(moved, "SELECT * FROM readings")) == 50
+    write_batches(moved, "readings", [_readings("2024-01-03", 1)])
+    assert len(_rows(moved, "SELECT * FROM readings")) == 51
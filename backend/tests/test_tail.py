@@ -0,0 +1,141 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from app.db.duckdb_store import connect, create_project, load_metadata
+from app.services import bulk_import, tail
+from app.services.tail import TailFollower, WatchConfig, save_watch_config
+
+
+def _rows(project_dir: Path, sql: str) -> list[tuple]:
+    with connect(project_dir) as conn:
+        return conn.execute(sql).fetchall()
+
+
+@pytest.fixture()
+def logs(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setattr(bulk_import, "IMPORT_ROOTS", [tmp_path / "imports"])
+    directory = tmp_path / "imports" / "line1"
+    directory.mkdir(parents=True)
+    return directory
+
+
+def test_follower_reads_appended_lines_across_rotation_and_restart(tmp_path: Path, logs: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    log = logs / "plc.log"
+    log.write_text("ts,tag,value\n2024-01-01 00:00:00,P1,1\n2024-01-01 00:01:00,P1,", encoding="utf-8")
+    config = WatchConfig(name="plc", dataset="plc", path=str(logs), pattern="plc.log*", timestamp_column="ts", key=["tag", "ts"])
+    save_watch_config(project_dir, config)
+
+    follower = TailFollower(project_dir, "plc")
+    assert follower.step(force=True) == 1
+    with log.open("a", encoding="utf-8") as handle:
+        handle.write("2\n2024-01-01 00:02:00,P1,3\n")
+    assert follower.step() == 0 and follower.status()["pending_rows"] == 2
+    assert follower.flush() == 2
+
+    # Rotation: the unread tail of the renamed file is still read, and the new file starts with its own header.
+    with log.open("a", encoding="utf-8") as handle:
+        handle.write("2024-01-01 00:03:00,P1,4\n")
+    os.rename(log, logs / "plc.log.1")
+    log.write_text("ts,tag,value\n2024-01-01 00:04:00,P1,5\n", encoding="utf-8")
+    assert follower.step(force=True) == 2
+    status = follower.status()
+    assert status["bytes_behind"] == 0 and status["rows"] == 5
+
+    with (logs / "plc.log").open("a", encoding="utf-8") as handle:
+        handle.write("2024-01-01 00:05:00,P1,6\n")
+    # A new follower, as after a restart, continues from the offsets stored in metadata.
+    assert TailFollower(project_dir, "plc").step(force=True) == 1
+    assert _rows(project_dir, "SELECT value FROM plc ORDER BY ts") == [(1,), (2,), (3,), (4,), (5,), (6,)]
+    files = load_metadata(project_dir)["watches"]["plc"]["files"]
+    assert sorted(Path(path).name for path in files) == ["plc.log", "plc.log.1"]
+
+
+def test_text_watch_of_single_file_and_truncation(tmp_path: Path, logs: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    log = logs / "events.txt"
+    log.write_text("pump started\nvalve open\n", encoding="utf-8")
+    save_watch_config(project_dir, WatchConfig(name="events", dataset="events", path=str(log), format="text", max_rows=2))
+
+    follower = TailFollower(project_dir, "events")
+    assert follower.step() == 2
+    log.write_text("restarted\n", encoding="utf-8")
+    assert follower.step(force=True) == 1
+    assert _rows(project_dir, "SELECT line, source_file FROM events ORDER BY ingested_at, line") == [
+        ("pump started", "events.txt"),
+        ("valve open", "events.txt"),
+        ("restarted", "events.txt"),
+    ]
+    with pytest.raises(ValueError, match="outside the allowed import roots"):
+        save_watch_config(project_dir, WatchConfig(name="etc", dataset="etc", path="/etc/hosts"))
+
+
+def test_single_file_rotation_and_failed_flush_retry(tmp_path: Path, logs: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    log = logs / "app.log"
+    log.write_text("one\n", encoding="utf-8")
+    save_watch_config(project_dir, WatchConfig(name="app", dataset="app", path=str(log), format="text"))
+    follower = TailFollower(project_dir, "app")
+    assert follower.step(force=True) == 1
+
+    # The watch names one file, so the rotated app.log.1 is only found through its inode.
+    with log.open("a", encoding="utf-8") as handle:
+        handle.write("two\n")
+    os.rename(log, logs / "app.log.1")
+    log.write_text("three\n", encoding="utf-8")
+
+    calls = []
+    write_batches = tail.write_batches
+
+    def failing_once(*args, **kwargs):
+        calls.append(len(args[2][0]))
+        if len(calls) == 1:
+            raise ValueError("Incompatible column types: line (VARCHAR vs BIGINT)")
+        return write_batches(*args, **kwargs)
+
+    monkeypatch.setattr(tail, "write_batches", failing_once)
+    with pytest.raises(ValueError, match="Incompatible"):
+        follower.step(force=True)
+    with log.open("a", encoding="utf-8") as handle:
+        handle.write("four\n")
+    # The retry writes the kept batch only; "four" waits for the next poll.
+    assert follower.step() == 2
+    assert follower.step(force=True) == 1
+    assert calls == [2, 2, 1]
+    assert _rows(project_dir, "SELECT line FROM app ORDER BY line") == [("four",), ("one",), ("three",), ("two",)]
+
+
+def test_malformed_csv_lines_go_to_rejects_without_losing_the_chunk(tmp_path: Path, logs: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    log = logs / "plc.log"
+    log.write_text(
+        "ts,value\n2024-01-01 00:00:00,1\nbroken,line,extra\n2024-01-01 00:00:01,2\nnot a time,3\n", encoding="utf-8"
+    )
+    save_watch_config(project_dir, WatchConfig(name="plc", dataset="plc", path=str(log), timestamp_column="ts"))
+    follower = TailFollower(project_dir, "plc")
+
+    assert follower.step(force=True) == 2
+    assert _rows(project_dir, "SELECT CAST(ts AS VARCHAR), value FROM plc ORDER BY ts") == [
+        ("2024-01-01 00:00:00", 1), ("2024-01-01 00:00:01", 2),
+    ]
+    assert _rows(project_dir, "SELECT line, reason FROM plc_rejects ORDER BY line") == [
+        ("broken,line,extra", "Wrong number of fields"), ("not a time,3", "Invalid timestamp: not a time"),
+    ]
+    with log.open("a", encoding="utf-8") as handle:
+        handle.write("2024-01-01 00:00:02,4\n")
+    def crash(header: str, data: bytes) -> None:
+        raise ValueError("parser crashed")
+
+    parse, follower._parse_csv = follower._parse_csv, crash
+    with pytest.raises(ValueError, match="parser crashed"):
+        follower.step(force=True)
+    # A chunk that failed to parse is read again rather than skipped.
+    follower._parse_csv = parse
+    assert follower.step(force=True) == 1
+    assert _rows(project_dir, "SELECT count(*) FROM plc") == [(3,)]
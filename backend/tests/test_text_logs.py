@@ -0,0 +1,77 @@
+from pathlib import Path
+
+import pytest
+
+from app.db.duckdb_store import connect, create_project
+from app.services.alarms import update_alarm_episodes
+from app.services.text_logs import import_text_log, template_pattern, text_log_parser
+
+LOG = (
+    b"2024-01-01 00:00:05,250 [ALARM] Pump P1 tripped\n"
+    b"garbage line\n"
+    b"\n"
+    b"2024-01-01 00:00:00 [INFO] Startup pressure=1 unit=\"bar a\"\n"
+    b"2024-13-01 00:00:00 [INFO] not a date\n"
+    b"2024-01-01 00:00:07 [INFO] Operat\xf6r login pressure=5.5\n"
+    b"2024-01-01 00:00:10 [CLEAR] Pump P1 tripped\n"
+)
+
+
+def _rows(project_dir: Path, sql: str) -> list[tuple]:
+    with connect(project_dir) as conn:
+        return conn.execute(sql).fetchall()
+
+
+def test_template_import_types_fields_and_keeps_rejects(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    log = tmp_path / "plc.log"
+    log.write_bytes(LOG)
+    options = {"template": "{ts} [{level}] {message}", "key_values": ["pressure", "unit"], "types": {"pressure": "double"}}
+
+    result = import_text_log(project_dir, log, options)
+
+    assert (result["dataset_name"], result["rows"], result["rejected"]) == ("text_logs", 4, 2)
+    rows = _rows(project_dir, "SELECT strftime(ts, '%H:%M:%S.%g'), level, pressure, unit, source_file FROM text_logs")
+    assert rows == [
+        ("00:00:00.000", "INFO", 1.0, "bar a", "plc.log"),
+        ("00:00:05.250", "ALARM", None, None, "plc.log"),
+        ("00:00:07.000", "INFO", 5.5, None, "plc.log"),
+        ("00:00:10.000", "CLEAR", None, None, "plc.log"),
+    ]
+    # A stray non-UTF-8 byte is replaced instead of failing the import.
+    assert _rows(project_dir, "SELECT message FROM text_logs WHERE pressure = 5.5") == [("Operat\ufffdr login pressure=5.5",)]
+    assert _rows(project_dir, "SELECT reason, line FROM text_logs_rejects ORDER BY reason") == [
+        ("invalid timestamp", "2024-13-01 00:00:00 [INFO] not a date"),
+        ("no match", "garbage line"),
+    ]
+    episodes = update_alarm_episodes(project_dir)
+    assert episodes["episodes"] == 1
+    assert _rows(project_dir, "SELECT tag, duration_s FROM alarm_episodes") == [("Pump P1 tripped", 4.75)]
+
+    again = import_text_log(project_dir, log, {**options, "mode": "append", "key": ["ts", "message"]})
+    assert again["merged"] == {"rows": 4, "inserted": 0, "updated": 0, "skipped": 4}
+    assert _rows(project_dir, "SELECT count(*) FROM text_logs_rejects") == [(4,)]
+
+
+def test_named_regex_with_unnamed_groups_and_encoding(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    log = tmp_path / "scada.txt"
+    log.write_bytes("01.02.2024 08:00:00;(S7) Ventil öppnat;V12\n01.02.2024 08:00:03;(S7) Ventil stängt;V12\n".encode("latin-1"))
+    pattern = r"^(?P<ts>[\d.]+ [\d:]+);\((\w+)\) (?P<message>[^;]*);(?P<tag>\w+)$"
+
+    result = import_text_log(
+        project_dir, log, {"dataset_name": "scada", "pattern": pattern, "timestamp_format": "%d.%m.%Y %H:%M:%S", "encoding": "latin-1"}
+    )
+
+    assert result["columns"] == ["ts", "message", "tag", "source_file"]
+    assert _rows(project_dir, "SELECT message, tag FROM scada") == [("Ventil öppnat", "V12"), ("Ventil stängt", "V12")]
+    assert template_pattern("{tag} = {value:\\d{2}}") == r"^(?P<tag>\S+)\s+=\s+(?P<value>\d{2})$"
+    with pytest.raises(ValueError, match="either pattern or template"):
+        text_log_parser({"pattern": pattern, "template": "{message}"})
+    # Valid for Python's re but not for DuckDB's RE2, which would reject every line.
+    with pytest.raises(ValueError, match="Invalid pattern"):
+        text_log_parser({"pattern": r"^(?P<ts>\S+ \S+)(?= )(?P<message>.*)$"})
+    with pytest.raises(ValueError, match="Unsupported type"):
+        import_text_log(project_dir, log, {"pattern": pattern, "types": {"tag": "BLOB; DROP TABLE scada"}})
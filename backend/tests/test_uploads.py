@@ -0,0 +1,108 @@
+import asyncio
+import hashlib
+import io
+from pathlib import Path
+
+import pytest
+from fastapi import UploadFile
+
+from app.db.duckdb_store import create_project
+from app.services.importer import import_csv
+from app.services.uploads import (
+    append_upload_chunk,
+    complete_upload,
+    create_upload_session,
+    find_previous_import,
+    finish_upload,
+    get_upload_session,
+    record_import,
+    save_upload,
+)
+
+
+async def _chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+def test_save_upload_streams_to_disk_and_hashes(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    content = b"ts,value\n2024-01-01T00:00:00Z,1\n"
+
+    upload = asyncio.run(save_upload(project_dir, UploadFile(file=io.BytesIO(content), filename="log.csv")))
+
+    assert upload.path.read_bytes() == content
+    assert upload.path.suffix == ".csv"
+    assert upload.sha256 == hashlib.sha256(content).hexdigest()
+
+    options = {"dataset_name": "log", "mode": "replace"}
+    assert find_previous_import(project_dir, upload.sha256, "log", options) is None
+    import_csv(project_dir, upload.path, options)
+    record_import(project_dir, upload, ["log"], options)
+    assert find_previous_import(project_dir, upload.sha256, "log", options) is not None
+    assert find_previous_import(project_dir, upload.sha256, "log", {**options, "delimiter": ";"}) is None
+
+
+def test_previous_import_is_not_reused_after_the_dataset_was_replaced(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    options = {"dataset_name": "log", "mode": "replace"}
+    uploads = {}
+    for name, value in (("a", 1), ("b", 2)):
+        content = f"ts,value\n2024-01-01T00:00:00Z,{value}\n".encode()
+        uploads[name] = asyncio.run(save_upload(project_dir, UploadFile(file=io.BytesIO(content), filename=f"{name}.csv")))
+
+    for name in ("a", "b"):
+        import_csv(project_dir, uploads[name].path, options)
+        record_import(project_dir, uploads[name], ["log"], options)
+
+    assert find_previous_import(project_dir, uploads["a"].sha256, "log", options) is None
+    assert find_previous_import(project_dir, uploads["b"].sha256, "log", options) is not None
+
+
+def test_resumable_upload_rejects_wrong_offset(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    content = b"ts,value\n2024-01-01T00:00:00Z,1\n"
+
+    session = create_upload_session(project_dir, "log.csv", total_size=len(content))
+    upload_id = session["upload_id"]
+    asyncio.run(append_upload_chunk(project_dir, upload_id, 0, _chunks(content[:10])))
+    with pytest.raises(ValueError):
+        asyncio.run(append_upload_chunk(project_dir, upload_id, 0, _chunks(content[10:])))
+    with pytest.raises(ValueError):
+        complete_upload(project_dir, upload_id)
+
+    offset = get_upload_session(project_dir, upload_id)["offset"]
+    asyncio.run(append_upload_chunk(project_dir, upload_id, offset, _chunks(content[offset:])))
+    upload = complete_upload(project_dir, upload_id, hashlib.sha256(content).hexdigest())
+
+    assert upload.path.read_bytes() == content
+    assert upload.filename == "log.csv"
+
+
+def test_concurrent_chunks_at_the_same_offset_are_serialized(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    upload_id = create_upload_session(project_dir, "log.csv")["upload_id"]
+
+    async def slow(part: bytes):
+        # Yield to the event loop mid-request, so the second PUT arrives while the first is writing.
+        await asyncio.sleep(0.01)
+        yield part[:4]
+        await asyncio.sleep(0.01)
+        yield part[4:]
+
+    async def race() -> list:
+        return await asyncio.gather(
+            append_upload_chunk(project_dir, upload_id, 0, slow(b"AAAAAAAA")),
+            append_upload_chunk(project_dir, upload_id, 0, slow(b"BBBBBBBB")),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(race())
+    assert isinstance(results[1], ValueError) and "offset mismatch" in str(results[1])
+    upload = asyncio.run(finish_upload(project_dir, upload_id))
+    assert upload.path.read_bytes() == b"AAAAAAAA"
+    assert upload.sha256 == hashlib.sha256(b"AAAAAAAA").hexdigest()
@@ -0,0 +1,105 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from app.db.duckdb_store import connect, create_project, load_metadata, save_batches
+from app.services.importer import import_csv
+from app.services.recipes import run_recipe
+from app.services.storage import merge_staging, set_storage, staging_table, write_batches
+
+
+def _log(start: str, periods: int, value: float = 0.0) -> pd.DataFrame:
+    ts = pd.date_range(start, periods=periods, freq="1min")
+    return pd.DataFrame({"tag": "P1", "ts": ts, "value": [value + index for index in range(periods)]})
+
+
+def _table(project_dir: Path, name: str) -> pd.DataFrame:
+    with connect(project_dir) as conn:
+        return conn.execute(f"SELECT * FROM {name} ORDER BY tag, ts").fetchdf()
+
+
+def test_csv_append_skips_overlap_and_widens_schema(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    first, second = tmp_path / "day1.csv", tmp_path / "day2.csv"
+    _log("2024-01-01 00:00", 10).astype({"value": int}).to_csv(first, index=False)
+    # A re-exported log repeats the last five minutes and adds a column and fractional values.
+    _log("2024-01-01 00:05", 10, 5.5).assign(state="RUN").to_csv(second, index=False)
+
+    options = {"dataset_name": "plc", "timestamp_column": "ts", "mode": "append", "key": ["tag", "ts"]}
+    import_csv(project_dir, first, options)
+    result = import_csv(project_dir, second, options)
+
+    assert result["merged"] == {"rows": 10, "inserted": 5, "updated": 0, "skipped": 5}
+    frame = _table(project_dir, "plc")
+    assert len(frame) == 15 and frame["ts"].is_unique
+    assert frame["value"].dtype == float and frame["value"].iloc[-1] == 14.5
+    assert frame["state"].isna().sum() == 10
+    assert load_metadata(project_dir)["keys"]["plc"] == ["tag", "ts"]
+
+
+def test_upsert_replaces_rows_and_rejects_incompatible_types(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    write_batches(project_dir, "plc", [_log("2024-01-01", 6)], mode="replace")
+    corrected = pd.concat([_log("2024-01-01 00:04", 4, 100.0), _log("2024-01-01 00:04", 1, 200.0)], ignore_index=True)
+
+    result = write_batches(project_dir, "plc", [corrected], mode="upsert", key=["tag", "ts"])
+
+    assert result == {"rows": 5, "inserted": 2, "updated": 2, "skipped": 1}
+    assert _table(project_dir, "plc")["value"].tolist() == [0.0, 1.0, 2.0, 3.0, 200.0, 101.0, 102.0, 103.0]
+    with pytest.raises(ValueError, match="Incompatible column types"):
+        write_batches(project_dir, "plc", [_log("2024-01-02", 2).assign(value="n/a")])
+    assert len(_table(project_dir, "plc")) == 8
+    with connect(project_dir) as conn:
+        assert conn.execute("SELECT count(*) FROM information_schema.tables WHERE table_name LIKE '_staging_%'").fetchone()[0] == 0
+
+
+def test_overlapping_writers_stage_into_separate_tables(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    write_batches(project_dir, "plc", [_log("2024-01-01", 2)], mode="replace")
+    # Both writers stage before either merges, as a tail follower and an import running together do.
+    first, second = staging_table("plc"), staging_table("plc")
+    save_batches(project_dir, first, [_log("2024-01-02", 3)])
+    save_batches(project_dir, second, [_log("2024-01-03", 4)])
+
+    assert merge_staging(project_dir, "plc", first)["inserted"] == 3
+    assert merge_staging(project_dir, "plc", second)["inserted"] == 4
+    assert len(_table(project_dir, "plc")) == 9
+
+
+def test_failed_merge_can_keep_its_staging_table_for_a_retry(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    write_batches(project_dir, "plc", [_log("2024-01-01", 2)], mode="replace")
+    staging = staging_table("plc")
+    save_batches(project_dir, staging, [_log("2024-01-01 00:01", 3, 10.0)])
+
+    with pytest.raises(ValueError, match="Missing key columns"):
+        merge_staging(project_dir, "plc", staging, "upsert", ["tag", "line"], keep_on_error=True)
+    assert merge_staging(project_dir, "plc", staging, "upsert", ["tag", "ts"]) == {"rows": 3, "inserted": 2, "updated": 1, "skipped": 0}
+    with connect(project_dir) as conn:
+        assert conn.execute("SELECT count(*) FROM information_schema.tables WHERE table_name LIKE '_staging_%'").fetchone()[0] == 0
+
+
+def test_partitioned_upsert_and_recipe_save_table_modes(tmp_path: Path) -> None:
+    project_dir = tmp_path / "project"
+    create_project(project_dir, "Test", None)
+    write_batches(project_dir, "plc", [_log("2024-01-01 23:55", 10)], mode="replace")
+    set_storage(project_dir, "plc", "ts", "day")
+    recipe = tmp_path / "upsert.py"
+    recipe.write_text(
+        "import pandas as pd\n"
+        "frame = pd.read_pickle(params['path'])\n"
+        "log(str(save_table('plc', frame, mode='upsert', key=['tag', 'ts'])))\n",
+        encoding="utf-8",
+    )
+    path = tmp_path / "fix.pkl"
+    _log("2024-01-01 23:58", 4, 50.0).to_pickle(path)
+
+    result = run_recipe(project_dir, recipe, {"path": str(path)}, use_cache=False)
+
+    assert result.logs == [str({"rows": 4, "inserted": 0, "updated": 4, "skipped": 0})]
+    assert _table(project_dir, "plc")["value"].tolist() == [0.0, 1.0, 2.0, 50.0, 51.0, 52.0, 53.0, 7.0, 8.0, 9.0]